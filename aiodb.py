@@ -0,0 +1,64 @@
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class DatabaseQueueFull(Exception):
+    """Demasiadas consultas en cola para el executor de SQLite; el cliente debe reintentar."""
+
+
+class AsyncDB:
+    """
+    Puente entre el event loop (modo ASGI) y SQLite, que es bloqueante:
+    cada consulta corre en un pool de hilos dedicado con una conexion del
+    pool de la app, y el loop solo espera el resultado.
+    - workers: hilos del executor (consultas simultaneas).
+    - max_pending: consultas en cola o en curso antes de rechazar con
+      DatabaseQueueFull, para no acumular trabajo sin limite bajo carga.
+    El executor se crea en el primer uso, despues del fork del servidor.
+    """
+
+    def __init__(self, pool, workers: int = 8, max_pending: int = 64):
+        self.pool = pool
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="sqlite")
+                self._pid = os.getpid()
+            return self._executor
+
+    def _call(self, fn, args):
+        conn = self.pool.acquire()
+        try:
+            return fn(conn, *args)
+        finally:
+            self.pool.release(conn)
+
+    async def run(self, fn, *args):
+        """
+        Ejecuta fn(conn, *args) en el executor y devuelve su resultado.
+        Corre con una copia del contexto actual: las metricas de SQL se
+        atribuyen al request que hizo la consulta.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise DatabaseQueueFull()
+        try:
+            context = contextvars.copy_context()
+            future = self._get_executor().submit(context.run, self._call, fn, args)
+            return await asyncio.wrap_future(future)
+        finally:
+            self._slots.release()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
@@ -0,0 +1,154 @@
+# Analitica de flota sobre service_records con NumPy.
+# Las columnas se cargan en bloque a arreglos (sin un Row por fila) y todos
+# los agregados se calculan vectorizados. NumPy es opcional: si no esta
+# instalado, available() devuelve False y la app responde 501.
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Dias desde 1970-01-01 (NULL si service_date no es una fecha valida).
+COLUMNS_SQL = """
+    SELECT
+        car_id,
+        CAST(julianday(service_date) - 2440587.5 AS INTEGER) AS epoch_day,
+        mileage,
+        cost
+    FROM service_records
+"""
+
+PERCENTILES = (10, 25, 50, 75, 90, 99)
+
+
+def available():
+    return np is not None
+
+
+def load_columns(conn, date_from=None, date_to=None, chunk_size: int = 50000):
+    """
+    Lee car_id, fecha, km y costo a arreglos NumPy con fetchmany.
+    Las filas sin fecha valida se descartan.
+    """
+    sql = COLUMNS_SQL + " WHERE julianday(service_date) IS NOT NULL"
+    params = []
+    if date_from:
+        sql += " AND service_date >= ?"
+        params.append(date_from)
+    if date_to:
+        sql += " AND service_date <= ?"
+        params.append(date_to)
+
+    cursor = conn.execute(sql, params)
+    blocks = []
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        blocks.append(np.array(rows, dtype=np.float64))
+
+    data = np.concatenate(blocks) if blocks else np.empty((0, 4))
+    return {
+        "car_id": data[:, 0].astype(np.int64),
+        "day": data[:, 1].astype(np.int64),
+        "mileage": data[:, 2],
+        "cost": data[:, 3],
+    }
+
+
+def _percentiles(values, digits: int = 2):
+    if values.size == 0:
+        return {f"p{p}": None for p in PERCENTILES}
+    points = np.percentile(values, PERCENTILES)
+    return {f"p{p}": round(float(v), digits) for p, v in zip(PERCENTILES, points)}
+
+
+def monthly_costs(cols):
+    months = cols["day"].astype("datetime64[D]").astype("datetime64[M]")
+    keys, inverse = np.unique(months, return_inverse=True)
+    totals = np.bincount(inverse, weights=cols["cost"], minlength=keys.size)
+    counts = np.bincount(inverse, minlength=keys.size)
+    return [
+        {
+            "month": str(month),
+            "services": int(count),
+            "total_cost": round(float(total), 2),
+            "avg_cost": round(float(total / count), 2),
+        }
+        for month, total, count in zip(keys, totals, counts)
+    ]
+
+
+def _by_car(cols):
+    """Ordena por (car_id, fecha, km) y devuelve los inicios de cada coche."""
+    order = np.lexsort((cols["mileage"], cols["day"], cols["car_id"]))
+    car_id = cols["car_id"][order]
+    starts = np.flatnonzero(np.r_[True, car_id[1:] != car_id[:-1]])
+    return order, car_id, starts
+
+
+def cost_per_km(cols):
+    """
+    Por coche: gasto total / km recorridos entre el primer y el ultimo servicio.
+    Coches con un solo servicio (0 km recorridos) quedan fuera.
+    """
+    if cols["car_id"].size == 0:
+        return {"cars": 0, "fleet": None, **_percentiles(np.empty(0))}
+
+    order, _, starts = _by_car(cols)
+    mileage = cols["mileage"][order]
+    cost = cols["cost"][order]
+
+    km = np.maximum.reduceat(mileage, starts) - np.minimum.reduceat(mileage, starts)
+    spend = np.add.reduceat(cost, starts)
+    driven = km > 0
+    ratios = spend[driven] / km[driven]
+
+    fleet = float(spend[driven].sum() / km[driven].sum()) if driven.any() else None
+    return {
+        "cars": int(driven.sum()),
+        "fleet": round(fleet, 4) if fleet is not None else None,
+        **_percentiles(ratios, digits=4),
+    }
+
+
+def mileage_intervals(cols):
+    """Km entre servicios consecutivos del mismo coche (en orden de fecha)."""
+    if cols["car_id"].size < 2:
+        return {"count": 0, "mean": None, **_percentiles(np.empty(0))}
+
+    order, car_id, _ = _by_car(cols)
+    deltas = np.diff(cols["mileage"][order])
+    same_car = car_id[1:] == car_id[:-1]
+    intervals = deltas[same_car & (deltas >= 0)]
+
+    return {
+        "count": int(intervals.size),
+        "mean": round(float(intervals.mean()), 1) if intervals.size else None,
+        **_percentiles(intervals),
+    }
+
+
+def concat_columns(parts):
+    """Une las columnas leidas en varios shards (el orden de filas no importa)."""
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+
+def service_analytics(conn, date_from=None, date_to=None):
+    return summarize(load_columns(conn, date_from, date_to))
+
+
+def summarize(cols):
+    cost = cols["cost"]
+    return {
+        "records": int(cost.size),
+        "cars": int(np.unique(cols["car_id"]).size),
+        "cost": {
+            "total": round(float(cost.sum()), 2),
+            "mean": round(float(cost.mean()), 2) if cost.size else None,
+            **_percentiles(cost),
+        },
+        "monthly": monthly_costs(cols),
+        "cost_per_km": cost_per_km(cols),
+        "mileage_intervals": mileage_intervals(cols),
+    }
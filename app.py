@@ -1,1010 +1,414 @@
-from flask import Flask, jsonify, request, render_template, redirect, url_for, session
-import sqlite3
-import os
-from werkzeug.security import generate_password_hash, check_password_hash
+import time
 
-app = Flask(__name__)
+_IMPORT_STARTED = time.perf_counter()
+
+import os
+import sqlite3
+import tempfile
+
+from flask import Flask, current_app, jsonify, request
+
+import aiodb
+import cache
+import commands
+import db
+import exporter
+import jobs
+import metrics
+import notifications
+import passwords
+import shards
+import slowlog
+import tenants
+import web
+from blueprints import BLUEPRINTS
+from versions import VersionedCache
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATABASE = os.path.join(BASE_DIR, "database", "database.db")
-app.secret_key = os.getenv("FLASK_SECRET_KEY", "dev-secret-change-me")
-PUBLIC_ENDPOINTS = {
-    "static",
-    "login_page",
-    "register_page",
-    "logout",
-    "create_user",
-    "initialize_database",
-}
+
+# Tiempo de importar este modulo y sus dependencias (Flask incluido).
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
+
+
+def default_config():
+    """Configuracion por variables de entorno; create_app(config) la sobrescribe."""
+    return {
+        "DATABASE": os.getenv("DATABASE_PATH", os.path.join(BASE_DIR, "database", "database.db")),
+        # Rutas separadas por coma; con shards DATABASE queda como directorio (shards.py).
+        "DATABASE_SHARDS": [p.strip() for p in os.getenv("DATABASE_SHARDS", "").split(",") if p.strip()],
+        "SHARD_FANOUT_WORKERS": int(os.getenv("SHARD_FANOUT_WORKERS", "8")),
+        "SHARD_ID_BLOCK": int(os.getenv("SHARD_ID_BLOCK", "64")),
+        # Un archivo por taller (tenants.py); excluyente con DATABASE_SHARDS.
+        "TENANTS_DIR": os.getenv("TENANTS_DIR", ""),
+        "TENANT_HEADER": os.getenv("TENANT_HEADER", "X-Tenant"),
+        "TENANT_DOMAIN": os.getenv("TENANT_DOMAIN", ""),
+        "TENANT_MAX_OPEN": int(os.getenv("TENANT_MAX_OPEN", "64")),
+        "TENANT_IDLE_SECONDS": float(os.getenv("TENANT_IDLE_SECONDS", "300")),
+        "TENANT_POOL_SIZE": int(os.getenv("TENANT_POOL_SIZE", "2")),
+        "TENANT_REPORT_WORKERS": int(os.getenv("TENANT_REPORT_WORKERS", str(min(4, os.cpu_count() or 1)))),
+        "SECRET_KEY": os.getenv("FLASK_SECRET_KEY", "dev-secret-change-me"),
+        "DB_POOL_SIZE": int(os.getenv("DB_POOL_SIZE", "8")),
+        "DB_POOL_HEALTHCHECK_INTERVAL": float(os.getenv("DB_POOL_HEALTHCHECK_INTERVAL", "30")),
+        "DB_JOURNAL_MODE": os.getenv("DB_JOURNAL_MODE", "WAL"),
+        "DB_SYNCHRONOUS": os.getenv("DB_SYNCHRONOUS", "NORMAL"),
+        "DB_BUSY_TIMEOUT_MS": int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000")),
+        "DB_MMAP_SIZE": int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024))),
+        "DB_CACHE_SIZE": int(os.getenv("DB_CACHE_SIZE", "-20000")),
+        "DB_WRITE_RETRIES": int(os.getenv("DB_WRITE_RETRIES", "5")),
+        "DB_WRITE_BACKOFF": float(os.getenv("DB_WRITE_BACKOFF", "0.05")),
+        "ASGI_DB_WORKERS": int(os.getenv("ASGI_DB_WORKERS", "8")),
+        "ASGI_DB_MAX_PENDING": int(os.getenv("ASGI_DB_MAX_PENDING", "64")),
+        "ASGI_WSGI_THREADS": int(os.getenv("ASGI_WSGI_THREADS", "32")),
+        "PAGE_SIZE": int(os.getenv("PAGE_SIZE", "50")),
+        "MAX_PAGE_SIZE": int(os.getenv("MAX_PAGE_SIZE", "500")),
+        "STREAM_CHUNK_SIZE": int(os.getenv("STREAM_CHUNK_SIZE", "500")),
+        "BULK_MAX_ITEMS": int(os.getenv("BULK_MAX_ITEMS", "5000")),
+        "IMPORT_CHUNK_SIZE": int(os.getenv("IMPORT_CHUNK_SIZE", "1000")),
+        "EXPORT_DIR": os.getenv("EXPORT_DIR", os.path.join(tempfile.gettempdir(), "garage-exports")),
+        "EXPORT_WORKERS": int(os.getenv("EXPORT_WORKERS", "2")),
+        "EXPORT_TTL": float(os.getenv("EXPORT_TTL", "3600")),
+        "PASSWORD_HASH_METHOD": os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1"),
+        "PASSWORD_HASH_WORKERS": int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1)))),
+        "PASSWORD_HASH_MAX_PENDING": int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32")),
+        "LOGIN_RATE_CAPACITY": float(os.getenv("LOGIN_RATE_CAPACITY", "5")),
+        "LOGIN_RATE_PER_MINUTE": float(os.getenv("LOGIN_RATE_PER_MINUTE", "5")),
+        "JOBS_ENABLED": os.getenv("JOBS_ENABLED", "1") == "1",
+        "JOBS_WORKERS": int(os.getenv("JOBS_WORKERS", "2")),
+        "JOBS_POLL_INTERVAL": float(os.getenv("JOBS_POLL_INTERVAL", "5")),
+        "EXPIRY_SCAN_INTERVAL": float(os.getenv("EXPIRY_SCAN_INTERVAL", "3600")),
+        "EXPIRY_NOTICE_DAYS": int(os.getenv("EXPIRY_NOTICE_DAYS", "30")),
+        "NOTIFY_SINK": os.getenv("NOTIFY_SINK", "log"),
+        "NOTIFY_FILE": os.getenv("NOTIFY_FILE", os.path.join(BASE_DIR, "database", "notifications.jsonl")),
+        "NOTIFY_FROM": os.getenv("NOTIFY_FROM", "garage@localhost"),
+        "SMTP_HOST": os.getenv("SMTP_HOST", "localhost"),
+        "SMTP_PORT": int(os.getenv("SMTP_PORT", "25")),
+        "RESPONSE_CACHE_ENABLED": os.getenv("RESPONSE_CACHE_ENABLED", "1") == "1",
+        "RESPONSE_CACHE_MAX_BYTES": int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+        "RESPONSE_CACHE_TTL": float(os.getenv("RESPONSE_CACHE_TTL", "300")),
+        # /metrics es publico solo si se pide; si no, sesion o token Bearer.
+        "METRICS_PUBLIC": os.getenv("METRICS_PUBLIC", "0") == "1",
+        "METRICS_TOKEN": os.getenv("METRICS_TOKEN", ""),
+        "SERVER_TIMING": os.getenv("SERVER_TIMING", "0") == "1",
+        "PROFILE_SAMPLE_RATE": float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+        "PROFILE_DIR": os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "garage-profiles")),
+        "PROFILE_KEEP": int(os.getenv("PROFILE_KEEP", "20")),
+        "SLOW_QUERY_MS": float(os.getenv("SLOW_QUERY_MS", "200")),
+        "SLOW_QUERY_LOG": os.getenv("SLOW_QUERY_LOG", os.path.join(BASE_DIR, "database", "slow_queries.log")),
+        "SLOW_QUERY_LOG_MAX_BYTES": int(os.getenv("SLOW_QUERY_LOG_MAX_BYTES", str(5 * 1024 * 1024))),
+        "SLOW_QUERY_LOG_BACKUPS": int(os.getenv("SLOW_QUERY_LOG_BACKUPS", "5")),
+        # /static sin ?v= (p. ej. enlaces viejos); con ?v=<mtime> es inmutable.
+        "SEND_FILE_MAX_AGE_DEFAULT": int(os.getenv("STATIC_MAX_AGE", "300")),
+    }
+
 
 # -------------------------
-# DB HELPERS
+# EXTENSIONES
+# Solo se construyen objetos: el pool abre conexiones con la primera
+# peticion, los hilos (trabajos, exportaciones, hash) arrancan al usarse
+# y el esquema se crea aparte con `flask init-db`.
 # -------------------------
 
-def get_db_connection():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON;")
-    return conn
-
+def init_extensions(app):
+    config = app.config
+    ext = app.extensions
 
-def init_db():
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    if config["TENANTS_DIR"] and config["DATABASE_SHARDS"]:
+        raise RuntimeError("TENANTS_DIR y DATABASE_SHARDS son excluyentes")
 
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        email TEXT NOT NULL UNIQUE,
-        password TEXT NOT NULL
+    ext["db_pool"] = db.ConnectionPool(
+        config["DATABASE"],
+        size=config["DB_POOL_SIZE"],
+        healthcheck_interval=config["DB_POOL_HEALTHCHECK_INTERVAL"],
+        factory=web.open_pooled_connection(config),
     )
-    """)
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS cars (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        brand TEXT NOT NULL,
-        model TEXT NOT NULL,
-        year INTEGER NOT NULL,
-        plate TEXT,
-        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+    ext["db_writer"] = db.SerializedWriter(
+        retries=config["DB_WRITE_RETRIES"],
+        backoff=config["DB_WRITE_BACKOFF"],
     )
-    """)
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS service_records (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        car_id INTEGER NOT NULL,
-        service_type TEXT NOT NULL,
-        service_date TEXT NOT NULL,
-        mileage INTEGER NOT NULL,
-        cost REAL NOT NULL,
-        FOREIGN KEY (car_id) REFERENCES cars(id) ON DELETE CASCADE
+    ext["shards"] = build_shards(config, ext["db_pool"], ext["db_writer"]) if config["DATABASE_SHARDS"] else None
+    ext["tenants"] = build_tenants(config) if config["TENANTS_DIR"] else None
+    ext["async_db"] = aiodb.AsyncDB(
+        ext["db_pool"],
+        workers=config["ASGI_DB_WORKERS"],
+        max_pending=config["ASGI_DB_MAX_PENDING"],
     )
-    """)
-
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS car_documents (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        car_id INTEGER NOT NULL,
-        doc_type TEXT NOT NULL,
-        folio TEXT NOT NULL,
-        expires_at TEXT NOT NULL,
-        notes TEXT,
-        FOREIGN KEY (car_id) REFERENCES cars(id) ON DELETE CASCADE
+    ext["response_cache"] = cache.ResponseCache(
+        max_bytes=config["RESPONSE_CACHE_MAX_BYTES"],
+        ttl=config["RESPONSE_CACHE_TTL"],
+        enabled=config["RESPONSE_CACHE_ENABLED"],
     )
-    """)
-
-    conn.commit()
-    conn.close()
-
-
-def fetch_car_with_owner(conn, car_id: int):
-    return conn.execute("""
-        SELECT
-            cars.id,
-            cars.user_id,
-            users.name AS user_name,
-            cars.brand,
-            cars.model,
-            cars.year,
-            cars.plate
-        FROM cars
-        JOIN users ON users.id = cars.user_id
-        WHERE cars.id = ?
-    """, (car_id,)).fetchone()
-
-
-def fetch_document(conn, doc_id: int):
-    return conn.execute("""
-        SELECT id, car_id, doc_type, folio, expires_at, notes
-        FROM car_documents
-        WHERE id = ?
-    """, (doc_id,)).fetchone()
-
-
-def create_user_in_db(name: str, email: str, password: str):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    try:
-        cursor.execute(
-            "INSERT INTO users (name, email, password) VALUES (?, ?, ?)",
-            (name, email, generate_password_hash(password)),
+    ext["db_writer"].listeners.append(ext["response_cache"])
+    if config["SLOW_QUERY_MS"] > 0:
+        ext["slow_query_log"] = slowlog.SlowQueryLog(
+            config["SLOW_QUERY_LOG"],
+            config["SLOW_QUERY_MS"],
+            max_bytes=config["SLOW_QUERY_LOG_MAX_BYTES"],
+            backups=config["SLOW_QUERY_LOG_BACKUPS"],
         )
-        conn.commit()
-        user_id = cursor.lastrowid
-    except sqlite3.IntegrityError:
-        conn.close()
-        return None, "email_exists"
-
-    conn.close()
-    return user_id, None
+        ext["slow_query_log"].install()
+    ext["profiler"] = metrics.SamplingProfiler(
+        config["PROFILE_DIR"],
+        sample_rate=config["PROFILE_SAMPLE_RATE"],
+        keep=config["PROFILE_KEEP"],
+    )
+    ext["password_hasher"] = passwords.PasswordHasher(
+        method=config["PASSWORD_HASH_METHOD"],
+        workers=config["PASSWORD_HASH_WORKERS"],
+        max_pending=config["PASSWORD_HASH_MAX_PENDING"],
+    )
+    ext.update(database_caches())
+    ext["exports"] = exporter.ExportManager(
+        [ext["db_pool"]] if ext["shards"] is None else [shard.pool for shard in ext["shards"].shards],
+        config["EXPORT_DIR"],
+        workers=config["EXPORT_WORKERS"],
+        ttl=config["EXPORT_TTL"],
+        chunk_size=config["STREAM_CHUNK_SIZE"],
+    )
+    ext["login_limiter"] = passwords.TokenBucketLimiter(
+        capacity=config["LOGIN_RATE_CAPACITY"],
+        refill_rate=config["LOGIN_RATE_PER_MINUTE"] / 60,
+    )
+    ext["notify_sink"] = notifications.make_sink(config)
+    ext["jobs"] = jobs.JobRunner(
+        ext["db_pool"],
+        ext["db_writer"],
+        workers=config["JOBS_WORKERS"],
+        poll_interval=config["JOBS_POLL_INTERVAL"],
+    )
+    ext["jobs"].register(
+        "document-expiry-scan",
+        lambda conn: expiry_scan(conn, ext, config["EXPIRY_NOTICE_DAYS"]),
+        interval=config["EXPIRY_SCAN_INTERVAL"],
+    )
 
 
-def verify_password(stored_password: str, raw_password: str):
-    if stored_password.startswith("scrypt:") or stored_password.startswith("pbkdf2:"):
-        return check_password_hash(stored_password, raw_password)
-    return stored_password == raw_password
+def build_shards(config, directory_pool, directory_writer):
+    """ShardSet con un pool y un escritor por archivo de DATABASE_SHARDS."""
+    shard_list = []
+    for index, path in enumerate(config["DATABASE_SHARDS"]):
+        pool = db.ConnectionPool(
+            path,
+            size=config["DB_POOL_SIZE"],
+            healthcheck_interval=config["DB_POOL_HEALTHCHECK_INTERVAL"],
+            factory=web.open_pooled_connection(config),
+        )
+        writer = db.SerializedWriter(retries=config["DB_WRITE_RETRIES"], backoff=config["DB_WRITE_BACKOFF"])
+        shard_list.append(shards.Shard(index, path, pool, writer))
+    return shards.ShardSet(
+        directory_pool,
+        directory_writer,
+        shard_list,
+        workers=config["SHARD_FANOUT_WORKERS"],
+        id_block=config["SHARD_ID_BLOCK"],
+    )
 
 
-@app.before_request
-def enforce_authentication():
-    if request.endpoint in PUBLIC_ENDPOINTS:
-        return None
-    if request.endpoint is None:
-        return None
-    if request.method == "OPTIONS":
-        return None
-    if session.get("user_id"):
-        return None
-    if request.path.startswith("/view") or request.path == "/":
-        return redirect(url_for("login_page"))
-    return jsonify({"error": "No autenticado"}), 401
+def build_tenants(config):
+    """TenantStores: cada taller abre su pool chico y su escritor al primer request."""
+    def open_store(slug, path, lock):
+        pool = db.ConnectionPool(
+            path,
+            size=config["TENANT_POOL_SIZE"],
+            healthcheck_interval=config["DB_POOL_HEALTHCHECK_INTERVAL"],
+            factory=web.open_pooled_connection(config),
+        )
+        writer = db.SerializedWriter(retries=config["DB_WRITE_RETRIES"], backoff=config["DB_WRITE_BACKOFF"])
+        return tenants.TenantStore(slug, path, pool, writer, database_caches(), lock)
+
+    return tenants.TenantStores(
+        config["TENANTS_DIR"],
+        open_store,
+        max_open=config["TENANT_MAX_OPEN"],
+        idle_seconds=config["TENANT_IDLE_SECONDS"],
+    )
 
 
-@app.context_processor
-def inject_user():
+def database_caches():
+    """Caches por version de tabla; uno por base (la principal o cada taller)."""
     return {
-        "is_authenticated": bool(session.get("user_id")),
-        "current_user_name": session.get("user_name"),
-        "current_user_email": session.get("user_email"),
+        "expiry_buckets": VersionedCache("car_documents"),
+        "service_analytics": VersionedCache("service_records", max_entries=32),
     }
 
 
-init_db()
-
-
-# -------------------------
-# VISTAS (TEMPLATES)
-# -------------------------
-
-@app.route("/")
-def home():
-    if not session.get("user_id"):
-        return redirect(url_for("login_page"))
-    return redirect(url_for("cars_page"))
-
-
-@app.route("/login", methods=["GET", "POST"])
-def login_page():
-    if request.method == "GET":
-        if session.get("user_id"):
-            return redirect(url_for("cars_page"))
-        return render_template("auth/login.html", error=None)
-
-    data = request.get_json(silent=True) if request.is_json else request.form
-    email = (data.get("email") or "").strip().lower()
-    password = (data.get("password") or "").strip()
-
-    if not email or not password:
-        error = "Faltan campos obligatorios: email, password"
-        if request.is_json:
-            return jsonify({"error": error}), 400
-        return render_template("auth/login.html", error=error), 400
-
-    conn = get_db_connection()
-    user = conn.execute(
-        "SELECT id, name, email, password FROM users WHERE email = ?",
-        (email,),
-    ).fetchone()
-
-    if user is None or not verify_password(user["password"], password):
-        conn.close()
-        error = "Credenciales invalidas"
-        if request.is_json:
-            return jsonify({"error": error}), 401
-        return render_template("auth/login.html", error=error), 401
-
-    # Migra automaticamente passwords antiguas guardadas en texto plano.
-    if not (user["password"].startswith("scrypt:") or user["password"].startswith("pbkdf2:")):
-        conn.execute(
-            "UPDATE users SET password = ? WHERE id = ?",
-            (generate_password_hash(password), user["id"]),
-        )
-        conn.commit()
-
-    conn.close()
-    session.clear()
-    session["user_id"] = user["id"]
-    session["user_name"] = user["name"]
-    session["user_email"] = user["email"]
-
-    if request.is_json:
-        return jsonify({"message": "Login correcto"}), 200
-
-    return redirect(url_for("cars_page"))
-
-
-@app.route("/register", methods=["GET", "POST"])
-def register_page():
-    if request.method == "GET":
-        return render_template("auth/register.html", error=None)
-
-    data = request.get_json(silent=True) if request.is_json else request.form
-    name = (data.get("name") or "").strip()
-    email = (data.get("email") or "").strip().lower()
-    password = (data.get("password") or "").strip()
-
-    if not name or not email or not password:
-        error = "Faltan campos obligatorios: name, email, password"
-        if request.is_json:
-            return jsonify({"error": error}), 400
-        return render_template("auth/register.html", error=error), 400
-
-    user_id, create_error = create_user_in_db(name, email, password)
-    if create_error == "email_exists":
-        error = "El email ya esta registrado"
-        if request.is_json:
-            return jsonify({"error": error}), 409
-        return render_template("auth/register.html", error=error), 409
-
-    if request.is_json:
-        return jsonify({"message": "Usuario creado", "id": user_id}), 201
-
-    return redirect(url_for("login_page"))
-
-
-@app.route("/logout", methods=["GET"])
-def logout():
-    session.clear()
-    return redirect(url_for("login_page"))
-
-
-@app.route("/init-db")
-def initialize_database():
-    init_db()
-    return "Base de datos inicializada correctamente"
-
-
-# --- Cars templates ---
-@app.route("/view/cars")
-def cars_page():
-    return render_template("cars/cars.html")
-
-
-@app.route("/view/cars/create")
-def cars_create_page():
-    return render_template("cars/create_car.html")
-
-
-@app.route("/view/cars/<int:car_id>/edit")
-def cars_edit_page(car_id):
-    conn = get_db_connection()
-    car = conn.execute("SELECT * FROM cars WHERE id = ?", (car_id,)).fetchone()
-    conn.close()
-
-    if car is None:
-        return "Car not found", 404
-
-    return render_template("cars/edit_car.html", car=car)
-
-
-# --- Users templates ---
-@app.route("/view/users")
-def users_page():
-    return render_template("users/user.html")
-
-
-@app.route("/view/users/create")
-def users_create_page():
-    return render_template("users/create_user.html")
-
-
-# --- Services templates (genéricas) ---
-@app.route("/view/services")
-def services_page():
-    return render_template("services/services.html")
-
-
-@app.route("/view/services/create")
-def services_create_page():
-    return render_template("services/create_service.html")
-
-
-@app.route("/view/services/<int:service_id>/edit")
-def services_edit_page(service_id):
-    conn = get_db_connection()
-    service = conn.execute("SELECT * FROM service_records WHERE id = ?", (service_id,)).fetchone()
-    conn.close()
-
-    if service is None:
-        return "Service record not found", 404
-
-    return render_template("services/edit_service.html", service=service)
-
-
-# -------------------------
-# ✅ DOCUMENTS (por carro)
-# -------------------------
-
-@app.route("/view/cars/<int:car_id>/documents", methods=["GET"])
-def view_car_documents(car_id):
-    """
-    Vista por carro: documentos.
-    Template: templates/documents/car_documents.html   ✅
-    """
-    conn = get_db_connection()
-
-    car = fetch_car_with_owner(conn, car_id)
-    if car is None:
-        conn.close()
-        return "Car not found", 404
-
-    documents = conn.execute("""
-        SELECT id, car_id, doc_type, folio, expires_at, notes
-        FROM car_documents
-        WHERE car_id = ?
-        ORDER BY expires_at DESC
-    """, (car_id,)).fetchall()
-
-    conn.close()
-    return render_template("documents/car_documents.html", car=car, documents=documents)
-
-
-@app.route("/cars/<int:car_id>/documents", methods=["POST"])
-def create_document_by_car(car_id):
-    """
-    Crear documento para un coche.
-    - Template (form-data): redirige a /view/cars/<id>/documents
-    - Postman (JSON): responde JSON 201
-    """
-    data_json = request.get_json(silent=True)
-
-    if data_json:
-        doc_type = (data_json.get("doc_type") or "").strip()
-        folio = (data_json.get("folio") or "").strip()
-        expires_at = (data_json.get("expires_at") or "").strip()
-        notes = (data_json.get("notes") or "").strip()
+def fleet_databases(ext):
+    """(conexion, escritor) de cada shard o taller, uno a la vez."""
+    if ext["shards"] is not None:
+        for shard in ext["shards"].shards:
+            with shard.connection() as conn:
+                yield conn, shard.writer
     else:
-        doc_type = (request.form.get("doc_type") or "").strip()
-        folio = (request.form.get("folio") or "").strip()
-        expires_at = (request.form.get("expires_at") or "").strip()
-        notes = (request.form.get("notes") or "").strip()
-
-    if not doc_type or not folio or not expires_at:
-        if data_json:
-            return jsonify({"error": "Faltan campos: doc_type, folio, expires_at"}), 400
-        return "Faltan campos del formulario", 400
-
-    conn = get_db_connection()
-
-    car_exists = conn.execute("SELECT id FROM cars WHERE id = ?", (car_id,)).fetchone()
-    if car_exists is None:
-        conn.close()
-        if data_json:
-            return jsonify({"error": "Coche no encontrado"}), 404
-        return "Car not found", 404
-
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO car_documents (car_id, doc_type, folio, expires_at, notes)
-        VALUES (?, ?, ?, ?, ?)
-    """, (car_id, doc_type, folio, expires_at, notes if notes else None))
-    conn.commit()
-    new_id = cur.lastrowid
-    conn.close()
-
-    if data_json:
-        return jsonify({"message": "Documento creado", "id": new_id}), 201
-
-    return redirect(url_for("view_car_documents", car_id=car_id))
-
-
-@app.route("/documents/<int:doc_id>/edit", methods=["GET", "POST"])
-def edit_document(doc_id):
-    """
-    Editar documento:
-    - GET: templates/documents/edit_document.html
-    - POST: actualiza y regresa a /view/cars/<car_id>/documents
-    """
-    conn = get_db_connection()
-    document = fetch_document(conn, doc_id)
-
-    if document is None:
-        conn.close()
-        return "Document not found", 404
-
-    car = fetch_car_with_owner(conn, document["car_id"])
-    if car is None:
-        conn.close()
-        return "Car not found", 404
-
-    if request.method == "GET":
-        conn.close()
-        return render_template("documents/edit_document.html", car=car, document=document)
-
-    # POST
-    doc_type = (request.form.get("doc_type") or "").strip()
-    folio = (request.form.get("folio") or "").strip()
-    expires_at = (request.form.get("expires_at") or "").strip()
-    notes = (request.form.get("notes") or "").strip()
-
-    if not doc_type or not folio or not expires_at:
-        conn.close()
-        return "Faltan campos del formulario", 400
-
-    cursor = conn.cursor()
-    cursor.execute("""
-        UPDATE car_documents
-        SET doc_type = ?, folio = ?, expires_at = ?, notes = ?
-        WHERE id = ?
-    """, (doc_type, folio, expires_at, notes if notes else None, doc_id))
-    conn.commit()
-    conn.close()
-
-    return redirect(url_for("view_car_documents", car_id=car["id"]))
-
-
-@app.route("/documents/<int:doc_id>/delete", methods=["POST"])
-def delete_document_template(doc_id):
-    """
-    Delete desde template (form POST).
-    """
-    conn = get_db_connection()
-    document = fetch_document(conn, doc_id)
-
-    if document is None:
-        conn.close()
-        return "Document not found", 404
+        for slug in ext["tenants"].slugs():
+            with ext["tenants"].connection(slug) as target:
+                yield target
 
-    car_id = document["car_id"]
 
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM car_documents WHERE id = ?", (doc_id,))
-    conn.commit()
-    conn.close()
+def expiry_scan(conn, ext, days):
+    """Trabajo de avisos: en la base principal o en cada shard o taller (resultados sumados)."""
+    if ext["shards"] is None and ext["tenants"] is None:
+        return notifications.expiry_scan(conn, ext["db_writer"], ext["notify_sink"], days=days)
 
-    return redirect(url_for("view_car_documents", car_id=car_id))
+    totals = {"queued": 0, "sent": 0, "failed": 0, "days": days}
+    for fleet_conn, writer in fleet_databases(ext):
+        result = notifications.expiry_scan(fleet_conn, writer, ext["notify_sink"], days=days)
+        for key in ("queued", "sent", "failed"):
+            totals[key] += result[key]
+    return totals
 
 
 # -------------------------
-# API USERS (CRUD)
+# HOOKS DE LA APP
 # -------------------------
 
-@app.route("/users", methods=["POST"])
-def create_user():
-    data = request.get_json(silent=True) or {}
-
-    name = (data.get("name") or "").strip()
-    email = (data.get("email") or "").strip().lower()
-    password = (data.get("password") or "").strip()
+def start_background_jobs():
+    """El planificador arranca con la primera peticion de cada proceso; start() no bloquea."""
+    if current_app.config["JOBS_ENABLED"]:
+        current_app.extensions["jobs"].start()
 
-    if not name or not email or not password:
-        return jsonify({"error": "Faltan campos obligatorios: name, email, password"}), 400
 
-    user_id, create_error = create_user_in_db(name, email, password)
-    if create_error == "email_exists":
-        return jsonify({"error": "El email ya está registrado"}), 409
-    return jsonify({"message": "Usuario creado", "id": user_id}), 201
+def start_request_metrics():
+    """Registrado antes que enforce_authentication: mide tambien los 401."""
+    rule = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    stats = metrics.begin_request(rule)
+    stats.profiler = current_app.extensions["profiler"].maybe_start()
 
 
-@app.route("/users", methods=["GET"])
-def get_users():
-    conn = get_db_connection()
-    users = conn.execute("SELECT id, name, email FROM users ORDER BY id DESC").fetchall()
-    conn.close()
-    return jsonify([dict(u) for u in users]), 200
+def finish_request_metrics(response):
+    stats = metrics.end_request()
+    if stats is None:
+        return response
 
+    elapsed = time.perf_counter() - stats.started
+    if stats.profiler is not None:
+        current_app.extensions["profiler"].finish(stats.profiler, stats.endpoint, elapsed)
 
-@app.route("/users/<int:user_id>", methods=["GET"])
-def get_user(user_id):
-    conn = get_db_connection()
-    user = conn.execute(
-        "SELECT id, name, email FROM users WHERE id = ?",
-        (user_id,),
-    ).fetchone()
-    conn.close()
+    size = None if response.is_streamed else response.calculate_content_length()
+    metrics.REGISTRY.observe_request(stats, request.method, response.status_code, elapsed, size)
 
-    if user is None:
-        return jsonify({"error": "Usuario no encontrado"}), 404
-
-    return jsonify(dict(user)), 200
-
-
-@app.route("/users/<int:user_id>", methods=["PUT"])
-def update_user(user_id):
-    data = request.get_json(silent=True) or {}
-
-    name = data.get("name")
-    email = data.get("email")
-
-    if not name or not email:
-        return jsonify({"error": "Faltan campos obligatorios: name, email"}), 400
-
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    try:
-        cursor.execute(
-            "UPDATE users SET name = ?, email = ? WHERE id = ?",
-            (name, email, user_id),
+    if current_app.config["SERVER_TIMING"] or request.headers.get("X-Server-Timing") == "1":
+        response.headers["Server-Timing"] = (
+            f"app;dur={elapsed * 1000:.2f}, "
+            f'sql;dur={stats.sql_seconds * 1000:.2f};desc="{stats.sql_count} consultas, {stats.rows} filas"'
         )
-        conn.commit()
-    except sqlite3.IntegrityError:
-        conn.close()
-        return jsonify({"error": "El email ya está registrado"}), 409
-
-    if cursor.rowcount == 0:
-        conn.close()
-        return jsonify({"error": "Usuario no encontrado"}), 404
-
-    conn.close()
-    return jsonify({"message": "Usuario actualizado"}), 200
-
-
-@app.route("/users/<int:user_id>", methods=["DELETE"])
-def delete_user(user_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
-    conn.commit()
+    return response
 
-    if cursor.rowcount == 0:
-        conn.close()
-        return jsonify({"error": "Usuario no encontrado"}), 404
-
-    conn.close()
-    return jsonify({"message": "Usuario eliminado"}), 200
-
-
-# -------------------------
-# API CARS (CRUD)
-# -------------------------
-
-@app.route("/cars", methods=["POST"])
-def create_car():
-    data = request.get_json(silent=True) or {}
-
-    user_id = data.get("user_id")
-    brand = data.get("brand")
-    model = data.get("model")
-    year = data.get("year")
-    plate = data.get("plate")
-
-    if user_id is None or not brand or not model or year is None:
-        return jsonify({"error": "Faltan campos obligatorios: user_id, brand, model, year"}), 400
-
-    try:
-        user_id = int(user_id)
-        year = int(year)
-    except (ValueError, TypeError):
-        return jsonify({"error": "user_id y year deben ser numéricos"}), 400
-
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    user_exists = conn.execute("SELECT id FROM users WHERE id = ?", (user_id,)).fetchone()
-    if user_exists is None:
-        conn.close()
-        return jsonify({"error": "Usuario no encontrado"}), 404
-
-    cursor.execute("""
-        INSERT INTO cars (user_id, brand, model, year, plate)
-        VALUES (?, ?, ?, ?, ?)
-    """, (user_id, brand, model, year, plate))
-    conn.commit()
-    car_id = cursor.lastrowid
-    conn.close()
-
-    return jsonify({"message": "Coche creado", "id": car_id}), 201
-
-
-@app.route("/cars", methods=["GET"])
-def get_cars():
-    conn = get_db_connection()
-    cars = conn.execute("""
-        SELECT
-            cars.id,
-            cars.user_id,
-            users.name AS user_name,
-            cars.brand,
-            cars.model,
-            cars.year,
-            cars.plate
-        FROM cars
-        JOIN users ON users.id = cars.user_id
-        ORDER BY cars.id DESC
-    """).fetchall()
-    conn.close()
-    return jsonify([dict(c) for c in cars]), 200
-
-
-@app.route("/cars/<int:car_id>", methods=["GET"])
-def get_car(car_id):
-    conn = get_db_connection()
-    car = fetch_car_with_owner(conn, car_id)
-    conn.close()
-
-    if car is None:
-        return jsonify({"error": "Coche no encontrado"}), 404
-
-    return jsonify(dict(car)), 200
-
-
-@app.route("/cars/<int:car_id>", methods=["PUT"])
-def update_car(car_id):
-    data = request.get_json(silent=True) or {}
-
-    brand = data.get("brand")
-    model = data.get("model")
-    year = data.get("year")
-    plate = data.get("plate")
-
-    if not brand or not model or year is None:
-        return jsonify({"error": "Faltan campos obligatorios: brand, model, year"}), 400
-
-    try:
-        year = int(year)
-    except (ValueError, TypeError):
-        return jsonify({"error": "year debe ser numérico"}), 400
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+# Sin taller: no tocan datos de un taller (y /init-db los migra a todos).
+# /metrics es de todo el proceso: con talleres se lee con METRICS_TOKEN.
+TENANTLESS_ENDPOINTS = {"static", "ops.prometheus_metrics", "ops.initialize_database"}
 
-    cursor.execute("""
-        UPDATE cars
-        SET brand = ?, model = ?, year = ?, plate = ?
-        WHERE id = ?
-    """, (brand, model, year, plate, car_id))
-    conn.commit()
-
-    if cursor.rowcount == 0:
-        conn.close()
-        return jsonify({"error": "Coche no encontrado"}), 404
-
-    conn.close()
-    return jsonify({"message": "Coche actualizado"}), 200
-
-
-@app.route("/cars/<int:car_id>", methods=["DELETE"])
-def delete_car(car_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("DELETE FROM cars WHERE id = ?", (car_id,))
-    conn.commit()
-
-    if cursor.rowcount == 0:
-        conn.close()
-        return jsonify({"error": "Coche no encontrado"}), 404
-
-    conn.close()
-    return jsonify({"message": "Coche eliminado"}), 200
-
-
-# -------------------------
-# API SERVICE RECORDS (CRUD)
-# -------------------------
-
-@app.route("/service-records", methods=["GET"])
-def get_service_records():
-    conn = get_db_connection()
-    rows = conn.execute("""
-        SELECT id, car_id, service_type, service_date, mileage, cost
-        FROM service_records
-        ORDER BY id DESC
-    """).fetchall()
-    conn.close()
-    return jsonify([dict(r) for r in rows]), 200
-
-
-@app.route("/service-records/<int:record_id>", methods=["GET"])
-def get_service_record(record_id):
-    conn = get_db_connection()
-    row = conn.execute("""
-        SELECT id, car_id, service_type, service_date, mileage, cost
-        FROM service_records
-        WHERE id = ?
-    """, (record_id,)).fetchone()
-    conn.close()
-
-    if row is None:
-        return jsonify({"error": "Service record no encontrado"}), 404
-
-    return jsonify(dict(row)), 200
 
+def resolve_tenant():
+    """
+    Con TENANTS_DIR elige la base del request por cabecera o subdominio.
+    Corre antes que enforce_authentication: la sesion es de un taller.
+    """
+    stores = current_app.extensions["tenants"]
+    if stores is None or request.endpoint is None or request.endpoint in TENANTLESS_ENDPOINTS:
+        return None
 
-@app.route("/service-records", methods=["POST"])
-def create_service_record_general():
-    data = request.get_json(silent=True) or {}
+    header = current_app.config["TENANT_HEADER"]
+    slug = tenants.tenant_from_request(request.host, request.headers.get(header), current_app.config["TENANT_DOMAIN"])
+    if slug is None:
+        return jsonify({"error": f"Falta el taller: subdominio o cabecera {header}"}), 400
+    store = stores.get(slug)
+    if store is None:
+        return jsonify({"error": "Taller no encontrado"}), 404
+    web.use_tenant(store)
+    return None
 
-    car_id = data.get("car_id")
-    service_type = data.get("service_type")
-    service_date = data.get("service_date")
-    mileage = data.get("mileage")
-    cost = data.get("cost")
 
-    if car_id is None or not service_type or not service_date or mileage is None or cost is None:
-        return jsonify({"error": "Faltan campos: car_id, service_type, service_date, mileage, cost"}), 400
+def vary_on_tenant(response):
+    """El taller puede venir en una cabecera: los caches HTTP no deben mezclar talleres."""
+    if current_app.extensions["tenants"] is not None:
+        response.vary.add(current_app.config["TENANT_HEADER"])
+    return response
 
-    try:
-        car_id = int(car_id)
-        mileage = int(mileage)
-        cost = float(cost)
-    except (ValueError, TypeError):
-        return jsonify({"error": "car_id/mileage deben ser int y cost debe ser número"}), 400
-
-    conn = get_db_connection()
-    car_exists = conn.execute("SELECT id FROM cars WHERE id = ?", (car_id,)).fetchone()
-    if car_exists is None:
-        conn.close()
-        return jsonify({"error": "Coche no encontrado"}), 404
-
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO service_records (car_id, service_type, service_date, mileage, cost)
-        VALUES (?, ?, ?, ?, ?)
-    """, (car_id, service_type, service_date, mileage, cost))
-    conn.commit()
-    new_id = cur.lastrowid
-    conn.close()
-
-    return jsonify({"message": "Service record creado", "id": new_id}), 201
-
-
-@app.route("/service-records/<int:record_id>", methods=["PUT"])
-def update_service_record(record_id):
-    data = request.get_json(silent=True) or {}
-
-    service_type = data.get("service_type")
-    service_date = data.get("service_date")
-    mileage = data.get("mileage")
-    cost = data.get("cost")
-
-    if not service_type or not service_date or mileage is None or cost is None:
-        return jsonify({"error": "Faltan campos: service_type, service_date, mileage, cost"}), 400
 
+def static_version(endpoint, values):
+    """url_for('static', ...) agrega ?v=<mtime> para poder cachear sin limite."""
+    if endpoint != "static" or "v" in values:
+        return
     try:
-        mileage = int(mileage)
-        cost = float(cost)
-    except (ValueError, TypeError):
-        return jsonify({"error": "mileage debe ser int y cost debe ser número"}), 400
-
-    conn = get_db_connection()
-    cursor = conn.cursor()
+        values["v"] = int(os.path.getmtime(os.path.join(current_app.static_folder, values["filename"])))
+    except OSError:
+        pass
 
-    cursor.execute("""
-        UPDATE service_records
-        SET service_type = ?, service_date = ?, mileage = ?, cost = ?
-        WHERE id = ?
-    """, (service_type, service_date, mileage, cost, record_id))
-    conn.commit()
 
-    if cursor.rowcount == 0:
-        conn.close()
-        return jsonify({"error": "Service record no encontrado"}), 404
+def static_cache_control(response):
+    if request.endpoint == "static" and request.args.get("v") and response.status_code in (200, 304):
+        response.cache_control.public = True
+        response.cache_control.max_age = 365 * 24 * 3600
+        response.cache_control.immutable = True
+    return response
 
-    conn.close()
-    return jsonify({"message": "Service record actualizado"}), 200
 
+def handle_db_busy(exc):
+    if not db.is_busy_error(exc):
+        raise exc
+    return jsonify({"error": "Base de datos ocupada, intenta de nuevo"}), 503
 
-@app.route("/service-records/<int:record_id>", methods=["DELETE"])
-def delete_service_record(record_id):
-    conn = get_db_connection()
-    cursor = conn.cursor()
 
-    cursor.execute("DELETE FROM service_records WHERE id = ?", (record_id,))
-    conn.commit()
-
-    if cursor.rowcount == 0:
-        conn.close()
-        return jsonify({"error": "Service record no encontrado"}), 404
-
-    conn.close()
-    return jsonify({"message": "Service record eliminado"}), 200
+def handle_server_busy(exc):
+    return jsonify({"error": "Servidor ocupado, intenta de nuevo"}), 503
 
 
 # -------------------------
-# DÍA 3: SERVICE RECORDS (Templates + POST por car_id)
+# FABRICA
 # -------------------------
 
-@app.route("/view/cars/<int:car_id>/services", methods=["GET"])
-def view_car_services(car_id):
-    conn = get_db_connection()
-
-    car = fetch_car_with_owner(conn, car_id)
-    if car is None:
-        conn.close()
-        return "Car not found", 404
-
-    services = conn.execute("""
-        SELECT id, car_id, service_type, service_date, mileage, cost
-        FROM service_records
-        WHERE car_id = ?
-        ORDER BY service_date DESC
-    """, (car_id,)).fetchall()
-
-    conn.close()
-    return render_template("services/service_records.html", car=car, services=services)
-
-
-@app.route("/cars/<int:car_id>/services", methods=["POST"])
-def create_service_record_by_car(car_id):
-    """
-    Crear service record para un coche.
-    - Template (form-data): redirige a /view/cars/<id>/services
-    - Postman (JSON): responde JSON 201
-    """
-    data_json = request.get_json(silent=True)
-
-    if data_json:
-        service_type = (data_json.get("service_type") or "").strip()
-        service_date = (data_json.get("service_date") or "").strip()
-        mileage = data_json.get("mileage")
-        cost = data_json.get("cost")
-    else:
-        service_type = (request.form.get("service_type") or "").strip()
-        service_date = (request.form.get("service_date") or "").strip()
-        mileage = (request.form.get("mileage") or "").strip()
-        cost = (request.form.get("cost") or "").strip()
-
-    if not service_type or not service_date or not str(mileage).strip() or not str(cost).strip():
-        if data_json:
-            return jsonify({"error": "Faltan campos: service_type, service_date, mileage, cost"}), 400
-        return "Faltan campos del formulario", 400
-
-    try:
-        mileage = int(mileage)
-        cost = float(cost)
-    except (ValueError, TypeError):
-        if data_json:
-            return jsonify({"error": "mileage debe ser int y cost debe ser número"}), 400
-        return "Mileage y cost deben ser numéricos", 400
-
-    conn = get_db_connection()
-
-    car_exists = conn.execute("SELECT id FROM cars WHERE id = ?", (car_id,)).fetchone()
-    if car_exists is None:
-        conn.close()
-        if data_json:
-            return jsonify({"error": "Coche no encontrado"}), 404
-        return "Car not found", 404
-
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO service_records (car_id, service_type, service_date, mileage, cost)
-        VALUES (?, ?, ?, ?, ?)
-    """, (car_id, service_type, service_date, mileage, cost))
-    conn.commit()
-    new_id = cur.lastrowid
-    conn.close()
-
-    if data_json:
-        return jsonify({"message": "Service record creado", "id": new_id}), 201
-
-    return redirect(url_for("view_car_services", car_id=car_id))
-
-
-# -------------------------
-# ✅ API CAR DOCUMENTS (OPCIONAL PARA POSTMAN)
-# -------------------------
-
-@app.route("/car-documents", methods=["GET"])
-def get_car_documents():
-    conn = get_db_connection()
-    rows = conn.execute("""
-        SELECT id, car_id, doc_type, folio, expires_at, notes
-        FROM car_documents
-        ORDER BY id DESC
-    """).fetchall()
-    conn.close()
-    return jsonify([dict(r) for r in rows]), 200
-
-
-@app.route("/car-documents/<int:doc_id>", methods=["GET"])
-def get_car_document(doc_id):
-    conn = get_db_connection()
-    row = fetch_document(conn, doc_id)
-    conn.close()
-
-    if row is None:
-        return jsonify({"error": "Documento no encontrado"}), 404
-
-    return jsonify(dict(row)), 200
-
-
-@app.route("/car-documents", methods=["POST"])
-def create_car_document_general():
+def create_app(config=None):
     """
-    Crear documento indicando car_id (para Postman).
-    Body JSON:
-    { "car_id": 1, "doc_type": "...", "folio": "...", "expires_at": "YYYY-MM-DD", "notes": "..." }
+    Construye la app sin tocar la base: no abre conexiones ni corre DDL.
+    El esquema se prepara una vez con `flask --app app init-db`.
+    El tiempo de arranque queda en app.extensions["boot"] y en /metrics.
     """
-    data = request.get_json(silent=True) or {}
-
-    car_id = data.get("car_id")
-    doc_type = (data.get("doc_type") or "").strip()
-    folio = (data.get("folio") or "").strip()
-    expires_at = (data.get("expires_at") or "").strip()
-    notes = (data.get("notes") or "").strip()
-
-    if car_id is None or not doc_type or not folio or not expires_at:
-        return jsonify({"error": "Faltan campos: car_id, doc_type, folio, expires_at"}), 400
-
-    try:
-        car_id = int(car_id)
-    except (ValueError, TypeError):
-        return jsonify({"error": "car_id debe ser numérico"}), 400
-
-    conn = get_db_connection()
-    car_exists = conn.execute("SELECT id FROM cars WHERE id = ?", (car_id,)).fetchone()
-    if car_exists is None:
-        conn.close()
-        return jsonify({"error": "Coche no encontrado"}), 404
-
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO car_documents (car_id, doc_type, folio, expires_at, notes)
-        VALUES (?, ?, ?, ?, ?)
-    """, (car_id, doc_type, folio, expires_at, notes if notes else None))
-    conn.commit()
-    new_id = cur.lastrowid
-    conn.close()
-
-    return jsonify({"message": "Documento creado", "id": new_id}), 201
-
-
-@app.route("/car-documents/<int:doc_id>", methods=["PUT"])
-def update_car_document(doc_id):
-    data = request.get_json(silent=True) or {}
-
-    doc_type = (data.get("doc_type") or "").strip()
-    folio = (data.get("folio") or "").strip()
-    expires_at = (data.get("expires_at") or "").strip()
-    notes = (data.get("notes") or "").strip()
-
-    if not doc_type or not folio or not expires_at:
-        return jsonify({"error": "Faltan campos: doc_type, folio, expires_at"}), 400
-
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        UPDATE car_documents
-        SET doc_type = ?, folio = ?, expires_at = ?, notes = ?
-        WHERE id = ?
-    """, (doc_type, folio, expires_at, notes if notes else None, doc_id))
-    conn.commit()
-
-    if cursor.rowcount == 0:
-        conn.close()
-        return jsonify({"error": "Documento no encontrado"}), 404
-
-    conn.close()
-    return jsonify({"message": "Documento actualizado"}), 200
-
-
-# -------------------------
-# ✅ DOCUMENTS (GLOBAL VIEW)
-# -------------------------
-@app.route("/view/documents", methods=["GET"])
-def documents_page():
-    conn = get_db_connection()
-    documents = conn.execute("""
-        SELECT
-            cd.id,
-            cd.car_id,
-            cd.doc_type,
-            cd.folio,
-            cd.expires_at,
-            cd.notes,
-            c.brand,
-            c.model,
-            c.plate,
-            u.name AS user_name
-        FROM car_documents cd
-        JOIN cars c ON c.id = cd.car_id
-        JOIN users u ON u.id = c.user_id
-        ORDER BY cd.expires_at DESC, cd.id DESC
-    """).fetchall()
-    conn.close()
-
-    return render_template("documents/documents.html", documents=documents)
+    started = time.perf_counter()
+    app = Flask(__name__)
+    app.config.from_mapping(default_config())
+    if config:
+        app.config.update(config)
+
+    init_extensions(app)
+
+    # Orden de before_request: trabajos, metricas, taller y luego auth (blueprint).
+    app.before_request(start_background_jobs)
+    app.before_request(start_request_metrics)
+    app.before_request(resolve_tenant)
+    # after_request corre en orden inverso: metricas, cache de /static y Vary.
+    app.after_request(vary_on_tenant)
+    app.after_request(static_cache_control)
+    app.after_request(finish_request_metrics)
+    app.url_defaults(static_version)
+    app.teardown_appcontext(web.release_db)
+    app.register_error_handler(sqlite3.OperationalError, handle_db_busy)
+    app.register_error_handler(passwords.HasherBusy, handle_server_busy)
+    app.register_error_handler(aiodb.DatabaseQueueFull, handle_server_busy)
+
+    for blueprint in BLUEPRINTS:
+        app.register_blueprint(blueprint)
+    for command in commands.COMMANDS:
+        app.cli.add_command(command)
+
+    create_seconds = time.perf_counter() - started
+    app.extensions["boot"] = {
+        "pid": os.getpid(),
+        "import_seconds": round(IMPORT_SECONDS, 4),
+        "create_seconds": round(create_seconds, 4),
+    }
+    help_text = "Tiempo de arranque del worker por fase."
+    metrics.REGISTRY.set_gauge("app_boot_seconds", help_text, round(IMPORT_SECONDS, 4), 'phase="import"')
+    metrics.REGISTRY.set_gauge("app_boot_seconds", help_text, round(create_seconds, 4), 'phase="create_app"')
+    app.logger.info(
+        "Worker %s listo: importacion %.1f ms, create_app %.1f ms",
+        os.getpid(), IMPORT_SECONDS * 1000, create_seconds * 1000,
+    )
+    return app
 
 
 if __name__ == "__main__":
+    app = create_app()
+    # En desarrollo se prepara el esquema al arrancar; en produccion es `flask init-db`.
+    with app.app_context():
+        web.init_db()
     app.run(debug=True)
@@ -0,0 +1,258 @@
+import asyncio
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import request
+from werkzeug.exceptions import HTTPException
+
+import web
+from app import create_app
+
+# Modo ASGI opcional (la app sigue siendo WSGI con gunicorn):
+#
+#   uvicorn --factory asgi:create_asgi_app
+#
+# Las lecturas registradas con web.async_view corren en el event loop y
+# mandan SQLite a un executor acotado (aiodb.AsyncDB). El resto de las
+# rutas corre como WSGI en un pool de hilos, con la misma app Flask.
+
+
+# Cuerpos hasta este tamanio quedan en memoria; los mas grandes (p. ej. la
+# importacion CSV) pasan a un archivo temporal: memoria acotada por request.
+BODY_SPOOL_BYTES = 1024 * 1024
+
+
+def build_environ(scope, body, length: int):
+    """
+    Environ WSGI (PEP 3333) equivalente a un scope HTTP de ASGI. body es el
+    cuerpo ya recibido (archivo al inicio) y length su tamanio: CONTENT_LENGTH
+    sale de ahi, no de la cabecera (chunked y HTTP/2 no la mandan).
+    """
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    root_path = scope.get("root_path", "")
+    path = scope["path"]
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": root_path.encode("utf-8").decode("latin-1"),
+        "PATH_INFO": path.encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1] or 80),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        "wsgi.input_terminated": True,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for raw_name, raw_value in scope.get("headers", []):
+        name = raw_name.decode("latin-1").upper().replace("-", "_")
+        key = name if name in ("CONTENT_TYPE", "CONTENT_LENGTH") else f"HTTP_{name}"
+        value = raw_value.decode("latin-1")
+        if key in environ:
+            value = environ[key] + ("; " if key == "HTTP_COOKIE" else ",") + value
+        environ[key] = value
+    environ["CONTENT_LENGTH"] = str(length)
+    return environ
+
+
+async def read_body(receive):
+    """
+    (archivo, tamanio) con el cuerpo completo del request, o (None, 0) si
+    el cliente se desconecto. Pasado BODY_SPOOL_BYTES va a disco.
+    """
+    body = tempfile.SpooledTemporaryFile(max_size=BODY_SPOOL_BYTES)
+    length = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            body.close()
+            return None, 0
+        chunk = message.get("body", b"")
+        body.write(chunk)
+        length += len(chunk)
+        if not message.get("more_body"):
+            body.seek(0)
+            return body, length
+
+
+def next_chunk(chunks, result):
+    """Siguiente bloque del cuerpo, o None al terminar (cierra el iterable)."""
+    try:
+        chunk = next(chunks, None)
+    except BaseException:
+        close = getattr(result, "close", None)
+        if close is not None:
+            close()
+        raise
+    if chunk is None:
+        close = getattr(result, "close", None)
+        if close is not None:
+            close()
+    return chunk
+
+
+class AsgiApp:
+    """
+    Aplicacion ASGI sobre la app Flask.
+    - GET de un endpoint con vista async: contexto de request de Flask,
+      before/after_request y manejo de errores como en wsgi_app, pero la
+      vista se espera en el loop.
+    - Todo lo demas: app.wsgi_app en un pool de hilos (threads).
+    Los cuerpos que no estan en memoria (streams, archivos) se leen bloque
+    por bloque en el pool de hilos para no bloquear el loop.
+    """
+
+    def __init__(self, app, threads: int = 32):
+        self.app = app
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="wsgi")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            raise RuntimeError(f"Tipo de conexion no soportado: {scope['type']}")
+
+        body, length = await read_body(receive)
+        if body is None:
+            return
+
+        try:
+            environ = build_environ(scope, body, length)
+            view = self.async_view_for(environ)
+            if view is None:
+                await self.call_wsgi(environ, send)
+            else:
+                await self.call_async(view, environ, send)
+        finally:
+            body.close()
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def async_view_for(self, environ):
+        # Con shards las lecturas hacen fan-out en su propio pool de hilos, y
+        # con talleres AsyncDB no conoce sus bases: todo va por el puente WSGI.
+        extensions = self.app.extensions
+        if environ["REQUEST_METHOD"] != "GET" or extensions["shards"] is not None or extensions["tenants"] is not None:
+            return None
+        adapter = self.app.url_map.bind_to_environ(environ, server_name=self.app.config["SERVER_NAME"])
+        try:
+            rule, _ = adapter.match(return_rule=True)
+        except HTTPException:
+            return None
+        return web.ASYNC_VIEWS.get(rule.endpoint)
+
+    # -------------------------
+    # VISTAS ASYNC (en el loop)
+    # -------------------------
+
+    async def dispatch(self, view):
+        """full_dispatch_request de Flask esperando la vista async."""
+        try:
+            rv = self.app.preprocess_request()
+            if rv is None:
+                rv = await view(**request.view_args)
+        except Exception as exc:
+            rv = self.app.handle_user_exception(exc)
+        return self.app.finalize_request(rv)
+
+    async def call_async(self, view, environ, send):
+        ctx = self.app.request_context(environ)
+        error = None
+        try:
+            try:
+                ctx.push()
+                response = await self.dispatch(view)
+            except Exception as exc:
+                error = exc
+                response = self.app.handle_exception(exc)
+            result, status, headers = response.get_wsgi_response(environ)
+        except BaseException as exc:
+            error = exc
+            raise
+        finally:
+            ctx.pop(error)
+
+        # Los cuerpos en memoria se mandan desde el loop; streams y archivos
+        # se leen en el pool de hilos.
+        in_thread = not response.is_sequence
+        chunks = iter(result)
+        first = await self.read_chunk(chunks, result, in_thread)
+        await self.send_response(send, status, headers, chunks, result, first, in_thread)
+
+    # -------------------------
+    # PUENTE WSGI (pool de hilos)
+    # -------------------------
+
+    async def call_wsgi(self, environ, send):
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started["status"] = status
+            started["headers"] = headers
+
+        def begin():
+            # start_response puede llamarse hasta el primer bloque.
+            result = self.app.wsgi_app(environ, start_response)
+            chunks = iter(result)
+            return result, chunks, next_chunk(chunks, result)
+
+        loop = asyncio.get_running_loop()
+        result, chunks, first = await loop.run_in_executor(self.executor, begin)
+        await self.send_response(send, started["status"], started["headers"], chunks, result, first, True)
+
+    async def read_chunk(self, chunks, result, in_thread):
+        if not in_thread:
+            return next_chunk(chunks, result)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, next_chunk, chunks, result)
+
+    async def send_response(self, send, status, headers, chunks, result, first, in_thread):
+        await send({
+            "type": "http.response.start",
+            "status": int(status.split(" ", 1)[0]),
+            "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers],
+        })
+        chunk = first
+        while chunk is not None:
+            if chunk:
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            chunk = await self.read_chunk(chunks, result, in_thread)
+        await send({"type": "http.response.body", "body": b""})
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.app.extensions["async_db"].shutdown()
+        if self.app.extensions["shards"] is not None:
+            self.app.extensions["shards"].shutdown()
+        if self.app.extensions["tenants"] is not None:
+            self.app.extensions["tenants"].shutdown()
+        # Los workers del hash son procesos hijos con el socket del servidor
+        # heredado: se esperan, porque uvicorn termina con la senial original
+        # (sin atexit) y quedarian huerfanos.
+        self.app.extensions["password_hasher"].shutdown(wait=True)
+
+
+def create_asgi_app(config=None):
+    """Fabrica para `uvicorn --factory asgi:create_asgi_app`."""
+    app = create_app(config)
+    return AsgiApp(app, threads=app.config["ASGI_WSGI_THREADS"])
@@ -0,0 +1,6 @@
+"""
+Benchmark reproducible de la app: genera una flota sintetica
+(python -m benchmark generate), corre una mezcla de peticiones contra el
+test client y contra un servidor WSGI real (python -m benchmark run) y
+compara dos reportes JSON (python -m benchmark compare).
+"""
@@ -0,0 +1,80 @@
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+from benchmark import runner
+
+DEFAULT_DB = os.path.join("benchmark-results", "bench-{scale}.db")
+DRIVER_SETS = {"both": ("client", "wsgi"), "modes": ("wsgi", "asgi")}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmark")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    gen = commands.add_parser("generate", help="Crea una base con la flota sintetica")
+    gen.add_argument("--scale", default="10k", choices=("10k", "100k", "1m", "10m"))
+    gen.add_argument("--seed", type=int, default=42)
+    gen.add_argument("--db", help=f"Archivo de la base (por defecto {DEFAULT_DB})")
+
+    run = commands.add_parser("run", help="Corre la mezcla y escribe el reporte JSON")
+    run.add_argument("--db", required=True)
+    run.add_argument("--driver", default="both", choices=("client", "wsgi", "asgi", "both", "modes"),
+                     help="both: client y wsgi; modes: wsgi y asgi (requiere uvicorn)")
+    run.add_argument("--mix", default="default", choices=("default", "reads"),
+                     help="reads: solo las lecturas que en asgi corren en el event loop")
+    run.add_argument("--duration", type=float, default=30, help="Segundos medidos por corrida")
+    run.add_argument("--warmup", type=float, default=3)
+    run.add_argument("--concurrency", default="1,8", help="Hilos cliente, separados por coma")
+    run.add_argument("--seed", type=int, default=42)
+    run.add_argument("--out", help="Reporte JSON (por defecto benchmark-results/<fecha>.json)")
+
+    cmp = commands.add_parser("compare", help="Compara dos reportes (antes y despues)")
+    cmp.add_argument("old")
+    cmp.add_argument("new")
+
+    serve = commands.add_parser("serve", help=argparse.SUPPRESS)
+    serve.add_argument("--db", required=True)
+    serve.add_argument("--port", type=int, required=True)
+    serve.add_argument("--server", default="wsgi", choices=("wsgi", "asgi"))
+
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        sys.path.insert(0, runner.ROOT)
+        from benchmark.generate import generate
+        database = args.db or DEFAULT_DB.format(scale=args.scale)
+        os.makedirs(os.path.dirname(os.path.abspath(database)), exist_ok=True)
+        result = generate(database, args.scale, args.seed)
+        print(json.dumps(dict(result, database=database), indent=2))
+
+    elif args.command == "run":
+        drivers = DRIVER_SETS.get(args.driver, (args.driver,))
+        levels = [int(level) for level in args.concurrency.split(",")]
+        report = runner.benchmark(args.db, drivers, args.duration, levels, args.seed, args.warmup,
+                                  log=lambda line: print(line, file=sys.stderr), mix=args.mix)
+        out = args.out or os.path.join("benchmark-results", datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+        os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        if report["uncovered_routes"]:
+            print("Rutas sin cubrir: " + ", ".join(report["uncovered_routes"]), file=sys.stderr)
+        if {"wsgi", "asgi"} <= set(drivers):
+            print("\n".join(runner.compare_drivers(report)), file=sys.stderr)
+        print(out)
+
+    elif args.command == "compare":
+        with open(args.old, encoding="utf-8") as f:
+            old = json.load(f)
+        with open(args.new, encoding="utf-8") as f:
+            new = json.load(f)
+        print("\n".join(runner.compare(old, new)))
+
+    elif args.command == "serve":
+        runner.serve(args.db, args.port, args.server)
+
+
+if __name__ == "__main__":
+    main()
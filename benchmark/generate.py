@@ -0,0 +1,197 @@
+import math
+import random
+import time
+from datetime import date, timedelta
+
+from werkzeug.security import generate_password_hash
+
+import db
+import forecast
+import migrations
+
+# Total aproximado de filas (users + cars + service_records + car_documents).
+SCALES = {
+    "10k": 10_000,
+    "100k": 100_000,
+    "1m": 1_000_000,
+    "10m": 10_000_000,
+}
+
+# Todos los usuarios generados comparten esta password (un solo hash).
+PASSWORD = "bench-password"
+
+# Promedios por entidad; ROWS_PER_USER sale de ellos y define cuantos
+# usuarios hacen falta para llegar al total de la escala.
+CARS_PER_USER = 1.6
+SERVICES_PER_CAR = 30
+DOCUMENTS_PER_CAR = 3
+ROWS_PER_USER = 1 + CARS_PER_USER * (1 + SERVICES_PER_CAR + DOCUMENTS_PER_CAR)
+
+FIRST_NAMES = (
+    "Ana", "Luis", "Maria", "Jose", "Carmen", "Juan", "Sofia", "Diego", "Lucia", "Carlos",
+    "Valeria", "Miguel", "Fernanda", "Jorge", "Daniela", "Ricardo", "Paola", "Andres",
+)
+LAST_NAMES = (
+    "Garcia", "Hernandez", "Lopez", "Martinez", "Gonzalez", "Perez", "Rodriguez", "Sanchez",
+    "Ramirez", "Torres", "Flores", "Rivera", "Gomez", "Diaz", "Cruz", "Morales",
+)
+
+# Marca -> (peso, modelos). Pesos aproximados a un parque vehicular real.
+BRANDS = {
+    "Nissan": (18, ("Versa", "Sentra", "March", "Kicks", "NP300")),
+    "Chevrolet": (14, ("Aveo", "Spark", "Onix", "Beat", "Trax")),
+    "Volkswagen": (12, ("Jetta", "Vento", "Golf", "Polo", "Tiguan")),
+    "Toyota": (12, ("Corolla", "Yaris", "Hilux", "RAV4", "Camry")),
+    "Honda": (8, ("Civic", "City", "CR-V", "HR-V", "Fit")),
+    "Kia": (7, ("Rio", "Forte", "Sportage", "Seltos", "Soul")),
+    "Mazda": (6, ("Mazda 2", "Mazda 3", "CX-3", "CX-5", "CX-30")),
+    "Ford": (6, ("Figo", "Fiesta", "Focus", "Ranger", "Escape")),
+    "Hyundai": (5, ("Accent", "Elantra", "Tucson", "Creta", "Grand i10")),
+    "Renault": (4, ("Kwid", "Logan", "Duster", "Stepway", "Sandero")),
+}
+
+# Tipo -> (peso, dias entre servicios, costo mediano). Los aceites dominan.
+SERVICE_TYPES = {
+    "cambio de aceite": (45, 180, 900),
+    "afinacion": (15, 365, 2500),
+    "frenos": (12, 420, 1800),
+    "llantas": (8, 900, 6500),
+    "alineacion y balanceo": (12, 240, 600),
+    "bateria": (4, 1100, 2200),
+    "suspension": (4, 800, 4200),
+}
+
+DOCUMENT_TYPES = ("seguro", "verificacion", "tenencia", "tarjeta de circulacion")
+
+
+class FleetGenerator:
+    """
+    Generador determinista: con la misma semilla y escala produce
+    exactamente las mismas filas. Todo se genera por lotes (memoria constante).
+    """
+
+    def __init__(self, scale: str = "10k", seed: int = 42, today=None):
+        self.rows = SCALES[scale]
+        self.rng = random.Random(seed)
+        self.today = today or date(2026, 1, 1)
+        self.users = max(1, round(self.rows / ROWS_PER_USER))
+
+    def _pick(self, table):
+        names = list(table)
+        weights = [table[name][0] for name in names]
+        return self.rng.choices(names, weights)[0]
+
+    def user(self, user_id: int, password_hash: str):
+        name = f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}"
+        return {"name": name, "email": f"user{user_id}@bench.example", "password": password_hash}
+
+    def car(self, user_id: int):
+        brand = self._pick(BRANDS)
+        # Autos recientes son mas comunes: anio sesgado hacia el presente.
+        age = min(int(self.rng.expovariate(1 / 6)), 25)
+        letters = "".join(self.rng.choice("ABCDEFGHJKLMNPRSTUVWXYZ") for _ in range(3))
+        return {
+            "user_id": user_id,
+            "brand": brand,
+            "model": self.rng.choice(BRANDS[brand][1]),
+            "year": self.today.year - age,
+            "plate": f"{letters}-{self.rng.randint(100, 999)}-{self.rng.choice('ABCDEFGH')}",
+            "age": age,
+        }
+
+    def services(self, car_id: int, age: int):
+        """Historial de un coche: km/dia y cantidad de servicios con distribucion lognormal."""
+        count = min(int(self.rng.lognormvariate(math.log(SERVICES_PER_CAR) - 0.5, 1.0)), 400)
+        km_per_day = self.rng.lognormvariate(math.log(35), 0.5)
+        span = max(365, (age + 1) * 365)
+        start = self.today - timedelta(days=span)
+        days = sorted(self.rng.randint(0, span) for _ in range(count))
+        mileage0 = self.rng.randint(0, 20_000)
+        for day in days:
+            service_type = self._pick(SERVICE_TYPES)
+            median_cost = SERVICE_TYPES[service_type][2]
+            yield {
+                "car_id": car_id,
+                "service_type": service_type,
+                "service_date": (start + timedelta(days=day)).isoformat(),
+                "mileage": int(mileage0 + day * km_per_day),
+                "cost": round(self.rng.lognormvariate(math.log(median_cost), 0.35), 2),
+            }
+
+    def documents(self, car_id: int):
+        count = min(int(self.rng.expovariate(1 / DOCUMENTS_PER_CAR)) + 1, len(DOCUMENT_TYPES) * 3)
+        for i in range(count):
+            doc_type = DOCUMENT_TYPES[i % len(DOCUMENT_TYPES)]
+            # Vencimientos alrededor de hoy: algunos vencidos, la mayoria por vencer.
+            expires = self.today + timedelta(days=int(self.rng.gauss(120, 200)))
+            # Una parte en DD/MM/YYYY, como capturan algunos usuarios.
+            expires_at = expires.strftime("%d/%m/%Y") if self.rng.random() < 0.1 else expires.isoformat()
+            yield {
+                "car_id": car_id,
+                "doc_type": doc_type,
+                "folio": f"{doc_type[:3].upper()}-{self.rng.randint(100000, 999999)}",
+                "expires_at": expires_at,
+                "notes": self.rng.choice((None, None, "renovar con anticipacion", "poliza anual", "pendiente de pago")),
+            }
+
+
+def _insert(conn, table: str, columns, rows):
+    placeholders = ", ".join(f":{c}" for c in columns)
+    conn.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+
+
+def generate(database: str, scale: str = "10k", seed: int = 42, batch_users: int = 500, log=print):
+    """
+    Crea (o completa) la base en database con el esquema actual y la flota
+    sintetica. Devuelve conteos por tabla y el tiempo total.
+    """
+    started = time.perf_counter()
+    conn = db.connect(database, {"journal_mode": "WAL", "synchronous": "OFF", "cache_size": -200000})
+    migrations.migrate(conn)
+    if conn.execute("SELECT EXISTS (SELECT 1 FROM users)").fetchone()[0]:
+        raise RuntimeError(f"{database} ya tiene datos; usa un archivo nuevo")
+
+    gen = FleetGenerator(scale, seed)
+    password_hash = generate_password_hash(PASSWORD)
+    counts = {"users": 0, "cars": 0, "service_records": 0, "car_documents": 0}
+
+    # Se generan usuarios hasta llegar al total de la escala; gen.users
+    # solo estima el tamanio de los lotes.
+    user_id = car_id = 0
+    while sum(counts.values()) < gen.rows:
+        batch = {"users": [], "cars": [], "service_records": [], "car_documents": []}
+        for _ in range(max(1, min(batch_users, round((gen.rows - sum(counts.values())) / ROWS_PER_USER)))):
+            user_id += 1
+            batch["users"].append(dict(gen.user(user_id, password_hash), id=user_id))
+            # Al menos un coche por usuario; algunos tienen flotilla.
+            for _ in range(1 + int(gen.rng.expovariate(1 / (CARS_PER_USER - 1)))):
+                car_id += 1
+                car = gen.car(user_id)
+                batch["cars"].append(dict(car, id=car_id))
+                batch["service_records"].extend(gen.services(car_id, car["age"]))
+                batch["car_documents"].extend(gen.documents(car_id))
+
+        with conn:
+            _insert(conn, "users", ("id", "name", "email", "password"), batch["users"])
+            _insert(conn, "cars", ("id", "user_id", "brand", "model", "year", "plate"), batch["cars"])
+            _insert(conn, "service_records",
+                    ("car_id", "service_type", "service_date", "mileage", "cost"), batch["service_records"])
+            _insert(conn, "car_documents",
+                    ("car_id", "doc_type", "folio", "expires_at", "notes"), batch["car_documents"])
+        for table, rows in batch.items():
+            counts[table] += len(rows)
+        log(f"  {user_id} usuarios, {sum(counts.values())}/{gen.rows} filas")
+
+    with conn:
+        forecast.refresh(conn, full=True)
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+
+    return {
+        "scale": scale,
+        "seed": seed,
+        "rows": counts,
+        "total_rows": sum(counts.values()),
+        "seconds": round(time.perf_counter() - started, 2),
+    }
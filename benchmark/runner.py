@@ -0,0 +1,388 @@
+import logging
+import os
+import platform
+import random
+import resource
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+from benchmark import scenarios
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Variables para la app durante la medicion: sin planificador de trabajos
+# y sin limite de logins (todas las peticiones salen de 127.0.0.1).
+APP_ENV = {
+    "JOBS_ENABLED": "0",
+    "LOGIN_RATE_CAPACITY": "1000000000",
+    "LOGIN_RATE_PER_MINUTE": "1000000000",
+}
+
+
+def app_environment(database: str):
+    """Entorno de la app: el de la terminal manda sobre APP_ENV (p. ej. RESPONSE_CACHE_ENABLED=0)."""
+    env = dict(APP_ENV)
+    env.update({k: v for k, v in os.environ.items() if k in APP_ENV})
+    env["DATABASE_PATH"] = os.path.abspath(database)
+    return env
+
+
+def load_app(database: str):
+    os.environ.update(app_environment(database))
+    sys.path.insert(0, ROOT)
+    from app import create_app
+    return create_app()
+
+
+def percentile(sorted_values, p: float):
+    """Percentil por rango mas cercano sobre una lista ya ordenada."""
+    if not sorted_values:
+        return None
+    rank = max(1, round(p / 100 * len(sorted_values) + 0.5))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies, statuses, errors: int, seconds: float):
+    values = sorted(latencies)
+    ms = lambda v: round(v * 1000, 3) if v is not None else None
+    return {
+        "count": len(values),
+        "errors": errors,
+        "statuses": dict(sorted(statuses.items())),
+        "rps": round(len(values) / seconds, 2) if seconds else None,
+        "mean_ms": ms(sum(values) / len(values)) if values else None,
+        "p50_ms": ms(percentile(values, 50)),
+        "p95_ms": ms(percentile(values, 95)),
+        "p99_ms": ms(percentile(values, 99)),
+        "max_ms": ms(values[-1]) if values else None,
+    }
+
+
+class Context:
+    """Muestras de un hilo: latencias y estados por nombre, y rutas cubiertas."""
+
+    def __init__(self, fleet, adapter):
+        self.ids = fleet["ids"]
+        self.brands = fleet["brands"]
+        self.adapter = adapter
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.errors = Counter()
+        self.routes = set()
+
+    def call(self, name: str, driver, method: str, path: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            status, body = driver.request(method, path, **kwargs)
+        except Exception as exc:
+            self.errors[name] += 1
+            self.statuses[name][type(exc).__name__] += 1
+            return 0, b""
+        self.latencies[name].append(time.perf_counter() - started)
+        self.statuses[name][status] += 1
+        if status >= 500:
+            self.errors[name] += 1
+        try:
+            rule, _ = self.adapter.match(urlsplit(path).path, method=method, return_rule=True)
+            self.routes.add((rule.rule, method))
+        except Exception:
+            pass
+        return status, body
+
+
+def fleet_info(database: str):
+    conn = sqlite3.connect(database)
+    ids = {
+        table: conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+        for table in ("users", "cars", "service_records", "car_documents")
+    }
+    brands = [row[0] for row in conn.execute("SELECT DISTINCT brand FROM cars ORDER BY brand LIMIT 50")]
+    counts = {
+        table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        for table in ("users", "cars", "service_records", "car_documents")
+    }
+    conn.close()
+    if not ids["users"] or not ids["cars"]:
+        raise RuntimeError(f"{database} no tiene datos: corre primero 'python -m benchmark generate'")
+    return {"ids": ids, "brands": brands, "counts": counts}
+
+
+def run_load(driver_factory, fleet, adapter, duration: float, concurrency: int, seed: int, warmup: float = 1.0,
+             mix=scenarios.MIX):
+    """
+    concurrency hilos, cada uno con su driver y su sesion, eligen escenarios
+    de mix por peso durante warmup + duration segundos. Solo se miden los
+    ultimos duration segundos.
+    """
+    functions = [fn for fn, _ in mix]
+    weights = [weight for _, weight in mix]
+    contexts = []
+    window = {}
+
+    def open_window():
+        window["start"] = time.perf_counter() + warmup
+        window["end"] = window["start"] + duration
+
+    # Todos los hilos ya iniciaron sesion cuando empieza el calentamiento.
+    start_barrier = threading.Barrier(concurrency, action=open_window)
+
+    def worker(index: int):
+        rng = random.Random(seed * 1000 + index)
+        driver = driver_factory()
+        setup = Context(fleet, adapter)
+        scenarios.login(driver, rng, setup)
+        start_barrier.wait()
+
+        ctx = setup
+        measuring = False
+        while True:
+            now = time.perf_counter()
+            if now >= window["end"]:
+                break
+            if not measuring and now >= window["start"]:
+                ctx = Context(fleet, adapter)
+                contexts.append(ctx)
+                measuring = True
+            scenario = rng.choices(functions, weights)[0]
+            try:
+                scenario(driver, rng, ctx)
+            except Exception as exc:
+                # Respuesta inesperada (p. ej. cuerpo no JSON): error del escenario.
+                ctx.errors[scenario.__name__] += 1
+                ctx.statuses[scenario.__name__][type(exc).__name__] += 1
+        driver.close()
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies = defaultdict(list)
+    statuses = defaultdict(Counter)
+    errors = Counter()
+    routes = set()
+    for ctx in contexts:
+        for name, values in ctx.latencies.items():
+            latencies[name].extend(values)
+        for name, counter in ctx.statuses.items():
+            statuses[name].update(counter)
+        errors.update(ctx.errors)
+        routes |= ctx.routes
+
+    names = sorted(set(latencies) | set(statuses))
+    return {
+        "duration": duration,
+        "concurrency": concurrency,
+        "requests": {name: summarize(latencies[name], statuses[name], errors[name], duration) for name in names},
+        "total": summarize(
+            [v for values in latencies.values() for v in values],
+            sum(statuses.values(), Counter()),
+            sum(errors.values()),
+            duration,
+        ),
+    }, routes
+
+
+def _peak_rss_kb(who):
+    # ru_maxrss: KB en Linux, bytes en macOS.
+    value = resource.getrusage(who).ru_maxrss
+    return value // 1024 if sys.platform == "darwin" else value
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(database: str, port: int, server: str = "wsgi"):
+    env = dict(os.environ, **app_environment(database))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmark", "serve", "--db", database, "--port", str(port), "--server", server],
+        cwd=ROOT, env=env,
+    )
+    started = time.perf_counter()
+    while time.perf_counter() - started < 60:
+        if process.poll() is not None:
+            raise RuntimeError(f"El servidor {server} termino al arrancar")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            # Arranque del worker: desde el fork hasta aceptar conexiones.
+            return process, round(time.perf_counter() - started, 3)
+        except OSError:
+            time.sleep(0.01)
+    process.kill()
+    raise RuntimeError(f"El servidor {server} no respondio en 60 s")
+
+
+def stop_server(process):
+    """Termina el servidor y devuelve su memoria maxima en KB (de ese proceso, no de todos los hijos)."""
+    process.terminate()
+    _, _, usage = os.wait4(process.pid, 0)
+    process.returncode = 0
+    return usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+
+
+def serve(database: str, port: int, server: str = "wsgi"):
+    """
+    Servidor real para los drivers http: wsgi (werkzeug, un hilo por
+    conexion) o asgi (uvicorn con asgi.create_asgi_app; uvicorn es opcional).
+    Ninguno escribe log de acceso: escribir a la terminal tambien se mediria.
+    """
+    if server == "asgi":
+        try:
+            import uvicorn
+        except ImportError:
+            raise SystemExit("El modo asgi necesita uvicorn: pip install uvicorn")
+        os.environ.update(app_environment(database))
+        sys.path.insert(0, ROOT)
+        from asgi import create_asgi_app
+        uvicorn.run(create_asgi_app(), host="127.0.0.1", port=port, log_level="warning", access_log=False)
+        return
+
+    from werkzeug.serving import make_server
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    app = load_app(database)
+    server = make_server("127.0.0.1", port, app, threaded=True)
+    # stop_server manda SIGTERM: se sale por SystemExit para esperar a los
+    # workers del hash, que si no quedarian huerfanos con el puerto abierto.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    finally:
+        app.extensions["password_hasher"].shutdown(wait=True)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def benchmark(database: str, drivers, duration: float, concurrency, seed: int, warmup: float, log=print,
+              mix: str = "default"):
+    """
+    Corre cada driver con cada nivel de concurrencia y arma el reporte.
+    Drivers: client (test client), wsgi y asgi (servidor real por HTTP).
+    """
+    fleet = fleet_info(database)
+    app = load_app(database)
+    adapter = app.url_map.bind("localhost")
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "database": os.path.abspath(database),
+            "rows": fleet["counts"],
+            "seed": seed,
+            "mix": mix,
+            "env": {k: v for k, v in os.environ.items() if k in app.config},
+            "boot": app.extensions["boot"],
+        },
+        "runs": [],
+    }
+    covered = set()
+
+    for driver_name in drivers:
+        server = None
+        if driver_name == "client":
+            factory = lambda: scenarios.TestClientDriver(app)
+        else:
+            port = _free_port()
+            server, boot_seconds = start_server(database, port, driver_name)
+            report["meta"].setdefault("server_boot_seconds", {})[driver_name] = boot_seconds
+            log(f"servidor {driver_name} listo en {boot_seconds}s")
+            factory = lambda: scenarios.HttpDriver("127.0.0.1", port)
+
+        try:
+            for level in concurrency:
+                log(f"{driver_name} x{level}: {warmup}s de calentamiento + {duration}s")
+                result, routes = run_load(factory, fleet, adapter, duration, level, seed, warmup,
+                                          scenarios.MIXES[mix])
+                covered |= routes
+                result["driver"] = driver_name
+                if driver_name == "client":
+                    result["peak_rss_kb"] = _peak_rss_kb(resource.RUSAGE_SELF)
+                report["runs"].append(result)
+                total = result["total"]
+                log(f"  {total['rps']} req/s  p50 {total['p50_ms']} ms  p95 {total['p95_ms']} ms  "
+                    f"p99 {total['p99_ms']} ms  errores {total['errors']}")
+        finally:
+            if server is not None:
+                rss = stop_server(server)
+                for result in report["runs"]:
+                    if result["driver"] == driver_name:
+                        result["peak_rss_kb"] = rss
+
+    all_routes = {
+        (rule.rule, method)
+        for rule in app.url_map.iter_rules()
+        if rule.endpoint != "static"
+        for method in rule.methods - {"HEAD", "OPTIONS"}
+    }
+    # Con una mezcla parcial (--mix reads) no se reportan rutas sin cubrir.
+    report["uncovered_routes"] = sorted(
+        f"{method} {rule}" for rule, method in all_routes - covered - scenarios.EXCLUDED_ROUTES
+    ) if mix == "default" else []
+    return report
+
+
+def _compare_rows(before, run):
+    lines = []
+    rows = [("TOTAL", before["total"], run["total"])]
+    rows += [
+        (name, before["requests"][name], stats)
+        for name, stats in sorted(run["requests"].items())
+        if name in before["requests"]
+    ]
+    for name, a, b in rows:
+        cells = []
+        for field in ("rps", "p50_ms", "p95_ms", "p99_ms"):
+            x, y = a.get(field), b.get(field)
+            change = f"{(y - x) / x * 100:+.0f}%" if x and y is not None else "n/a"
+            cells.append(f"{field} {x} -> {y} ({change})")
+        lines.append(f"  {name:<28} " + "  ".join(cells))
+    return lines
+
+
+def compare(old: dict, new: dict):
+    """Lineas de texto con el cambio de rps y percentiles por corrida y escenario."""
+    lines = []
+    old_runs = {(r["driver"], r["concurrency"]): r for r in old["runs"]}
+    for run in new["runs"]:
+        key = (run["driver"], run["concurrency"])
+        before = old_runs.get(key)
+        if before is None:
+            continue
+        lines.append(f"== {key[0]} x{key[1]}  ({old['meta'].get('git_commit')} -> {new['meta'].get('git_commit')})")
+        lines += _compare_rows(before, run)
+    return lines
+
+
+def compare_drivers(report: dict, base: str = "wsgi", other: str = "asgi"):
+    """Las corridas de other contra las de base en el mismo reporte, por nivel de concurrencia."""
+    lines = []
+    base_runs = {r["concurrency"]: r for r in report["runs"] if r["driver"] == base}
+    for run in report["runs"]:
+        before = base_runs.get(run["concurrency"])
+        if run["driver"] != other or before is None:
+            continue
+        lines.append(f"== {base} -> {other} x{run['concurrency']}  "
+                     f"(memoria {before.get('peak_rss_kb')} -> {run.get('peak_rss_kb')} KB)")
+        lines += _compare_rows(before, run)
+    return lines
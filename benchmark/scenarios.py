@@ -0,0 +1,365 @@
+import http.client
+import time
+import uuid
+from datetime import date, timedelta
+from http.cookies import SimpleCookie
+from json import dumps, loads
+from urllib.parse import urlencode
+
+from benchmark.generate import PASSWORD
+
+
+# -------------------------
+# DRIVERS
+# Misma interfaz para el test client de Flask y para HTTP real:
+# request(method, path, json=None, form=None, data=None, content_type=None)
+# -> (status, cuerpo en bytes).
+# -------------------------
+
+class TestClientDriver:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method: str, path: str, json=None, form=None, data=None, content_type=None):
+        response = self.client.open(
+            path, method=method, json=json, data=form if form is not None else data, content_type=content_type
+        )
+        body = response.get_data()
+        response.close()
+        return response.status_code, body
+
+    def close(self):
+        pass
+
+
+class HttpDriver:
+    """Conexion keep-alive propia (un driver por hilo) y cookie de sesion."""
+
+    def __init__(self, host: str, port: int, timeout: float = 30):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.cookies = {}
+        self._conn = None
+
+    def request(self, method: str, path: str, json=None, form=None, data=None, content_type=None):
+        headers = {}
+        body = data
+        if json is not None:
+            body = dumps(json).encode()
+            headers["Content-Type"] = "application/json"
+        elif form is not None:
+            body = urlencode(form).encode()
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        elif content_type:
+            headers["Content-Type"] = content_type
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+
+        for attempt in range(2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._conn.request(method, path, body=body, headers=headers)
+                response = self._conn.getresponse()
+                payload = response.read()
+                break
+            except (ConnectionError, http.client.HTTPException):
+                # El servidor cerro la conexion keep-alive: se reabre una vez.
+                self._conn.close()
+                self._conn = None
+                if attempt:
+                    raise
+
+        for header in response.headers.get_all("Set-Cookie") or ():
+            for name, morsel in SimpleCookie(header).items():
+                self.cookies[name] = morsel.value
+        return response.status, payload
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+
+
+# -------------------------
+# ESCENARIOS
+# Cada escenario recibe (driver, rng, ctx) y hace una o mas peticiones con
+# ctx.call(nombre, driver, metodo, ruta, ...), que mide cada una.
+# ctx.ids tiene el maximo id por tabla para elegir filas al azar.
+# Los que escriben dejan la base como estaba (crean y luego borran).
+# -------------------------
+
+def _car(rng, ctx):
+    return rng.randint(1, ctx.ids["cars"])
+
+
+def login(driver, rng, ctx):
+    user_id = rng.randint(1, ctx.ids["users"])
+    ctx.call("login", driver, "POST", "/login", json={"email": f"user{user_id}@bench.example", "password": PASSWORD})
+
+
+def logout_login(driver, rng, ctx):
+    ctx.call("logout", driver, "GET", "/logout")
+    login(driver, rng, ctx)
+
+
+def list_cars(driver, rng, ctx):
+    ctx.call("list_cars", driver, "GET", "/cars?limit=50")
+
+
+def list_cars_filtered(driver, rng, ctx):
+    brand = rng.choice(ctx.brands)
+    ctx.call("list_cars_filtered", driver, "GET", f"/cars?brand={brand}&sort=-year&limit=50")
+
+
+def get_car(driver, rng, ctx):
+    ctx.call("get_car", driver, "GET", f"/cars/{_car(rng, ctx)}")
+
+
+def car_stats(driver, rng, ctx):
+    ctx.call("car_stats", driver, "GET", f"/cars/{_car(rng, ctx)}/stats")
+
+
+def list_users(driver, rng, ctx):
+    ctx.call("list_users", driver, "GET", "/users?limit=50")
+
+
+def get_user(driver, rng, ctx):
+    user_id = rng.randint(1, ctx.ids["users"])
+    ctx.call("get_user", driver, "GET", f"/users/{user_id}")
+    ctx.call("user_stats", driver, "GET", f"/users/{user_id}/stats")
+
+
+def list_service_records(driver, rng, ctx):
+    ctx.call("list_service_records", driver, "GET", f"/service-records?car_id={_car(rng, ctx)}")
+
+
+def list_service_records_range(driver, rng, ctx):
+    start = date(2025, 1, 1) + timedelta(days=rng.randint(0, 300))
+    end = start + timedelta(days=30)
+    ctx.call("list_service_records_range", driver, "GET",
+             f"/service-records?date_from={start}&date_to={end}&sort=-service_date&limit=100")
+
+
+def get_service_record(driver, rng, ctx):
+    ctx.call("get_service_record", driver, "GET", f"/service-records/{rng.randint(1, ctx.ids['service_records'])}")
+
+
+def list_car_documents(driver, rng, ctx):
+    ctx.call("list_car_documents", driver, "GET", "/car-documents?limit=100")
+
+
+def get_car_document(driver, rng, ctx):
+    ctx.call("get_car_document", driver, "GET", f"/car-documents/{rng.randint(1, ctx.ids['car_documents'])}")
+
+
+def expiring_documents(driver, rng, ctx):
+    ctx.call("expiring_documents", driver, "GET", "/car-documents/expiring?within=30d")
+
+
+def view_car_services(driver, rng, ctx):
+    ctx.call("view_car_services", driver, "GET", f"/view/cars/{_car(rng, ctx)}/services")
+
+
+def view_car_documents(driver, rng, ctx):
+    ctx.call("view_car_documents", driver, "GET", f"/view/cars/{_car(rng, ctx)}/documents")
+
+
+def documents_page(driver, rng, ctx):
+    ctx.call("documents_page", driver, "GET", "/view/documents")
+
+
+def template_pages(driver, rng, ctx):
+    car_id = _car(rng, ctx)
+    paths = (
+        "/", "/login", "/register", "/static/js/app.js",
+        "/view/cars", "/view/cars/create", f"/view/cars/{car_id}/edit",
+        "/view/users", "/view/users/create",
+        "/view/services", "/view/services/create",
+        f"/view/services/{rng.randint(1, ctx.ids['service_records'])}/edit",
+        f"/documents/{rng.randint(1, ctx.ids['car_documents'])}/edit",
+        "/view/documents/expiring",
+    )
+    for path in paths:
+        ctx.call("template_pages", driver, "GET", path)
+
+
+def search(driver, rng, ctx):
+    ctx.call("search", driver, "GET", f"/search?q={rng.choice(ctx.brands)[:4]}")
+
+
+def service_due(driver, rng, ctx):
+    ctx.call("service_due", driver, "GET", "/service-due?within=30d")
+
+
+def analytics(driver, rng, ctx):
+    ctx.call("analytics", driver, "GET", "/analytics/services?date_from=2025-01-01")
+
+
+def ops_endpoints(driver, rng, ctx):
+    for path in ("/metrics", "/db/pool", "/cache", "/jobs"):
+        ctx.call("ops_endpoints", driver, "GET", path)
+
+
+def write_service_cycle(driver, rng, ctx):
+    """Alta, edicion y baja de un servicio."""
+    car_id = _car(rng, ctx)
+    payload = {"car_id": car_id, "service_type": "cambio de aceite", "service_date": "2026-01-01",
+               "mileage": 100_000, "cost": 950}
+    status, body = ctx.call("create_service_record", driver, "POST", "/service-records", json=payload)
+    if status != 201:
+        return
+    record_id = loads(body)["id"]
+    ctx.call("update_service_record", driver, "PUT", f"/service-records/{record_id}",
+             json=dict(payload, cost=990))
+    ctx.call("delete_service_record", driver, "DELETE", f"/service-records/{record_id}")
+
+
+def write_document_cycle(driver, rng, ctx):
+    car_id = _car(rng, ctx)
+    status, body = ctx.call("create_document", driver, "POST", f"/cars/{car_id}/documents",
+                            json={"doc_type": "seguro", "folio": "BENCH-1", "expires_at": "2026-06-30"})
+    if status != 201:
+        return
+    doc_id = loads(body)["id"]
+    ctx.call("edit_document", driver, "POST", f"/documents/{doc_id}/edit",
+             form={"doc_type": "seguro", "folio": "BENCH-2", "expires_at": "2026-07-31", "notes": ""})
+    ctx.call("delete_document", driver, "POST", f"/documents/{doc_id}/delete")
+
+
+def update_car(driver, rng, ctx):
+    car_id = _car(rng, ctx)
+    status, body = ctx.call("get_car", driver, "GET", f"/cars/{car_id}")
+    if status != 200:
+        return
+    car = loads(body)
+    ctx.call("update_car", driver, "PUT", f"/cars/{car_id}",
+             json={"brand": car["brand"], "model": car["model"], "year": car["year"], "plate": car["plate"]})
+
+
+def owner_lifecycle(driver, rng, ctx):
+    """
+    Un duenio completo de principio a fin: registro, coche, servicios
+    (individual, bulk e importacion CSV), documentos, ediciones y bajas
+    (la del usuario borra todo en cascada).
+    """
+    email = f"bench-{uuid.uuid4().hex}@bench.example"
+    # Alta por el registro publico o por la API de usuarios, alternando.
+    name, path = rng.choice((("register", "/register"), ("create_user", "/users")))
+    status, body = ctx.call(name, driver, "POST", path,
+                            json={"name": "Bench Owner", "email": email, "password": PASSWORD})
+    if status != 201:
+        return
+    user_id = loads(body)["id"]
+    ctx.call("update_user", driver, "PUT", f"/users/{user_id}", json={"name": "Bench Owner 2", "email": email})
+
+    status, body = ctx.call("create_car", driver, "POST", "/cars",
+                            json={"user_id": user_id, "brand": "Nissan", "model": "Versa", "year": 2020})
+    if status != 201:
+        return
+    car_id = loads(body)["id"]
+
+    ctx.call("create_service_for_car", driver, "POST", f"/cars/{car_id}/services",
+             json={"service_type": "frenos", "service_date": "2025-05-01", "mileage": 30_000, "cost": 1800})
+    items = [
+        {"car_id": car_id, "service_type": "cambio de aceite", "service_date": f"2024-{m:02d}-01",
+         "mileage": 10_000 + m * 1000, "cost": 900}
+        for m in range(1, 13)
+    ]
+    status, body = ctx.call("bulk_create_services", driver, "POST", "/service-records/bulk", json={"items": items})
+    if status == 201:
+        ids = [r["id"] for r in loads(body)["results"]]
+        ctx.call("bulk_delete_services", driver, "DELETE", "/service-records/bulk", json={"ids": ids})
+
+    csv_rows = "\n".join(f"{car_id},afinacion,2023-{m:02d}-15,{5000 * m},2500" for m in range(1, 13))
+    ctx.call("import_services", driver, "POST", "/service-records/import",
+             data=("car_id,service_type,service_date,mileage,cost\n" + csv_rows).encode(), content_type="text/csv")
+
+    status, body = ctx.call("create_car_document", driver, "POST", "/car-documents",
+                            json={"car_id": car_id, "doc_type": "tenencia", "folio": "T-1", "expires_at": "2026-03-31"})
+    if status == 201:
+        doc_id = loads(body)["id"]
+        ctx.call("update_car_document", driver, "PUT", f"/car-documents/{doc_id}",
+                 json={"doc_type": "tenencia", "folio": "T-2", "expires_at": "2026-04-30"})
+    docs = [{"car_id": car_id, "doc_type": "seguro", "folio": f"S-{i}", "expires_at": "2026-12-31"} for i in range(5)]
+    status, body = ctx.call("bulk_create_documents", driver, "POST", "/car-documents/bulk", json={"items": docs})
+    if status == 201:
+        ids = [r["id"] for r in loads(body)["results"]]
+        ctx.call("bulk_delete_documents", driver, "DELETE", "/car-documents/bulk", json={"ids": ids})
+
+    cars = [{"user_id": user_id, "brand": "Kia", "model": "Rio", "year": 2018 + i} for i in range(3)]
+    status, body = ctx.call("bulk_create_cars", driver, "POST", "/cars/bulk", json={"items": cars})
+    if status == 201:
+        ids = [r["id"] for r in loads(body)["results"]]
+        ctx.call("bulk_delete_cars", driver, "DELETE", "/cars/bulk", json={"ids": ids})
+
+    ctx.call("delete_car", driver, "DELETE", f"/cars/{car_id}")
+    ctx.call("delete_user", driver, "DELETE", f"/users/{user_id}")
+
+
+def export_history(driver, rng, ctx):
+    """Exportacion de un duenio: alta del trabajo, consulta de estado y descarga."""
+    user_id = rng.randint(1, ctx.ids["users"])
+    status, body = ctx.call("create_export", driver, "POST", "/exports", json={"format": "csv", "user_id": user_id})
+    if status != 202:
+        return
+    job_id = loads(body)["id"]
+    for _ in range(50):
+        status, body = ctx.call("export_status", driver, "GET", f"/exports/{job_id}")
+        if status != 200 or loads(body)["status"] in ("done", "error"):
+            break
+        time.sleep(0.02)
+    ctx.call("export_download", driver, "GET", f"/exports/{job_id}/download")
+
+
+# Mezcla por defecto: (escenario, peso). Lecturas dominan, como en produccion.
+MIX = (
+    (list_cars, 10),
+    (list_cars_filtered, 6),
+    (get_car, 12),
+    (car_stats, 4),
+    (list_users, 3),
+    (get_user, 4),
+    (list_service_records, 10),
+    (list_service_records_range, 4),
+    (get_service_record, 5),
+    (list_car_documents, 4),
+    (get_car_document, 4),
+    (expiring_documents, 3),
+    (view_car_services, 8),
+    (view_car_documents, 6),
+    (documents_page, 2),
+    (template_pages, 1),
+    (search, 4),
+    (service_due, 2),
+    (analytics, 1),
+    (ops_endpoints, 1),
+    (write_service_cycle, 4),
+    (write_document_cycle, 2),
+    (update_car, 2),
+    (owner_lifecycle, 1),
+    (export_history, 1),
+    (login, 1),
+    (logout_login, 1),
+)
+
+# Solo las lecturas que en modo ASGI corren en el event loop
+# (web.async_view): para comparar wsgi contra asgi sin ruido de escrituras.
+READ_MIX = (
+    (list_cars, 10),
+    (list_cars_filtered, 6),
+    (list_service_records, 10),
+    (list_service_records_range, 4),
+    (list_car_documents, 4),
+    (view_car_services, 8),
+    (documents_page, 2),
+)
+
+MIXES = {"default": MIX, "reads": READ_MIX}
+
+# Rutas que la mezcla no ejercita a proposito: reinician el esquema o
+# disparan trabajos en medio de la medicion.
+EXCLUDED_ROUTES = {
+    ("/init-db", "GET"),
+    ("/jobs/<name>/run", "POST"),
+}
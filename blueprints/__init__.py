@@ -0,0 +1,14 @@
+from blueprints import auth, cars, documents, ops, reports, services, users
+
+# create_app registra sus hooks (trabajos, metricas) antes que estos
+# blueprints, asi enforce_authentication de auth corre despues y los 401
+# tambien se miden.
+BLUEPRINTS = (
+    auth.bp,
+    users.bp,
+    cars.bp,
+    services.bp,
+    documents.bp,
+    reports.bp,
+    ops.bp,
+)
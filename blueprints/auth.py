@@ -0,0 +1,181 @@
+import hmac
+
+from flask import Blueprint, current_app, jsonify, redirect, render_template, request, session, url_for
+
+import passwords
+from web import create_user_in_db, db_write, get_db, tenant_slug
+
+bp = Blueprint("auth", __name__)
+
+PUBLIC_ENDPOINTS = {
+    "static",
+    "auth.login_page",
+    "auth.register_page",
+    "auth.logout",
+    "users.create_user",
+    "ops.initialize_database",
+}
+
+
+def verify_password(stored_password: str, raw_password: str):
+    return current_app.extensions["password_hasher"].verify(stored_password, raw_password)
+
+
+def login_retry_after(email: str):
+    """
+    Token bucket por email y por IP, antes de tocar la DB o el hash.
+    Devuelve los segundos a esperar (0 si el intento se permite).
+    """
+    limiter = current_app.extensions["login_limiter"]
+    return max(
+        limiter.consume(f"ip:{request.remote_addr}"),
+        limiter.consume(f"email:{email}"),
+    )
+
+
+def metrics_allowed():
+    """
+    /metrics sin sesion: solo con METRICS_PUBLIC o con
+    "Authorization: Bearer <METRICS_TOKEN>". Por defecto ninguno de los dos.
+    """
+    if current_app.config["METRICS_PUBLIC"]:
+        return True
+    token = current_app.config["METRICS_TOKEN"]
+    if not token:
+        return False
+    scheme, _, value = request.headers.get("Authorization", "").partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(value.strip().encode(), token.encode())
+
+
+def current_user_id():
+    """Usuario de la sesion; con talleres solo si la sesion es del taller del request."""
+    if session.get("tenant") != tenant_slug():
+        return None
+    return session.get("user_id")
+
+
+@bp.before_app_request
+def enforce_authentication():
+    if request.endpoint in PUBLIC_ENDPOINTS:
+        return None
+    if request.endpoint is None:
+        return None
+    if request.method == "OPTIONS":
+        return None
+    if request.endpoint == "ops.prometheus_metrics" and metrics_allowed():
+        return None
+    if current_user_id():
+        return None
+    if request.path.startswith("/view") or request.path == "/":
+        return redirect(url_for("auth.login_page"))
+    return jsonify({"error": "No autenticado"}), 401
+
+
+@bp.app_context_processor
+def inject_user():
+    return {
+        "is_authenticated": bool(current_user_id()),
+        "current_user_name": session.get("user_name"),
+        "current_user_email": session.get("user_email"),
+    }
+
+
+@bp.route("/")
+def home():
+    if not current_user_id():
+        return redirect(url_for("auth.login_page"))
+    return redirect(url_for("cars.cars_page"))
+
+
+@bp.route("/login", methods=["GET", "POST"])
+def login_page():
+    if request.method == "GET":
+        if current_user_id():
+            return redirect(url_for("cars.cars_page"))
+        return render_template("auth/login.html", error=None)
+
+    data = request.get_json(silent=True) if request.is_json else request.form
+    email = (data.get("email") or "").strip().lower()
+    password = (data.get("password") or "").strip()
+
+    if not email or not password:
+        error = "Faltan campos obligatorios: email, password"
+        if request.is_json:
+            return jsonify({"error": error}), 400
+        return render_template("auth/login.html", error=error), 400
+
+    retry_after = login_retry_after(email)
+    if retry_after:
+        error = "Demasiados intentos, espera un momento"
+        headers = {"Retry-After": str(int(retry_after) + 1)}
+        if request.is_json:
+            return jsonify({"error": error}), 429, headers
+        return render_template("auth/login.html", error=error), 429, headers
+
+    conn = get_db()
+    user = conn.execute(
+        "SELECT id, name, email, password FROM users WHERE email = ?",
+        (email,),
+    ).fetchone()
+
+    if user is None or not verify_password(user["password"], password):
+        error = "Credenciales invalidas"
+        if request.is_json:
+            return jsonify({"error": error}), 401
+        return render_template("auth/login.html", error=error), 401
+
+    # Migra automaticamente passwords antiguas guardadas en texto plano.
+    if not passwords.is_hashed(user["password"]):
+        password_hash = current_app.extensions["password_hasher"].hash(password)
+        with db_write() as conn:
+            conn.execute(
+                "UPDATE users SET password = ? WHERE id = ?",
+                (password_hash, user["id"]),
+            )
+
+    session.clear()
+    session["user_id"] = user["id"]
+    session["user_name"] = user["name"]
+    session["user_email"] = user["email"]
+    if tenant_slug() is not None:
+        session["tenant"] = tenant_slug()
+
+    if request.is_json:
+        return jsonify({"message": "Login correcto"}), 200
+
+    return redirect(url_for("cars.cars_page"))
+
+
+@bp.route("/register", methods=["GET", "POST"])
+def register_page():
+    if request.method == "GET":
+        return render_template("auth/register.html", error=None)
+
+    data = request.get_json(silent=True) if request.is_json else request.form
+    name = (data.get("name") or "").strip()
+    email = (data.get("email") or "").strip().lower()
+    password = (data.get("password") or "").strip()
+
+    if not name or not email or not password:
+        error = "Faltan campos obligatorios: name, email, password"
+        if request.is_json:
+            return jsonify({"error": error}), 400
+        return render_template("auth/register.html", error=error), 400
+
+    user_id, create_error = create_user_in_db(name, email, password)
+    if create_error == "email_exists":
+        error = "El email ya esta registrado"
+        if request.is_json:
+            return jsonify({"error": error}), 409
+        return render_template("auth/register.html", error=error), 409
+
+    if request.is_json:
+        return jsonify({"message": "Usuario creado", "id": user_id}), 201
+
+    return redirect(url_for("auth.login_page"))
+
+
+@bp.route("/logout", methods=["GET"])
+def logout():
+    session.clear()
+    return redirect(url_for("auth.login_page"))
@@ -0,0 +1,230 @@
+from flask import Blueprint, jsonify, render_template, request
+
+import cache
+import stats
+from query import ListQuery
+from web import (
+    async_view,
+    bulk_create,
+    bulk_delete,
+    cached_response,
+    conditional_get,
+    db_write,
+    fetch_car_with_owner,
+    get_db,
+    int_arg,
+    new_ids,
+    page_response,
+    page_response_async,
+    route_to_owner,
+    route_to_shard,
+    validate_car,
+)
+
+bp = Blueprint("cars", __name__)
+
+
+# -------------------------
+# VISTAS (TEMPLATES)
+# -------------------------
+
+@bp.route("/view/cars")
+def cars_page():
+    return render_template("cars/cars.html")
+
+
+@bp.route("/view/cars/create")
+def cars_create_page():
+    return render_template("cars/create_car.html")
+
+
+@bp.route("/view/cars/<int:car_id>/edit")
+@route_to_shard("cars", "car_id")
+def cars_edit_page(car_id):
+    conn = get_db()
+    car = conn.execute("SELECT * FROM cars WHERE id = ?", (car_id,)).fetchone()
+
+    if car is None:
+        return "Car not found", 404
+
+    return render_template("cars/edit_car.html", car=car)
+
+
+# -------------------------
+# API CARS (CRUD)
+# -------------------------
+
+@bp.route("/cars", methods=["POST"])
+def create_car():
+    car, error = validate_car(request.get_json(silent=True) or {})
+    if error:
+        return jsonify({"error": error}), 400
+
+    if not route_to_owner(car["user_id"]):
+        return jsonify({"error": "Usuario no encontrado"}), 404
+
+    conn = get_db()
+
+    user_exists = conn.execute("SELECT id FROM users WHERE id = ?", (car["user_id"],)).fetchone()
+    if user_exists is None:
+        return jsonify({"error": "Usuario no encontrado"}), 404
+
+    car["id"] = new_ids("cars")[0]
+    with db_write() as conn:
+        cursor = conn.execute("""
+            INSERT INTO cars (id, user_id, brand, model, year, plate)
+            VALUES (:id, :user_id, :brand, :model, :year, :plate)
+        """, car)
+    car_id = cursor.lastrowid
+
+    return jsonify({"message": "Coche creado", "id": car_id}), 201
+
+
+def car_list_tags(response):
+    return [("cars", cache.ANY_ROW), ("users", cache.ANY_ROW)]
+
+
+def cars_query():
+    """
+    ListQuery de /cars con los filtros de la query string.
+    Lanza ValueError si user_id, year_min o year_max no son enteros.
+    """
+    query = ListQuery("""
+        SELECT
+            cars.id,
+            cars.user_id,
+            users.name AS user_name,
+            cars.brand,
+            cars.model,
+            cars.year,
+            cars.plate
+        FROM cars
+        JOIN users ON users.id = cars.user_id
+    """, "cars.id", sort_fields={
+        "brand": "cars.brand COLLATE NOCASE",
+        "model": "cars.model",
+        "year": "cars.year",
+    })
+
+    user_id = int_arg("user_id")
+    year_min = int_arg("year_min")
+    year_max = int_arg("year_max")
+    brand = (request.args.get("brand") or "").strip()
+
+    if user_id is not None:
+        query.filter("cars.user_id = ?", user_id)
+    if brand:
+        query.filter("cars.brand = ? COLLATE NOCASE", brand)
+    if year_min is not None:
+        query.filter("cars.year >= ?", year_min)
+    if year_max is not None:
+        query.filter("cars.year <= ?", year_max)
+    return query
+
+
+@bp.route("/cars", methods=["GET"])
+@conditional_get("cars", "users")
+@cached_response(car_list_tags)
+def get_cars():
+    """
+    Filtros: user_id, brand (sin distinguir mayusculas), year_min, year_max.
+    Orden (?sort=, "-" para descendente): id, brand, model, year.
+    """
+    try:
+        query = cars_query()
+    except ValueError:
+        return jsonify({"error": "user_id, year_min y year_max deben ser numéricos"}), 400
+    return page_response(query)
+
+
+@async_view("cars.get_cars")
+@conditional_get("cars", "users")
+@cached_response(car_list_tags)
+async def get_cars_async():
+    try:
+        query = cars_query()
+    except ValueError:
+        return jsonify({"error": "user_id, year_min y year_max deben ser numéricos"}), 400
+    return await page_response_async(query)
+
+
+@bp.route("/cars/<int:car_id>", methods=["GET"])
+@route_to_shard("cars", "car_id")
+@conditional_get("cars", "users")
+@cached_response(lambda response, car_id: [
+    ("cars", car_id),
+    ("users", (response.get_json(silent=True) or {}).get("user_id")),
+])
+def get_car(car_id):
+    conn = get_db()
+    car = fetch_car_with_owner(conn, car_id)
+
+    if car is None:
+        return jsonify({"error": "Coche no encontrado"}), 404
+
+    return jsonify(dict(car)), 200
+
+
+@bp.route("/cars/<int:car_id>/stats", methods=["GET"])
+@route_to_shard("cars", "car_id")
+def get_car_stats(car_id):
+    """Gasto total, numero de servicios, ultimo servicio y km (rollup car_stats)."""
+    conn = get_db()
+    car = conn.execute("SELECT id FROM cars WHERE id = ?", (car_id,)).fetchone()
+    if car is None:
+        return jsonify({"error": "Coche no encontrado"}), 404
+
+    return jsonify(stats.car_stats(conn, car_id)), 200
+
+
+@bp.route("/cars/<int:car_id>", methods=["PUT"])
+@route_to_shard("cars", "car_id")
+def update_car(car_id):
+    data = request.get_json(silent=True) or {}
+
+    brand = data.get("brand")
+    model = data.get("model")
+    year = data.get("year")
+    plate = data.get("plate")
+
+    if not brand or not model or year is None:
+        return jsonify({"error": "Faltan campos obligatorios: brand, model, year"}), 400
+
+    try:
+        year = int(year)
+    except (ValueError, TypeError):
+        return jsonify({"error": "year debe ser numérico"}), 400
+
+    with db_write() as conn:
+        cursor = conn.execute("""
+            UPDATE cars
+            SET brand = ?, model = ?, year = ?, plate = ?
+            WHERE id = ?
+        """, (brand, model, year, plate, car_id))
+
+    if cursor.rowcount == 0:
+        return jsonify({"error": "Coche no encontrado"}), 404
+
+    return jsonify({"message": "Coche actualizado"}), 200
+
+
+@bp.route("/cars/<int:car_id>", methods=["DELETE"])
+@route_to_shard("cars", "car_id")
+def delete_car(car_id):
+    with db_write() as conn:
+        cursor = conn.execute("DELETE FROM cars WHERE id = ?", (car_id,))
+
+    if cursor.rowcount == 0:
+        return jsonify({"error": "Coche no encontrado"}), 404
+
+    return jsonify({"message": "Coche eliminado"}), 200
+
+
+@bp.route("/cars/bulk", methods=["POST"])
+def create_cars_bulk():
+    return bulk_create("cars")
+
+
+@bp.route("/cars/bulk", methods=["DELETE"])
+def delete_cars_bulk():
+    return bulk_delete("cars")
@@ -0,0 +1,413 @@
+from datetime import date, timedelta
+
+from flask import Blueprint, jsonify, redirect, render_template, request, url_for
+
+import cache
+from query import ListQuery
+from shards import merge_sorted, sql_order_key
+from web import (
+    EXPIRES_AT_ERROR,
+    async_db,
+    async_view,
+    bulk_create,
+    bulk_delete,
+    cached_response,
+    conditional_get,
+    database_cache,
+    db_write,
+    fetch_car_with_owner,
+    fan_out_shards,
+    fetch_document,
+    fetch_page,
+    get_db,
+    is_valid_expires_at,
+    new_ids,
+    page_response,
+    page_response_async,
+    parse_page_args,
+    parse_within,
+    route_to_row,
+    route_to_shard,
+    validate_car_document,
+)
+
+bp = Blueprint("documents", __name__)
+
+
+# -------------------------
+# DOCUMENTS (por carro)
+# -------------------------
+
+@bp.route("/view/cars/<int:car_id>/documents", methods=["GET"])
+@route_to_shard("cars", "car_id")
+def view_car_documents(car_id):
+    """
+    Vista por carro: documentos.
+    Template: templates/documents/car_documents.html
+    """
+    conn = get_db()
+
+    car = fetch_car_with_owner(conn, car_id)
+    if car is None:
+        return "Car not found", 404
+
+    documents = conn.execute("""
+        SELECT id, car_id, doc_type, folio, expires_at, notes
+        FROM car_documents
+        WHERE car_id = ?
+        ORDER BY expires_at DESC
+    """, (car_id,)).fetchall()
+
+    return render_template("documents/car_documents.html", car=car, documents=documents)
+
+
+@bp.route("/cars/<int:car_id>/documents", methods=["POST"])
+@route_to_shard("cars", "car_id")
+def create_document_by_car(car_id):
+    """
+    Crear documento para un coche.
+    - Template (form-data): redirige a /view/cars/<id>/documents
+    - Postman (JSON): responde JSON 201
+    """
+    data_json = request.get_json(silent=True)
+
+    if data_json:
+        doc_type = (data_json.get("doc_type") or "").strip()
+        folio = (data_json.get("folio") or "").strip()
+        expires_at = (data_json.get("expires_at") or "").strip()
+        notes = (data_json.get("notes") or "").strip()
+    else:
+        doc_type = (request.form.get("doc_type") or "").strip()
+        folio = (request.form.get("folio") or "").strip()
+        expires_at = (request.form.get("expires_at") or "").strip()
+        notes = (request.form.get("notes") or "").strip()
+
+    if not doc_type or not folio or not expires_at:
+        if data_json:
+            return jsonify({"error": "Faltan campos: doc_type, folio, expires_at"}), 400
+        return "Faltan campos del formulario", 400
+
+    if not is_valid_expires_at(expires_at):
+        if data_json:
+            return jsonify({"error": EXPIRES_AT_ERROR}), 400
+        return EXPIRES_AT_ERROR, 400
+
+    conn = get_db()
+
+    car_exists = conn.execute("SELECT id FROM cars WHERE id = ?", (car_id,)).fetchone()
+    if car_exists is None:
+        if data_json:
+            return jsonify({"error": "Coche no encontrado"}), 404
+        return "Car not found", 404
+
+    doc_id = new_ids("car_documents")[0]
+    with db_write() as conn:
+        cur = conn.execute("""
+            INSERT INTO car_documents (id, car_id, doc_type, folio, expires_at, notes)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (doc_id, car_id, doc_type, folio, expires_at, notes if notes else None))
+    new_id = cur.lastrowid
+
+    if data_json:
+        return jsonify({"message": "Documento creado", "id": new_id}), 201
+
+    return redirect(url_for("documents.view_car_documents", car_id=car_id))
+
+
+@bp.route("/documents/<int:doc_id>/edit", methods=["GET", "POST"])
+@route_to_shard("car_documents", "doc_id")
+def edit_document(doc_id):
+    """
+    Editar documento:
+    - GET: templates/documents/edit_document.html
+    - POST: actualiza y regresa a /view/cars/<car_id>/documents
+    """
+    conn = get_db()
+    document = fetch_document(conn, doc_id)
+
+    if document is None:
+        return "Document not found", 404
+
+    car = fetch_car_with_owner(conn, document["car_id"])
+    if car is None:
+        return "Car not found", 404
+
+    if request.method == "GET":
+        return render_template("documents/edit_document.html", car=car, document=document)
+
+    # POST
+    doc_type = (request.form.get("doc_type") or "").strip()
+    folio = (request.form.get("folio") or "").strip()
+    expires_at = (request.form.get("expires_at") or "").strip()
+    notes = (request.form.get("notes") or "").strip()
+
+    if not doc_type or not folio or not expires_at:
+        return "Faltan campos del formulario", 400
+    if not is_valid_expires_at(expires_at):
+        return EXPIRES_AT_ERROR, 400
+
+    with db_write() as conn:
+        conn.execute("""
+            UPDATE car_documents
+            SET doc_type = ?, folio = ?, expires_at = ?, notes = ?
+            WHERE id = ?
+        """, (doc_type, folio, expires_at, notes if notes else None, doc_id))
+
+    return redirect(url_for("documents.view_car_documents", car_id=car["id"]))
+
+
+@bp.route("/documents/<int:doc_id>/delete", methods=["POST"])
+@route_to_shard("car_documents", "doc_id")
+def delete_document_template(doc_id):
+    """
+    Delete desde template (form POST).
+    """
+    conn = get_db()
+    document = fetch_document(conn, doc_id)
+
+    if document is None:
+        return "Document not found", 404
+
+    car_id = document["car_id"]
+
+    with db_write() as conn:
+        conn.execute("DELETE FROM car_documents WHERE id = ?", (doc_id,))
+
+    return redirect(url_for("documents.view_car_documents", car_id=car_id))
+
+
+# -------------------------
+# API CAR DOCUMENTS (OPCIONAL PARA POSTMAN)
+# -------------------------
+
+def car_documents_query():
+    return ListQuery("""
+        SELECT id, car_id, doc_type, folio, expires_at, notes
+        FROM car_documents
+    """, "id")
+
+
+@bp.route("/car-documents", methods=["GET"])
+@conditional_get("car_documents")
+def get_car_documents():
+    return page_response(car_documents_query())
+
+
+@async_view("documents.get_car_documents")
+@conditional_get("car_documents")
+async def get_car_documents_async():
+    return await page_response_async(car_documents_query())
+
+
+def expiry_buckets(conn, start: str, end: str):
+    rows = conn.execute("""
+        SELECT expires_on, COUNT(*) AS total
+        FROM car_documents
+        WHERE expires_on >= ? AND expires_on <= ?
+        GROUP BY expires_on
+        ORDER BY expires_on
+    """, (start, end)).fetchall()
+    return {r["expires_on"]: r["total"] for r in rows}
+
+
+@bp.route("/car-documents/expiring", methods=["GET"])
+def get_expiring_documents():
+    """
+    Documentos que vencen entre hoy y hoy + within (?within=30d).
+    Usa expires_on (fecha normalizada e indexada) y solo lee la ventana.
+    Los conteos por dia se cachean hasta que cambia car_documents.
+    """
+    try:
+        days = parse_within(request.args.get("within"))
+        limit, after = parse_page_args()
+    except ValueError:
+        return jsonify({"error": "within debe ser como 30d o 2w (máximo 366 días)"}), 400
+
+    start = date.today().isoformat()
+    end = (date.today() + timedelta(days=days)).isoformat()
+
+    query = ListQuery("""
+        SELECT
+            cd.id,
+            cd.car_id,
+            cd.doc_type,
+            cd.folio,
+            cd.expires_at,
+            cd.expires_on,
+            cd.notes,
+            c.brand,
+            c.model,
+            c.plate,
+            u.name AS user_name
+        FROM car_documents cd
+        JOIN cars c ON c.id = cd.car_id
+        JOIN users u ON u.id = c.user_id
+    """, "cd.id", sort_fields={"expires_on": "cd.expires_on"})
+    query.filter("cd.expires_on >= ? AND cd.expires_on <= ?", start, end)
+    query.order_by("expires_on")
+
+    try:
+        rows, next_cursor = fetch_page(query, limit, after)
+    except ValueError:
+        return jsonify({"error": "Cursor after inválido"}), 400
+
+    shards = fan_out_shards()
+    if shards is None:
+        buckets = database_cache("expiry_buckets").get_or_compute(
+            get_db(), (start, end), lambda c: expiry_buckets(c, start, end)
+        )
+    else:
+        buckets = {}
+        for part in shards.fan_out(expiry_buckets, start, end):
+            for day, total in part.items():
+                buckets[day] = buckets.get(day, 0) + total
+        buckets = dict(sorted(buckets.items()))
+
+    return jsonify({
+        "from": start,
+        "to": end,
+        "total": sum(buckets.values()),
+        "buckets": buckets,
+        "items": [dict(r) for r in rows],
+        "next_cursor": next_cursor,
+    }), 200
+
+
+@bp.route("/car-documents/<int:doc_id>", methods=["GET"])
+@route_to_shard("car_documents", "doc_id")
+@conditional_get("car_documents")
+def get_car_document(doc_id):
+    conn = get_db()
+    row = fetch_document(conn, doc_id)
+
+    if row is None:
+        return jsonify({"error": "Documento no encontrado"}), 404
+
+    return jsonify(dict(row)), 200
+
+
+@bp.route("/car-documents", methods=["POST"])
+def create_car_document_general():
+    """
+    Crear documento indicando car_id (para Postman).
+    Body JSON:
+    { "car_id": 1, "doc_type": "...", "folio": "...", "expires_at": "YYYY-MM-DD", "notes": "..." }
+    """
+    document, error = validate_car_document(request.get_json(silent=True) or {})
+    if error:
+        return jsonify({"error": error}), 400
+
+    route_to_row("cars", document["car_id"])
+    conn = get_db()
+    car_exists = conn.execute("SELECT id FROM cars WHERE id = ?", (document["car_id"],)).fetchone()
+    if car_exists is None:
+        return jsonify({"error": "Coche no encontrado"}), 404
+
+    document["id"] = new_ids("car_documents")[0]
+    with db_write() as conn:
+        cur = conn.execute("""
+            INSERT INTO car_documents (id, car_id, doc_type, folio, expires_at, notes)
+            VALUES (:id, :car_id, :doc_type, :folio, :expires_at, :notes)
+        """, document)
+    new_id = cur.lastrowid
+
+    return jsonify({"message": "Documento creado", "id": new_id}), 201
+
+
+@bp.route("/car-documents/<int:doc_id>", methods=["PUT"])
+@route_to_shard("car_documents", "doc_id")
+def update_car_document(doc_id):
+    data = request.get_json(silent=True) or {}
+
+    doc_type = (data.get("doc_type") or "").strip()
+    folio = (data.get("folio") or "").strip()
+    expires_at = (data.get("expires_at") or "").strip()
+    notes = (data.get("notes") or "").strip()
+
+    if not doc_type or not folio or not expires_at:
+        return jsonify({"error": "Faltan campos: doc_type, folio, expires_at"}), 400
+    if not is_valid_expires_at(expires_at):
+        return jsonify({"error": EXPIRES_AT_ERROR}), 400
+
+    with db_write() as conn:
+        cursor = conn.execute("""
+            UPDATE car_documents
+            SET doc_type = ?, folio = ?, expires_at = ?, notes = ?
+            WHERE id = ?
+        """, (doc_type, folio, expires_at, notes if notes else None, doc_id))
+
+    if cursor.rowcount == 0:
+        return jsonify({"error": "Documento no encontrado"}), 404
+
+    return jsonify({"message": "Documento actualizado"}), 200
+
+
+@bp.route("/car-documents/bulk", methods=["POST"])
+def create_car_documents_bulk():
+    return bulk_create("car_documents")
+
+
+@bp.route("/car-documents/bulk", methods=["DELETE"])
+def delete_car_documents_bulk():
+    return bulk_delete("car_documents")
+
+
+# -------------------------
+# DOCUMENTS (GLOBAL VIEW)
+# -------------------------
+
+def document_list_tags(response):
+    return [("car_documents", cache.ANY_ROW), ("cars", cache.ANY_ROW), ("users", cache.ANY_ROW)]
+
+
+def fetch_documents_with_car(conn):
+    return conn.execute("""
+        SELECT
+            cd.id,
+            cd.car_id,
+            cd.doc_type,
+            cd.folio,
+            cd.expires_at,
+            cd.notes,
+            c.brand,
+            c.model,
+            c.plate,
+            u.name AS user_name
+        FROM car_documents cd
+        JOIN cars c ON c.id = cd.car_id
+        JOIN users u ON u.id = c.user_id
+        ORDER BY cd.expires_at DESC, cd.id DESC
+    """).fetchall()
+
+
+def document_order_key(row):
+    return sql_order_key(row["expires_at"]), row["id"]
+
+
+def fetch_all_documents_with_car():
+    """fetch_documents_with_car de la conexion del contexto o, con shards, de todos (merge k-way)."""
+    shards = fan_out_shards()
+    if shards is None:
+        return fetch_documents_with_car(get_db())
+    return list(merge_sorted(shards.fan_out(fetch_documents_with_car), key=document_order_key, reverse=True))
+
+
+@bp.route("/view/documents", methods=["GET"])
+@conditional_get("car_documents", "cars", "users", per_session=True)
+@cached_response(document_list_tags, per_session=True)
+def documents_page():
+    documents = fetch_all_documents_with_car()
+    return render_template("documents/documents.html", documents=documents)
+
+
+@async_view("documents.documents_page")
+@conditional_get("car_documents", "cars", "users", per_session=True)
+@cached_response(document_list_tags, per_session=True)
+async def documents_page_async():
+    documents = await async_db().run(fetch_documents_with_car)
+    return render_template("documents/documents.html", documents=documents)
+
+
+@bp.route("/view/documents/expiring", methods=["GET"])
+def expiring_documents_page():
+    return render_template("documents/expiring.html")
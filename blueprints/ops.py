@@ -0,0 +1,71 @@
+from flask import Blueprint, Response, current_app, jsonify
+
+import metrics
+import notifications
+from web import get_db, get_main_db, init_db, shard_set, tenant_stores
+
+bp = Blueprint("ops", __name__)
+
+
+@bp.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    return Response(metrics.REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+
+@bp.route("/cache", methods=["GET"])
+def cache_stats():
+    """Solo lectura: el cache se prende o apaga con RESPONSE_CACHE_ENABLED."""
+    return jsonify(current_app.extensions["response_cache"].stats()), 200
+
+
+@bp.route("/db/pool", methods=["GET"])
+def db_pool_stats():
+    data = current_app.extensions["db_pool"].stats()
+    if shard_set() is not None:
+        data["shards"] = shard_set().stats()
+    if tenant_stores() is not None:
+        data["tenants"] = tenant_stores().stats()
+    return jsonify(data), 200
+
+
+@bp.route("/init-db")
+def initialize_database():
+    init_db()
+    return "Base de datos inicializada correctamente"
+
+
+# -------------------------
+# TRABAJOS EN SEGUNDO PLANO
+# -------------------------
+
+@bp.route("/jobs", methods=["GET"])
+def list_jobs():
+    """
+    Estado de los trabajos periodicos y conteo de avisos por estado (con
+    talleres, los avisos son los del taller y los trabajos los de la base principal).
+    """
+    runner = current_app.extensions["jobs"]
+    return jsonify({
+        "worker_id": runner.worker_id,
+        "jobs": runner.status(get_main_db()),
+        "notifications": notification_counts(get_db()),
+    }), 200
+
+
+def notification_counts(conn):
+    """Avisos por estado; con shards viven junto a la flota y se suman."""
+    if shard_set() is None:
+        return notifications.counts(conn)
+    totals = {}
+    for part in shard_set().fan_out(notifications.counts):
+        for status, total in part.items():
+            totals[status] = totals.get(status, 0) + total
+    return totals
+
+
+@bp.route("/jobs/<name>/run", methods=["POST"])
+def run_job(name):
+    """Adelanta el trabajo a ahora; corre en segundo plano (202)."""
+    if not current_app.extensions["jobs"].trigger(get_main_db(), name):
+        return jsonify({"error": "Trabajo no encontrado"}), 404
+    return jsonify({"message": "Trabajo programado", "name": name}), 202
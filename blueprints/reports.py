@@ -0,0 +1,150 @@
+from flask import Blueprint, current_app, g, jsonify, request, send_file, url_for
+
+import exporter
+import search
+from web import database_cache, fan_out_shards, get_db, parse_page_args, tenant_slug
+
+bp = Blueprint("reports", __name__)
+
+
+# -------------------------
+# EXPORTACION DE HISTORIAL (auditorias)
+# -------------------------
+
+def export_status_response(status, code=200):
+    body = dict(status, status_url=url_for("reports.get_export", job_id=status["id"]))
+    if status["status"] == "done":
+        body["download_url"] = url_for("reports.download_export", job_id=status["id"])
+    return jsonify(body), code
+
+
+@bp.route("/exports", methods=["POST"])
+def create_export():
+    """
+    Body JSON: { "format": "csv" | "columnar", "user_id": 1, "car_id": 2 }
+    Sin user_id ni car_id exporta toda la flota. Responde 202 y el
+    archivo se genera en segundo plano.
+    """
+    data = request.get_json(silent=True) or {}
+    fmt = data.get("format", "csv")
+
+    if fmt not in exporter.FORMATS:
+        return jsonify({"error": "format debe ser csv o columnar"}), 400
+
+    try:
+        user_id = int(data["user_id"]) if data.get("user_id") is not None else None
+        car_id = int(data["car_id"]) if data.get("car_id") is not None else None
+    except (ValueError, TypeError):
+        return jsonify({"error": "user_id y car_id deben ser numéricos"}), 400
+
+    exports = current_app.extensions["exports"]
+    status = exports.submit(fmt, user_id, car_id, pools=export_pools(), tenant=tenant_slug())
+    return export_status_response(status, 202)
+
+
+def export_pools():
+    """Con talleres se exporta la base del taller; si no, las del ExportManager."""
+    store = g.get("tenant")
+    return [store] if store is not None else None
+
+
+def export_status(job_id):
+    """Estado del trabajo, o None si no existe o es de otro taller."""
+    status = current_app.extensions["exports"].status(job_id)
+    if status is None or status.get("tenant") != tenant_slug():
+        return None
+    return status
+
+
+@bp.route("/exports/<job_id>", methods=["GET"])
+def get_export(job_id):
+    status = export_status(job_id)
+    if status is None:
+        return jsonify({"error": "Exportación no encontrada"}), 404
+    return export_status_response(status)
+
+
+@bp.route("/exports/<job_id>/download", methods=["GET"])
+def download_export(job_id):
+    """Descarga con soporte de Range (reanudable) y ETag."""
+    status = export_status(job_id)
+    path = current_app.extensions["exports"].file_path(job_id) if status is not None else None
+    if path is None:
+        return jsonify({"error": "Exportación no encontrada o no terminada"}), 404
+
+    fmt = status["format"]
+    return send_file(
+        path,
+        mimetype=exporter.MIMETYPES[fmt],
+        as_attachment=True,
+        download_name=f"historial-{job_id}.{exporter.FORMATS[fmt]}",
+        conditional=True,
+    )
+
+
+# -------------------------
+# ANALITICA DE FLOTA
+# -------------------------
+
+@bp.route("/analytics/services", methods=["GET"])
+def get_service_analytics():
+    """
+    Tendencia mensual de costos, costo por km y distribucion de km entre
+    servicios de toda la flota. Filtros opcionales: date_from, date_to.
+    El resultado se cachea hasta que cambia service_records.
+    """
+    # NumPy se importa con la primera peticion de analitica, no al arrancar.
+    import analytics
+
+    if not analytics.available():
+        return jsonify({"error": "Analítica no disponible: falta instalar numpy"}), 501
+
+    date_from = (request.args.get("date_from") or "").strip() or None
+    date_to = (request.args.get("date_to") or "").strip() or None
+
+    shards = fan_out_shards()
+    if shards is not None:
+        parts = shards.fan_out(analytics.load_columns, date_from, date_to)
+        return jsonify(analytics.summarize(analytics.concat_columns(parts))), 200
+
+    result = database_cache("service_analytics").get_or_compute(
+        get_db(),
+        (date_from, date_to),
+        lambda conn: analytics.service_analytics(conn, date_from, date_to),
+    )
+    return jsonify(result), 200
+
+
+# -------------------------
+# BUSQUEDA (FTS5)
+# -------------------------
+
+@bp.route("/search", methods=["GET"])
+def search_records():
+    """
+    Busqueda por prefijo en coches (marca, modelo, placa) y documentos
+    (tipo, folio, notas). ?type=car|document limita la fuente.
+    Resultados por relevancia; el cursor after es el desplazamiento.
+    """
+    q = (request.args.get("q") or "").strip()
+    if not q:
+        return jsonify({"error": "Falta el parámetro q"}), 400
+
+    kind = request.args.get("type")
+    if kind and kind not in search.SOURCES:
+        return jsonify({"error": "type debe ser car o document"}), 400
+
+    try:
+        limit, after = parse_page_args()
+        offset = max(0, int(after or 0))
+    except ValueError:
+        return jsonify({"error": "limit y after deben ser numéricos"}), 400
+
+    kinds = [kind] if kind else None
+    shards = fan_out_shards()
+    if shards is None:
+        rows, next_cursor = search.search(get_db(), q, limit, offset, kinds)
+    else:
+        pages = shards.fan_out(search.search, q, limit + offset, 0, kinds)
+        rows, next_cursor = search.merge(pages, limit, offset)
+    return jsonify({"items": [dict(r) for r in rows], "next_cursor": next_cursor}), 200
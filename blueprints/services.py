@@ -0,0 +1,404 @@
+from datetime import date, timedelta
+
+from flask import Blueprint, current_app, jsonify, redirect, render_template, request, url_for
+
+import forecast
+import importer
+from query import ListQuery
+from web import (
+    BULK_VALIDATORS,
+    async_db,
+    async_view,
+    bulk_create,
+    bulk_delete,
+    conditional_get,
+    db_write,
+    fetch_car_with_owner,
+    fan_out_shards,
+    fetch_page,
+    get_db,
+    int_arg,
+    new_ids,
+    page_response,
+    page_response_async,
+    parse_page_args,
+    parse_within,
+    route_to_row,
+    route_to_shard,
+    validate_service_record,
+    write_targets,
+)
+
+bp = Blueprint("services", __name__)
+
+
+# -------------------------
+# VISTAS (TEMPLATES)
+# -------------------------
+
+@bp.route("/view/services")
+def services_page():
+    return render_template("services/services.html")
+
+
+@bp.route("/view/services/create")
+def services_create_page():
+    return render_template("services/create_service.html")
+
+
+@bp.route("/view/services/<int:service_id>/edit")
+@route_to_shard("service_records", "service_id")
+def services_edit_page(service_id):
+    conn = get_db()
+    service = conn.execute("SELECT * FROM service_records WHERE id = ?", (service_id,)).fetchone()
+
+    if service is None:
+        return "Service record not found", 404
+
+    return render_template("services/edit_service.html", service=service)
+
+
+# -------------------------
+# API SERVICE RECORDS (CRUD)
+# -------------------------
+
+def service_records_query():
+    """
+    ListQuery de /service-records con los filtros de la query string.
+    Lanza ValueError si car_id no es entero.
+    """
+    query = ListQuery("""
+        SELECT id, car_id, service_type, service_date, mileage, cost
+        FROM service_records
+    """, "id", sort_fields={
+        "service_date": "service_date",
+        "mileage": "mileage",
+        "cost": "cost",
+    })
+
+    car_id = int_arg("car_id")
+    service_type = (request.args.get("service_type") or "").strip()
+    date_from = (request.args.get("date_from") or "").strip()
+    date_to = (request.args.get("date_to") or "").strip()
+
+    if car_id is not None:
+        query.filter("car_id = ?", car_id)
+    if service_type:
+        query.filter("service_type = ?", service_type)
+    if date_from:
+        query.filter("service_date >= ?", date_from)
+    if date_to:
+        query.filter("service_date <= ?", date_to)
+    return query
+
+
+@bp.route("/service-records", methods=["GET"])
+@conditional_get("service_records")
+def get_service_records():
+    """
+    Filtros: car_id, service_type, date_from, date_to (YYYY-MM-DD, inclusivos).
+    Orden (?sort=, "-" para descendente): id, service_date, mileage, cost.
+    """
+    try:
+        query = service_records_query()
+    except ValueError:
+        return jsonify({"error": "car_id debe ser numérico"}), 400
+    return page_response(query)
+
+
+@async_view("services.get_service_records")
+@conditional_get("service_records")
+async def get_service_records_async():
+    try:
+        query = service_records_query()
+    except ValueError:
+        return jsonify({"error": "car_id debe ser numérico"}), 400
+    return await page_response_async(query)
+
+
+@bp.route("/service-records/<int:record_id>", methods=["GET"])
+@route_to_shard("service_records", "record_id")
+@conditional_get("service_records")
+def get_service_record(record_id):
+    conn = get_db()
+    row = conn.execute("""
+        SELECT id, car_id, service_type, service_date, mileage, cost
+        FROM service_records
+        WHERE id = ?
+    """, (record_id,)).fetchone()
+
+    if row is None:
+        return jsonify({"error": "Service record no encontrado"}), 404
+
+    return jsonify(dict(row)), 200
+
+
+@bp.route("/service-records", methods=["POST"])
+def create_service_record_general():
+    record, error = validate_service_record(request.get_json(silent=True) or {})
+    if error:
+        return jsonify({"error": error}), 400
+
+    route_to_row("cars", record["car_id"])
+    conn = get_db()
+    car_exists = conn.execute("SELECT id FROM cars WHERE id = ?", (record["car_id"],)).fetchone()
+    if car_exists is None:
+        return jsonify({"error": "Coche no encontrado"}), 404
+
+    record["id"] = new_ids("service_records")[0]
+    with db_write() as conn:
+        cur = conn.execute("""
+            INSERT INTO service_records (id, car_id, service_type, service_date, mileage, cost)
+            VALUES (:id, :car_id, :service_type, :service_date, :mileage, :cost)
+        """, record)
+    new_id = cur.lastrowid
+
+    return jsonify({"message": "Service record creado", "id": new_id}), 201
+
+
+@bp.route("/service-records/<int:record_id>", methods=["PUT"])
+@route_to_shard("service_records", "record_id")
+def update_service_record(record_id):
+    data = request.get_json(silent=True) or {}
+
+    service_type = data.get("service_type")
+    service_date = data.get("service_date")
+    mileage = data.get("mileage")
+    cost = data.get("cost")
+
+    if not service_type or not service_date or mileage is None or cost is None:
+        return jsonify({"error": "Faltan campos: service_type, service_date, mileage, cost"}), 400
+
+    try:
+        mileage = int(mileage)
+        cost = float(cost)
+    except (ValueError, TypeError):
+        return jsonify({"error": "mileage debe ser int y cost debe ser número"}), 400
+
+    with db_write() as conn:
+        cursor = conn.execute("""
+            UPDATE service_records
+            SET service_type = ?, service_date = ?, mileage = ?, cost = ?
+            WHERE id = ?
+        """, (service_type, service_date, mileage, cost, record_id))
+
+    if cursor.rowcount == 0:
+        return jsonify({"error": "Service record no encontrado"}), 404
+
+    return jsonify({"message": "Service record actualizado"}), 200
+
+
+@bp.route("/service-records/<int:record_id>", methods=["DELETE"])
+@route_to_shard("service_records", "record_id")
+def delete_service_record(record_id):
+    with db_write() as conn:
+        cursor = conn.execute("DELETE FROM service_records WHERE id = ?", (record_id,))
+
+    if cursor.rowcount == 0:
+        return jsonify({"error": "Service record no encontrado"}), 404
+
+    return jsonify({"message": "Service record eliminado"}), 200
+
+
+@bp.route("/service-records/bulk", methods=["POST"])
+def create_service_records_bulk():
+    return bulk_create("service_records")
+
+
+@bp.route("/service-records/bulk", methods=["DELETE"])
+def delete_service_records_bulk():
+    return bulk_delete("service_records")
+
+
+# -------------------------
+# SERVICE RECORDS POR COCHE (Templates + POST por car_id)
+# -------------------------
+
+def fetch_car_services(conn, car_id: int):
+    """(coche con duenio, servicios del mas reciente al mas antiguo); coche None si no existe."""
+    car = fetch_car_with_owner(conn, car_id)
+    if car is None:
+        return None, []
+
+    services = conn.execute("""
+        SELECT id, car_id, service_type, service_date, mileage, cost
+        FROM service_records
+        WHERE car_id = ?
+        ORDER BY service_date DESC
+    """, (car_id,)).fetchall()
+    return car, services
+
+
+@bp.route("/view/cars/<int:car_id>/services", methods=["GET"])
+@route_to_shard("cars", "car_id")
+def view_car_services(car_id):
+    car, services = fetch_car_services(get_db(), car_id)
+    if car is None:
+        return "Car not found", 404
+    return render_template("services/service_records.html", car=car, services=services)
+
+
+@async_view("services.view_car_services")
+async def view_car_services_async(car_id):
+    car, services = await async_db().run(fetch_car_services, car_id)
+    if car is None:
+        return "Car not found", 404
+    return render_template("services/service_records.html", car=car, services=services)
+
+
+@bp.route("/cars/<int:car_id>/services", methods=["POST"])
+@route_to_shard("cars", "car_id")
+def create_service_record_by_car(car_id):
+    """
+    Crear service record para un coche.
+    - Template (form-data): redirige a /view/cars/<id>/services
+    - Postman (JSON): responde JSON 201
+    """
+    data_json = request.get_json(silent=True)
+
+    if data_json:
+        service_type = (data_json.get("service_type") or "").strip()
+        service_date = (data_json.get("service_date") or "").strip()
+        mileage = data_json.get("mileage")
+        cost = data_json.get("cost")
+    else:
+        service_type = (request.form.get("service_type") or "").strip()
+        service_date = (request.form.get("service_date") or "").strip()
+        mileage = (request.form.get("mileage") or "").strip()
+        cost = (request.form.get("cost") or "").strip()
+
+    if not service_type or not service_date or not str(mileage).strip() or not str(cost).strip():
+        if data_json:
+            return jsonify({"error": "Faltan campos: service_type, service_date, mileage, cost"}), 400
+        return "Faltan campos del formulario", 400
+
+    try:
+        mileage = int(mileage)
+        cost = float(cost)
+    except (ValueError, TypeError):
+        if data_json:
+            return jsonify({"error": "mileage debe ser int y cost debe ser número"}), 400
+        return "Mileage y cost deben ser numéricos", 400
+
+    conn = get_db()
+
+    car_exists = conn.execute("SELECT id FROM cars WHERE id = ?", (car_id,)).fetchone()
+    if car_exists is None:
+        if data_json:
+            return jsonify({"error": "Coche no encontrado"}), 404
+        return "Car not found", 404
+
+    record_id = new_ids("service_records")[0]
+    with db_write() as conn:
+        cur = conn.execute("""
+            INSERT INTO service_records (id, car_id, service_type, service_date, mileage, cost)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (record_id, car_id, service_type, service_date, mileage, cost))
+    new_id = cur.lastrowid
+
+    if data_json:
+        return jsonify({"message": "Service record creado", "id": new_id}), 201
+
+    return redirect(url_for("services.view_car_services", car_id=car_id))
+
+
+# -------------------------
+# IMPORTACION CSV (historial de servicios)
+# Columnas: car_id, service_type, service_date, mileage, cost
+# -------------------------
+
+def import_service_records_csv(stream, delimiter: str = ","):
+    validate, parent_error = BULK_VALIDATORS["service_records"]
+    return importer.import_rows(
+        write_targets(),
+        importer.iter_csv_rows(stream, delimiter),
+        "service_records",
+        validate,
+        parent_error,
+        chunk_size=current_app.config["IMPORT_CHUNK_SIZE"],
+        new_ids=new_ids,
+    )
+
+
+@bp.route("/service-records/import", methods=["POST"])
+def import_service_records():
+    """
+    Sube un CSV como multipart (campo "file") o como body text/csv.
+    Se procesa en streaming; responde con el reporte de la importacion.
+    """
+    upload = request.files.get("file")
+    stream = upload.stream if upload else request.stream
+    delimiter = request.args.get("delimiter", ",")
+
+    if len(delimiter) != 1:
+        return jsonify({"error": "delimiter debe ser un solo caracter"}), 400
+
+    stats = import_service_records_csv(stream, delimiter)
+    if "error" in stats:
+        # Archivo ilegible a la mitad: 207 si alcanzo a importar algo.
+        status = 207 if stats["imported"] else 400
+    else:
+        status = 201 if stats["rejected"] == 0 else 207
+    return jsonify(stats), status
+
+
+# -------------------------
+# PROXIMOS SERVICIOS (pronostico)
+# -------------------------
+
+@bp.route("/service-due", methods=["GET"])
+def get_service_due():
+    """
+    Servicios que vencen de hoy a hoy + within (?within=30d), segun
+    service_forecast. Incluye los vencidos salvo ?overdue=0.
+    Antes de leer se recalculan solo los coches con historial modificado.
+    """
+    try:
+        days = parse_within(request.args.get("within"))
+        limit, after = parse_page_args()
+    except ValueError:
+        return jsonify({"error": "within debe ser como 30d o 2w (máximo 366 días)"}), 400
+
+    shards = fan_out_shards()
+    if shards is not None:
+        stale = [i for i, pending in enumerate(shards.fan_out(forecast.pending)) if pending]
+        if stale:
+            shards.fan_out_write(forecast.refresh, indexes=stale)
+    elif forecast.pending(get_db()):
+        with db_write() as conn:
+            forecast.refresh(conn)
+
+    today = date.today().isoformat()
+    end = (date.today() + timedelta(days=days)).isoformat()
+
+    query = ListQuery("""
+        SELECT
+            sf.id,
+            sf.car_id,
+            sf.service_type,
+            sf.last_service_date,
+            sf.last_mileage,
+            sf.avg_interval_days,
+            sf.avg_interval_km,
+            sf.due_date,
+            sf.due_mileage,
+            c.brand,
+            c.model,
+            c.plate,
+            u.name AS user_name
+        FROM service_forecast sf
+        JOIN cars c ON c.id = sf.car_id
+        JOIN users u ON u.id = c.user_id
+    """, "sf.id", sort_fields={"due_date": "sf.due_date"})
+    query.filter("sf.due_date <= ?", end)
+    if request.args.get("overdue") in ("0", "false"):
+        query.filter("sf.due_date >= ?", today)
+    query.order_by("due_date")
+
+    try:
+        rows, next_cursor = fetch_page(query, limit, after)
+    except ValueError:
+        return jsonify({"error": "Cursor after inválido"}), 400
+
+    items = [dict(r, overdue=r["due_date"] < today) for r in rows]
+    return jsonify({"from": today, "to": end, "items": items, "next_cursor": next_cursor}), 200
@@ -0,0 +1,129 @@
+import sqlite3
+
+from flask import Blueprint, jsonify, render_template, request
+
+import stats
+from query import ListQuery
+from web import (
+    cached_response,
+    conditional_get,
+    create_user_in_db,
+    db_write,
+    get_db,
+    page_response,
+    route_to_shard,
+    shard_set,
+    use_directory,
+)
+
+bp = Blueprint("users", __name__)
+
+
+# -------------------------
+# VISTAS (TEMPLATES)
+# -------------------------
+
+@bp.route("/view/users")
+def users_page():
+    return render_template("users/user.html")
+
+
+@bp.route("/view/users/create")
+def users_create_page():
+    return render_template("users/create_user.html")
+
+
+# -------------------------
+# API USERS (CRUD)
+# -------------------------
+
+@bp.route("/users", methods=["POST"])
+def create_user():
+    data = request.get_json(silent=True) or {}
+
+    name = (data.get("name") or "").strip()
+    email = (data.get("email") or "").strip().lower()
+    password = (data.get("password") or "").strip()
+
+    if not name or not email or not password:
+        return jsonify({"error": "Faltan campos obligatorios: name, email, password"}), 400
+
+    user_id, create_error = create_user_in_db(name, email, password)
+    if create_error == "email_exists":
+        return jsonify({"error": "El email ya está registrado"}), 409
+    return jsonify({"message": "Usuario creado", "id": user_id}), 201
+
+
+@bp.route("/users", methods=["GET"])
+@conditional_get("users")
+def get_users():
+    # Con shards, los usuarios se listan del directorio (los shards solo tienen copias).
+    use_directory()
+    return page_response(ListQuery("SELECT id, name, email FROM users", "id"))
+
+
+@bp.route("/users/<int:user_id>", methods=["GET"])
+@conditional_get("users")
+@cached_response(lambda response, user_id: [("users", user_id)])
+def get_user(user_id):
+    conn = get_db()
+    user = conn.execute(
+        "SELECT id, name, email FROM users WHERE id = ?",
+        (user_id,),
+    ).fetchone()
+
+    if user is None:
+        return jsonify({"error": "Usuario no encontrado"}), 404
+
+    return jsonify(dict(user)), 200
+
+
+@bp.route("/users/<int:user_id>/stats", methods=["GET"])
+@route_to_shard("users", "user_id")
+def get_user_stats(user_id):
+    conn = get_db()
+    user = conn.execute("SELECT id FROM users WHERE id = ?", (user_id,)).fetchone()
+    if user is None:
+        return jsonify({"error": "Usuario no encontrado"}), 404
+
+    return jsonify(stats.user_stats(conn, user_id)), 200
+
+
+@bp.route("/users/<int:user_id>", methods=["PUT"])
+def update_user(user_id):
+    data = request.get_json(silent=True) or {}
+
+    name = data.get("name")
+    email = data.get("email")
+
+    if not name or not email:
+        return jsonify({"error": "Faltan campos obligatorios: name, email"}), 400
+
+    try:
+        with db_write() as conn:
+            cursor = conn.execute(
+                "UPDATE users SET name = ?, email = ? WHERE id = ?",
+                (name, email, user_id),
+            )
+            if cursor.rowcount and shard_set() is not None:
+                shard_set().update_user(conn, user_id, name, email)
+    except sqlite3.IntegrityError:
+        return jsonify({"error": "El email ya está registrado"}), 409
+
+    if cursor.rowcount == 0:
+        return jsonify({"error": "Usuario no encontrado"}), 404
+
+    return jsonify({"message": "Usuario actualizado"}), 200
+
+
+@bp.route("/users/<int:user_id>", methods=["DELETE"])
+def delete_user(user_id):
+    with db_write() as conn:
+        if shard_set() is not None:
+            shard_set().remove_user(conn, user_id)
+        cursor = conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
+
+    if cursor.rowcount == 0:
+        return jsonify({"error": "Usuario no encontrado"}), 404
+
+    return jsonify({"message": "Usuario eliminado"}), 200
@@ -0,0 +1,80 @@
+import json
+
+# Tablas que aceptan operaciones masivas: columnas de insercion y la FK
+# padre que hay que validar antes de insertar.
+TABLES = {
+    "cars": {
+        "columns": ("user_id", "brand", "model", "year", "plate"),
+        "parent": ("users", "user_id"),
+    },
+    "service_records": {
+        "columns": ("car_id", "service_type", "service_date", "mileage", "cost"),
+        "parent": ("cars", "car_id"),
+    },
+    "car_documents": {
+        "columns": ("car_id", "doc_type", "folio", "expires_at", "notes"),
+        "parent": ("cars", "car_id"),
+    },
+}
+
+
+def existing_ids(conn, table: str, ids):
+    """
+    Cuales de los ids existen, en una sola consulta (json_each evita el
+    limite de variables de SQLite con listas grandes).
+    """
+    if not ids:
+        return set()
+    rows = conn.execute(
+        f"SELECT id FROM {table} WHERE id IN (SELECT value FROM json_each(?))",
+        (json.dumps(sorted(ids)),),
+    ).fetchall()
+    return {row[0] for row in rows}
+
+
+def _sequence(conn, table: str):
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+    return row[0] if row else 0
+
+
+def insert_many(conn, table: str, rows, ids=None):
+    """
+    Inserta dicts con executemany dentro de la transaccion de escritura en
+    curso y devuelve los ids asignados, en orden.
+    Con AUTOINCREMENT y el lock de escritura tomado, los ids son
+    consecutivos a partir de sqlite_sequence. ids (uno por fila) fija los
+    ids a mano: los globales de los shards (ver shards.py).
+    """
+    if not rows:
+        return []
+
+    columns = TABLES[table]["columns"]
+    if ids is not None and any(i is not None for i in ids):
+        columns = ("id",) + columns
+        rows = [dict(values, id=row_id) for values, row_id in zip(rows, ids)]
+        placeholders = ", ".join(f":{c}" for c in columns)
+        conn.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+        return list(ids)
+
+    placeholders = ", ".join(f":{c}" for c in columns)
+    before = _sequence(conn, table)
+    conn.executemany(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+        rows,
+    )
+    after = _sequence(conn, table)
+
+    if after - before != len(rows):
+        raise RuntimeError(f"ids no consecutivos en {table}: {before}..{after} para {len(rows)} filas")
+    return list(range(before + 1, after + 1))
+
+
+def delete_many(conn, table: str, ids):
+    """Borra los ids existentes dentro de la transaccion en curso; devuelve cuales borro."""
+    found = existing_ids(conn, table, ids)
+    if found:
+        conn.execute(
+            f"DELETE FROM {table} WHERE id IN (SELECT value FROM json_each(?))",
+            (json.dumps(sorted(found)),),
+        )
+    return found
@@ -0,0 +1,215 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Tablas con seguimiento por fila: triggers TEMP (por conexion) anotan el id
+# de cada fila tocada, incluidos los borrados en cascada. El resto de las
+# tablas se invalida completa cuando cambia su version en table_versions.
+TRACKED_TABLES = ("users", "cars", "car_documents")
+
+# Fila tocada en una transaccion de escritura; se lee y se vacia antes del commit.
+CHANGES_TABLE = "CREATE TEMP TABLE IF NOT EXISTS cache_changes (tbl TEXT NOT NULL, row_id INTEGER NOT NULL)"
+
+# Tag de los listados: (tabla, ANY_ROW) cambia con cualquier fila de la tabla.
+ANY_ROW = "*"
+
+# Cada entrada pesa su cuerpo mas este estimado fijo (clave, tags, tuplas).
+ENTRY_OVERHEAD = 256
+
+
+def install_change_tracking(conn):
+    """
+    Crea los triggers TEMP de la conexion. Devuelve False si el esquema aun
+    no existe; en ese caso los cambios se detectan por version de tabla.
+    """
+    try:
+        conn.execute(CHANGES_TABLE)
+        for table in TRACKED_TABLES:
+            for event, rows in (("INSERT", ("new",)), ("UPDATE", ("old", "new")), ("DELETE", ("old",))):
+                values = ", ".join(f"('{table}', {row}.id)" for row in rows)
+                conn.execute(f"""
+                    CREATE TEMP TRIGGER IF NOT EXISTS cache_{table}_{event.lower()}
+                    AFTER {event} ON main.{table} BEGIN
+                        INSERT INTO cache_changes (tbl, row_id) VALUES {values};
+                    END
+                """)
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+def read_versions(conn):
+    try:
+        return dict(conn.execute("SELECT name, version FROM table_versions").fetchall())
+    except sqlite3.OperationalError:
+        return {}
+
+
+class ResponseCache:
+    """
+    Cache LRU de respuestas con TTL y limite en bytes.
+
+    Cada entrada declara de que depende con tags: (tabla, id) para una
+    fila y (tabla, ANY_ROW) para listados de la tabla. Es listener de
+    SerializedWriter: al confirmar una escritura invalida exactamente las
+    filas tocadas (y los listados de esas tablas). Los cambios hechos por otros procesos se notan en sync(), que
+    compara table_versions con la ultima version conocida.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, ttl: float = 300, enabled: bool = True):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.enabled = enabled
+        self._entries = OrderedDict()
+        self._by_tag = {}
+        self._bytes = 0
+        self._known = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0, "invalidations": 0}
+
+    # --- lectura ---
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["expires"] <= now:
+                self._remove(key)
+                self._counters["expired"] += 1
+                entry = None
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry["value"]
+
+    def token(self):
+        """Generacion actual; put() descarta valores calculados antes de una invalidacion."""
+        with self._lock:
+            return self._generation
+
+    def put(self, key, value, size: int, tags, token):
+        size += ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return False
+        with self._lock:
+            if token != self._generation:
+                return False
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {
+                "value": value,
+                "size": size,
+                "tags": frozenset(tags),
+                "expires": time.monotonic() + self.ttl,
+            }
+            for tag in tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._counters["evictions"] += 1
+        return True
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry["size"]
+        for tag in entry["tags"]:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+    # --- invalidacion ---
+
+    def invalidate(self, tags):
+        """Borra las entradas con cualquiera de los tags. (tabla, None) = toda la tabla."""
+        with self._lock:
+            self._generation += 1
+            removed = 0
+            for tag in tags:
+                if tag[1] is None:
+                    keys = [k for t, ks in self._by_tag.items() if t[0] == tag[0] for k in ks]
+                else:
+                    keys = list(self._by_tag.get(tag, ()))
+                for key in keys:
+                    if key in self._entries:
+                        self._remove(key)
+                        removed += 1
+            self._counters["invalidations"] += removed
+            return removed
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._by_tag.clear()
+            self._bytes = 0
+
+    def sync(self, conn):
+        """Invalida las tablas que cambiaron en otro proceso desde la ultima vez."""
+        self._apply_versions(read_versions(conn))
+
+    def _apply_versions(self, versions, own=None):
+        stale = []
+        with self._lock:
+            for table, version in versions.items():
+                known = self._known.get(table)
+                if known is not None and known != version and table not in (own or ()):
+                    stale.append((table, None))
+                self._known[table] = version
+        if stale:
+            self.invalidate(stale)
+
+    # --- listener de SerializedWriter ---
+
+    def begin(self, conn):
+        versions = read_versions(conn)
+        # Si la version ya no es la conocida, escribio otro proceso.
+        self._apply_versions(versions)
+        return versions
+
+    def prepare(self, conn, before):
+        after = read_versions(conn)
+        try:
+            rows = conn.execute("SELECT DISTINCT tbl, row_id FROM cache_changes").fetchall()
+            conn.execute("DELETE FROM cache_changes")
+        except sqlite3.OperationalError:
+            rows = []
+
+        changed = {table for table, version in after.items() if before.get(table) != version}
+        tags = set()
+        for table, row_id in rows:
+            tags.add((table, row_id))
+            # Cualquier fila nueva, editada o borrada cambia los listados.
+            tags.add((table, ANY_ROW))
+        # Tablas sin seguimiento por fila (o conexion sin triggers): completas.
+        tracked = {table for table, _ in rows}
+        tags.update((table, None) for table in changed - tracked)
+        return after, changed, tags
+
+    def committed(self, result):
+        after, changed, tags = result
+        if tags:
+            self.invalidate(tags)
+        self._apply_versions(after, own=changed)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            entries = len(self._entries)
+            size = self._bytes
+        lookups = counters["hits"] + counters["misses"]
+        return {
+            **counters,
+            "enabled": self.enabled,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hit_rate": round(counters["hits"] / lookups, 4) if lookups else None,
+        }
@@ -0,0 +1,296 @@
+import json
+import os
+import time
+from datetime import date
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+import exporter
+import forecast
+import migrations
+import stats
+import tenants
+from blueprints.services import import_service_records_csv
+from web import all_databases, db_write, get_db, get_db_connection, init_db, shard_set, tenant_stores
+
+# Comandos de `flask --app app ...`; create_app los registra en app.cli.
+
+
+@click.command("init-db")
+@with_appcontext
+def init_db_command():
+    """Crea o actualiza el esquema. Correr una vez antes de arrancar los workers."""
+    applied = init_db()
+    print(f"Esquema listo (migraciones aplicadas: {applied or 'ninguna'})")
+
+
+@click.command("migrate")
+@with_appcontext
+def migrate_command():
+    """Aplica las migraciones pendientes (en la base principal y en cada shard o taller)."""
+    databases = all_databases()
+    for database in databases:
+        conn = get_db_connection(database)
+        applied = migrations.migrate(conn)
+        prefix = f"{database}: " if len(databases) > 1 else ""
+        print(f"{prefix}Version de esquema: {migrations.current_version(conn)} (aplicadas: {applied or 'ninguna'})")
+        conn.close()
+
+
+@click.command("rebuild-stats")
+@with_appcontext
+def rebuild_stats_command():
+    """Reconstruye el rollup car_stats desde service_records."""
+    if shard_set() is not None:
+        total = sum(shard_set().fan_out_write(stats.rebuild_car_stats))
+    else:
+        with db_write() as conn:
+            total = stats.rebuild_car_stats(conn)
+    print(f"car_stats reconstruido: {total} coches")
+
+
+@click.command("refresh-forecast")
+@click.option("--full", is_flag=True, help="Recalcula todos los coches, no solo los modificados.")
+@with_appcontext
+def refresh_forecast_command(full):
+    """Recalcula el pronostico de proximos servicios."""
+    if shard_set() is not None:
+        written = sum(shard_set().fan_out_write(forecast.refresh, full))
+    else:
+        with db_write() as conn:
+            written = forecast.refresh(conn, full=full)
+    print(f"service_forecast: {written} pronosticos actualizados")
+
+
+@click.command("run-jobs")
+@click.option("--once", is_flag=True, help="Corre los trabajos vencidos una vez y termina.")
+@with_appcontext
+def run_jobs_command(once):
+    """Corre el planificador de trabajos en primer plano (sin servidor web)."""
+    runner = current_app.extensions["jobs"]
+    if once:
+        claimed = runner.run_due_once()
+        runner.stop()
+        print(f"Trabajos ejecutados: {', '.join(claimed) or 'ninguno'}")
+        return
+
+    runner.start()
+    print(f"Planificador corriendo como {runner.worker_id} (Ctrl+C para salir)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        runner.stop()
+
+
+@click.command("explain")
+@with_appcontext
+def explain_command():
+    """Imprime EXPLAIN QUERY PLAN de las consultas calientes."""
+    conn = get_db_connection()
+    print(migrations.format_report(migrations.explain_hot_queries(conn)))
+    conn.close()
+
+
+@click.command("boot-time")
+@with_appcontext
+def boot_time_command():
+    """Imprime cuanto tardo en arrancar la app (importacion y create_app)."""
+    boot = current_app.extensions["boot"]
+    print(f"Importacion: {boot['import_seconds'] * 1000:.1f} ms  create_app: {boot['create_seconds'] * 1000:.1f} ms")
+
+
+@click.command("import-services")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--delimiter", default=",", show_default=True)
+@click.option("--chunk-size", type=int, default=None, help="Filas por transaccion.")
+@with_appcontext
+def import_services_command(path, delimiter, chunk_size):
+    """Importa historial de servicios desde un CSV."""
+    if chunk_size:
+        current_app.config["IMPORT_CHUNK_SIZE"] = chunk_size
+
+    with open(path, "rb") as f:
+        result = import_service_records_csv(f, delimiter)
+
+    print(f"Leidas: {result['read']}  Importadas: {result['imported']}  Rechazadas: {result['rejected']}")
+    print(f"Tiempo: {result['seconds']} s  ({result['rows_per_second']} filas/s, {result['chunks']} transacciones)")
+    for sample in result["rejected_samples"]:
+        print(f"  linea {sample['line']}: {sample['error']}")
+    if "error" in result:
+        print(f"Lectura interrumpida despues de la linea {result['error']['after_line']}: {result['error']['error']}")
+
+
+@click.command("export-history")
+@click.argument("output", type=click.Path(dir_okay=False, writable=True))
+@click.option("--format", "fmt", type=click.Choice(sorted(exporter.FORMATS)), default="csv", show_default=True)
+@click.option("--user-id", type=int, default=None, help="Solo los coches de este duenio.")
+@click.option("--car-id", type=int, default=None, help="Solo este coche.")
+@with_appcontext
+def export_history_command(output, fmt, user_id, car_id):
+    """Exporta el historial de servicios y documentos (por duenio o de toda la flota)."""
+    chunk_size = current_app.config["STREAM_CHUNK_SIZE"]
+    with open(output, "wb") as f:
+        if shard_set() is None:
+            rows = exporter.export_history([get_db()], f, fmt, user_id, car_id, chunk_size)
+        else:
+            with shard_set().connections() as conns:
+                rows = exporter.export_history(conns, f, fmt, user_id, car_id, chunk_size)
+    print(f"{rows} filas exportadas a {output} ({os.path.getsize(output)} bytes)")
+
+
+# -------------------------
+# SHARDS (flask shards ...)
+# -------------------------
+
+def require_shards():
+    if shard_set() is None:
+        raise click.UsageError("DATABASE_SHARDS no esta configurado")
+    return shard_set()
+
+
+@click.group("shards")
+def shards_command():
+    """Sharding por duenio (DATABASE_SHARDS): reparto inicial, estado y rebalanceo."""
+
+
+@shards_command.command("init")
+@with_appcontext
+def shards_init_command():
+    """
+    Migra el directorio y los shards, asigna shard a los duenios que no
+    tienen y mueve ahi su flota (sirve para partir una base existente).
+    """
+    shards = require_shards()
+    init_db()
+    assigned = shards.assign_existing()
+    print(f"Duenios asignados: {assigned}")
+
+
+@shards_command.command("status")
+@with_appcontext
+def shards_status_command():
+    """Duenios y coches por shard."""
+    shards = require_shards()
+    users = dict(get_db().execute("SELECT shard, COUNT(*) FROM user_shards GROUP BY shard").fetchall())
+    loads, _ = shards.loads()
+    for shard, cars in zip(shards.shards, loads):
+        print(f"shard {shard.index}: {users.get(shard.index, 0)} duenios, {cars} coches  ({shard.path})")
+
+
+@shards_command.command("move-user")
+@click.argument("user_id", type=int)
+@click.argument("target", type=int)
+@with_appcontext
+def shards_move_user_command(user_id, target):
+    """Mueve un duenio y su flota al shard TARGET, con el servicio en linea."""
+    shards = require_shards()
+    try:
+        copied = shards.move_user(user_id, target)
+    except ValueError as exc:
+        raise click.ClickException(str(exc))
+    if not copied:
+        print(f"Usuario {user_id} ya estaba en el shard {target}")
+        return
+    print(f"Usuario {user_id} movido al shard {target}: " + ", ".join(f"{k}={v}" for k, v in copied.items()))
+
+
+@shards_command.command("rebalance")
+@click.option("--dry-run", is_flag=True, help="Solo muestra los movimientos.")
+@with_appcontext
+def shards_rebalance_command(dry_run):
+    """Nivela los coches por shard moviendo duenios completos (uno a la vez, en linea)."""
+    shards = require_shards()
+    moves = shards.rebalance(dry_run=dry_run)
+    for user_id, source, target in moves:
+        print(f"usuario {user_id}: shard {source} -> {target}")
+    print(f"Movimientos: {len(moves)}{' (sin aplicar)' if dry_run else ''}")
+
+
+# -------------------------
+# TALLERES (flask tenants ...)
+# Los comandos de una sola base (rebuild-stats, import-services...) se
+# corren contra un taller con DATABASE_PATH=<TENANTS_DIR>/<taller>.db.
+# -------------------------
+
+def require_tenants():
+    if tenant_stores() is None:
+        raise click.UsageError("TENANTS_DIR no esta configurado")
+    return tenant_stores()
+
+
+@click.group("tenants")
+def tenants_command():
+    """Multi-taller (TENANTS_DIR): alta, listado y reporte entre talleres."""
+
+
+@tenants_command.command("create")
+@click.argument("slug")
+@with_appcontext
+def tenants_create_command(slug):
+    """Crea la base de un taller nuevo (SLUG: minusculas, digitos y guiones)."""
+    stores = require_tenants()
+    path = stores.path(slug)
+    if path is None:
+        raise click.BadParameter("minusculas, digitos y guiones (como un subdominio)", param_hint="SLUG")
+    if os.path.exists(path):
+        raise click.UsageError(f"El taller {slug} ya existe ({path})")
+    os.makedirs(stores.directory, exist_ok=True)
+    conn = get_db_connection(path)
+    try:
+        applied = migrations.migrate(conn)
+    finally:
+        conn.close()
+    print(f"Taller {slug} creado en {path} (migraciones aplicadas: {len(applied)})")
+
+
+@tenants_command.command("list")
+@with_appcontext
+def tenants_list_command():
+    """Talleres con base en TENANTS_DIR."""
+    stores = require_tenants()
+    slugs = stores.slugs()
+    for slug in slugs:
+        print(slug)
+    print(f"Talleres: {len(slugs)}")
+
+
+@tenants_command.command("report")
+@click.option("--workers", type=int, default=None, help="Procesos del pool (TENANT_REPORT_WORKERS).")
+@click.option("--json", "as_json", is_flag=True, help="Una linea JSON por taller.")
+@with_appcontext
+def tenants_report_command(workers, as_json):
+    """Usuarios, coches, servicios y costo por taller, leidos en un pool de procesos."""
+    stores = require_tenants()
+    workers = workers or current_app.config["TENANT_REPORT_WORKERS"]
+    summaries = tenants.report(stores, date.today().isoformat(), workers=workers)
+    for summary in summaries:
+        if as_json:
+            print(json.dumps(summary))
+        elif "error" in summary:
+            print(f"{summary['tenant']}: error: {summary['error']}")
+        else:
+            print(
+                f"{summary['tenant']}: {summary['users']} usuarios, {summary['cars']} coches, "
+                f"{summary['service_records']} servicios (costo {summary['total_cost']}), "
+                f"{summary['expired_documents']} documentos vencidos, {summary['size_bytes'] // 1024} KiB"
+            )
+    if not as_json:
+        print(f"Talleres: {len(summaries)}")
+
+
+COMMANDS = (
+    init_db_command,
+    migrate_command,
+    rebuild_stats_command,
+    refresh_forecast_command,
+    run_jobs_command,
+    explain_command,
+    boot_time_command,
+    import_services_command,
+    export_history_command,
+    shards_command,
+    tenants_command,
+)
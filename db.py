@@ -0,0 +1,187 @@
+import queue
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# PRAGMAs de almacenamiento que se aplican al abrir cada conexion.
+# El orden importa: journal_mode antes que synchronous.
+DEFAULT_STORAGE = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -20000,
+}
+
+
+def storage_pragmas(config):
+    """
+    Arma los PRAGMAs desde app.config (DB_JOURNAL_MODE, DB_SYNCHRONOUS,
+    DB_BUSY_TIMEOUT_MS, DB_MMAP_SIZE, DB_CACHE_SIZE).
+    """
+    return {
+        "journal_mode": config.get("DB_JOURNAL_MODE", DEFAULT_STORAGE["journal_mode"]),
+        "synchronous": config.get("DB_SYNCHRONOUS", DEFAULT_STORAGE["synchronous"]),
+        "busy_timeout": int(config.get("DB_BUSY_TIMEOUT_MS", DEFAULT_STORAGE["busy_timeout"])),
+        "mmap_size": int(config.get("DB_MMAP_SIZE", DEFAULT_STORAGE["mmap_size"])),
+        "cache_size": int(config.get("DB_CACHE_SIZE", DEFAULT_STORAGE["cache_size"])),
+    }
+
+
+def connect(database: str, pragmas=None, connection_class=sqlite3.Connection):
+    """
+    Abre una conexion SQLite con la configuracion base de la app.
+    check_same_thread=False porque la conexion puede cambiar de hilo
+    al volver al pool (nunca la usan dos hilos a la vez).
+    connection_class permite instrumentarla (metrics.TimedConnection).
+    """
+    conn = sqlite3.connect(database, check_same_thread=False, factory=connection_class)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON;")
+    for name, value in (pragmas or {}).items():
+        conn.execute(f"PRAGMA {name} = {value};")
+    return conn
+
+
+def is_busy_error(exc):
+    message = str(exc).lower()
+    return "locked" in message or "busy" in message
+
+
+class SerializedWriter:
+    """
+    Serializa las escrituras del proceso: un solo hilo escribe a la vez
+    y el lock de escritura de SQLite se toma al inicio (BEGIN IMMEDIATE).
+    Si otro proceso tiene el lock, reintenta con backoff exponencial
+    acotado antes de propagar el error.
+    Los listeners (p. ej. el cache de respuestas) ven cada transaccion:
+    begin(conn) despues de BEGIN, prepare(conn, estado) antes del commit y
+    committed(resultado) despues de un commit exitoso.
+    """
+
+    def __init__(self, retries: int = 5, backoff: float = 0.05, max_backoff: float = 1.0):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.listeners = []
+        self._lock = threading.Lock()
+
+    def _begin(self, conn):
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as exc:
+                if not is_busy_error(exc) or attempt == self.retries:
+                    raise
+            time.sleep(delay + random.uniform(0, delay))
+            delay = min(delay * 2, self.max_backoff)
+
+    @contextmanager
+    def transaction(self, conn):
+        with self._lock:
+            if conn.in_transaction:
+                conn.commit()
+            self._begin(conn)
+            try:
+                states = [listener.begin(conn) for listener in self.listeners]
+                yield conn
+                results = [
+                    listener.prepare(conn, state)
+                    for listener, state in zip(self.listeners, states)
+                ]
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+            for listener, result in zip(self.listeners, results):
+                listener.committed(result)
+
+
+class ConnectionPool:
+    """
+    Pool LIFO de conexiones SQLite ya "calientes".
+    - LIFO: el hilo que acaba de soltar una conexion la vuelve a tomar.
+    - size: maximo de conexiones ociosas guardadas; las extra se cierran.
+    - healthcheck_interval: segundos ociosa antes de validar con SELECT 1.
+    """
+
+    def __init__(self, database: str, size: int = 8, healthcheck_interval: float = 30.0, factory=connect):
+        self.database = database
+        self.size = size
+        self.healthcheck_interval = healthcheck_interval
+        self._factory = factory
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "discarded": 0, "closed": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _is_healthy(self, conn, idle_since: float):
+        if time.monotonic() - idle_since < self.healthcheck_interval:
+            return True
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self):
+        while True:
+            try:
+                conn, idle_since = self._idle.get_nowait()
+            except queue.Empty:
+                break
+
+            if self._is_healthy(conn, idle_since):
+                self._count("hits")
+                return conn
+
+            self._count("discarded")
+            self._close(conn)
+
+        self._count("misses")
+        return self._factory(self.database)
+
+    def release(self, conn):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._count("discarded")
+            self._close(conn)
+            return
+
+        try:
+            self._idle.put_nowait((conn, time.monotonic()))
+        except queue.Full:
+            self._count("closed")
+            self._close(conn)
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def close_all(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(conn)
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._counters)
+        lookups = data["hits"] + data["misses"]
+        data["idle"] = self._idle.qsize()
+        data["size"] = self.size
+        data["hit_rate"] = round(data["hits"] / lookups, 4) if lookups else 0.0
+        return data
@@ -0,0 +1,236 @@
+import csv
+import gzip
+import io
+import itertools
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from shards import chunked, merge_sorted, sql_order_key
+
+# Historial completo por duenio/coche: servicios y documentos en un mismo
+# flujo (record_type distingue cada uno), ordenado por duenio y coche.
+HISTORY_SQL = """
+    SELECT * FROM (
+        SELECT
+            u.id AS user_id, u.name AS user_name, u.email AS user_email,
+            c.id AS car_id, c.brand, c.model, c.year, c.plate,
+            'service' AS record_type, sr.id AS record_id,
+            sr.service_type AS kind, sr.service_date AS record_date,
+            sr.mileage, sr.cost, NULL AS folio, NULL AS notes
+        FROM service_records sr
+        JOIN cars c ON c.id = sr.car_id
+        JOIN users u ON u.id = c.user_id
+        {where}
+        UNION ALL
+        SELECT
+            u.id, u.name, u.email,
+            c.id, c.brand, c.model, c.year, c.plate,
+            'document', cd.id,
+            cd.doc_type, cd.expires_at,
+            NULL, NULL, cd.folio, cd.notes
+        FROM car_documents cd
+        JOIN cars c ON c.id = cd.car_id
+        JOIN users u ON u.id = c.user_id
+        {where}
+    )
+    ORDER BY user_id, car_id, record_type, record_date, record_id
+"""
+
+COLUMNS = (
+    "user_id", "user_name", "user_email",
+    "car_id", "brand", "model", "year", "plate",
+    "record_type", "record_id", "kind", "record_date",
+    "mileage", "cost", "folio", "notes",
+)
+
+FORMATS = {"csv": "csv", "columnar": "colgz"}
+MIMETYPES = {"csv": "text/csv", "columnar": "application/gzip"}
+JOB_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+def history_query(user_id=None, car_id=None):
+    where = []
+    params = []
+    if user_id is not None:
+        where.append("c.user_id = ?")
+        params.append(user_id)
+    if car_id is not None:
+        where.append("c.id = ?")
+        params.append(car_id)
+
+    clause = "WHERE " + " AND ".join(where) if where else ""
+    # El filtro va en las dos ramas del UNION: los parametros se repiten.
+    return HISTORY_SQL.format(where=clause), params * 2
+
+
+def iter_history(conn, user_id=None, car_id=None, chunk_size: int = 1000):
+    """Genera bloques de filas (tuplas en orden de COLUMNS) con fetchmany."""
+    sql, params = history_query(user_id, car_id)
+    cursor = conn.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield [tuple(row) for row in rows]
+
+
+def history_key(row):
+    """Orden de HISTORY_SQL (duenio, coche, tipo, fecha, id) para unir shards."""
+    return tuple(sql_order_key(row[i]) for i in (0, 3, 8, 11, 9))
+
+
+def iter_history_merged(conns, user_id=None, car_id=None, chunk_size: int = 1000):
+    """iter_history de varias bases (shards) unido con merge k-way: mismo orden que una sola."""
+    if len(conns) == 1:
+        return iter_history(conns[0], user_id, car_id, chunk_size)
+    rows = [itertools.chain.from_iterable(iter_history(conn, user_id, car_id, chunk_size)) for conn in conns]
+    return chunked(merge_sorted(rows, key=history_key), chunk_size)
+
+
+def write_csv(chunks, f):
+    text = io.TextIOWrapper(f, encoding="utf-8", newline="")
+    writer = csv.writer(text)
+    writer.writerow(COLUMNS)
+    total = 0
+    for rows in chunks:
+        writer.writerows(rows)
+        total += len(rows)
+    text.flush()
+    text.detach()
+    return total
+
+
+def write_columnar(chunks, f):
+    """
+    Formato columnar compacto: gzip de lineas JSON. La primera describe las
+    columnas; cada una de las siguientes es un grupo de filas guardado por
+    columna ({"n": filas, "data": [[col0...], [col1...], ...]}), asi los
+    valores repetidos (duenio, coche) quedan juntos y comprimen mucho mejor.
+    """
+    total = 0
+    with gzip.GzipFile(fileobj=f, mode="wb") as gz:
+        header = {"format": "garage-columnar", "version": 1, "columns": COLUMNS}
+        gz.write((json.dumps(header) + "\n").encode())
+        for rows in chunks:
+            group = {"n": len(rows), "data": [list(column) for column in zip(*rows)]}
+            gz.write((json.dumps(group, separators=(",", ":")) + "\n").encode())
+            total += len(rows)
+    return total
+
+
+WRITERS = {"csv": write_csv, "columnar": write_columnar}
+
+
+def export_history(conns, f, fmt: str, user_id=None, car_id=None, chunk_size: int = 1000):
+    """
+    Escribe el historial en el archivo binario f. Devuelve cuantas filas escribio.
+    conns: una conexion por base (la principal, o cada shard).
+    """
+    return WRITERS[fmt](iter_history_merged(conns, user_id, car_id, chunk_size), f)
+
+
+class ExportManager:
+    """
+    Exportaciones en segundo plano: cada trabajo corre en un hilo del pool,
+    escribe a un archivo temporal en directory y deja su estado en
+    <id>.json, asi cualquier worker del mismo host puede consultarlo.
+    Los archivos viejos (mas de ttl segundos) se borran al crear trabajos nuevos.
+    pools: un pool por base con flota (la principal, o cada shard); submit
+    acepta otros (el TenantStore del taller) y anota el taller en el estado.
+    """
+
+    def __init__(self, pools, directory: str, workers: int = 2, ttl: float = 3600, chunk_size: int = 1000):
+        self.pools = pools
+        self.directory = directory
+        self.ttl = ttl
+        self.chunk_size = chunk_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export")
+        self._lock = threading.Lock()
+
+    def _path(self, job_id: str, suffix: str):
+        return os.path.join(self.directory, f"{job_id}.{suffix}")
+
+    def _save_status(self, job_id: str, status: dict):
+        tmp = self._path(job_id, "json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(status, f)
+        os.replace(tmp, self._path(job_id, "json"))
+
+    def status(self, job_id: str):
+        if not JOB_ID_RE.match(job_id or ""):
+            return None
+        try:
+            with open(self._path(job_id, "json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def file_path(self, job_id: str):
+        status = self.status(job_id)
+        if status is None or status["status"] != "done":
+            return None
+        return self._path(job_id, FORMATS[status["format"]])
+
+    def submit(self, fmt: str, user_id=None, car_id=None, pools=None, tenant=None):
+        # El directorio se crea con la primera exportacion, no al arrancar.
+        os.makedirs(self.directory, exist_ok=True)
+        self.cleanup()
+        job_id = uuid.uuid4().hex
+        status = {
+            "id": job_id,
+            "status": "pending",
+            "format": fmt,
+            "user_id": user_id,
+            "car_id": car_id,
+            "created_at": time.time(),
+        }
+        if tenant is not None:
+            status["tenant"] = tenant
+        self._save_status(job_id, status)
+        self._executor.submit(self._run, job_id, status, pools or self.pools)
+        return status
+
+    def _run(self, job_id: str, status: dict, pools):
+        status = dict(status, status="running")
+        self._save_status(job_id, status)
+        path = self._path(job_id, FORMATS[status["format"]])
+        started = time.perf_counter()
+        stack = ExitStack()
+        try:
+            conns = []
+            for pool in pools:
+                conns.append(pool.acquire())
+                stack.callback(pool.release, conns[-1])
+            with open(path + ".part", "wb") as f:
+                rows = export_history(
+                    conns, f, status["format"], status["user_id"], status["car_id"], self.chunk_size
+                )
+            os.replace(path + ".part", path)
+            status.update(
+                status="done",
+                rows=rows,
+                size=os.path.getsize(path),
+                seconds=round(time.perf_counter() - started, 3),
+            )
+        except Exception as exc:
+            status.update(status="error", error=str(exc))
+        finally:
+            stack.close()
+        self._save_status(job_id, status)
+
+    def cleanup(self):
+        limit = time.time() - self.ttl
+        with self._lock:
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                try:
+                    if os.path.getmtime(path) < limit:
+                        os.remove(path)
+                except OSError:
+                    pass
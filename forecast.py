@@ -0,0 +1,91 @@
+# Pronostico del proximo servicio por coche y tipo de servicio.
+#
+# Para cada (car_id, service_type) con al menos dos servicios:
+# - intervalo promedio en dias y en km entre servicios consecutivos,
+# - uso del coche en km/dia (de todo su historial),
+# - vence en la fecha que llegue primero: por tiempo o por km estimados.
+# Todo se calcula en una sola consulta con funciones de ventana, para todos
+# los coches (o solo los marcados en service_forecast_dirty) a la vez.
+
+FORECAST_SQL = """
+    WITH valid AS (
+        SELECT id, car_id, service_type, julianday(service_date) AS day, mileage
+        FROM service_records
+        WHERE julianday(service_date) IS NOT NULL {car_filter}
+    ),
+    ordered AS (
+        SELECT
+            car_id,
+            service_type,
+            day,
+            mileage,
+            day - LAG(day) OVER w AS gap_days,
+            mileage - LAG(mileage) OVER w AS gap_km
+        FROM valid
+        WINDOW w AS (PARTITION BY car_id, service_type ORDER BY day, mileage, id)
+    ),
+    car_usage AS (
+        SELECT car_id, (MAX(mileage) - MIN(mileage)) / NULLIF(MAX(day) - MIN(day), 0) AS km_per_day
+        FROM valid
+        GROUP BY car_id
+    ),
+    per_type AS (
+        SELECT
+            car_id,
+            service_type,
+            COUNT(*) AS samples,
+            MAX(day) AS last_day,
+            MAX(mileage) AS last_mileage,
+            AVG(gap_days) AS avg_days,
+            AVG(gap_km) AS avg_km
+        FROM ordered
+        GROUP BY car_id, service_type
+        HAVING COUNT(*) >= 2
+    )
+    INSERT INTO service_forecast (
+        car_id, service_type, last_service_date, last_mileage, samples,
+        avg_interval_days, avg_interval_km, km_per_day, due_date, due_mileage
+    )
+    SELECT
+        p.car_id,
+        p.service_type,
+        date(p.last_day),
+        p.last_mileage,
+        p.samples,
+        ROUND(p.avg_days, 1),
+        ROUND(p.avg_km),
+        ROUND(u.km_per_day, 2),
+        date(CASE
+            WHEN p.avg_km > 0 AND u.km_per_day > 0
+                THEN MIN(p.last_day + p.avg_days, p.last_day + p.avg_km / u.km_per_day)
+            ELSE p.last_day + p.avg_days
+        END),
+        CASE WHEN p.avg_km > 0 THEN p.last_mileage + CAST(ROUND(p.avg_km) AS INTEGER) END
+    FROM per_type p
+    JOIN car_usage u ON u.car_id = p.car_id
+"""
+
+
+def pending(conn):
+    return conn.execute("SELECT EXISTS (SELECT 1 FROM service_forecast_dirty)").fetchone()[0] == 1
+
+
+def refresh(conn, full: bool = False):
+    """
+    Recalcula el pronostico. Incremental por defecto: solo los coches cuyo
+    historial cambio. Llamar dentro de una transaccion de escritura.
+    Devuelve cuantos pronosticos se escribieron.
+    """
+    if full:
+        conn.execute("DELETE FROM service_forecast")
+        sql = FORECAST_SQL.format(car_filter="")
+    else:
+        conn.execute("DELETE FROM service_forecast WHERE car_id IN (SELECT car_id FROM service_forecast_dirty)")
+        sql = FORECAST_SQL.format(car_filter="AND car_id IN (SELECT car_id FROM service_forecast_dirty)")
+
+    # rowcount no se informa para sentencias que empiezan con WITH.
+    before = conn.total_changes
+    conn.execute(sql)
+    written = conn.total_changes - before
+    conn.execute("DELETE FROM service_forecast_dirty")
+    return written
@@ -0,0 +1,97 @@
+import csv
+import io
+import time
+
+import bulk
+
+
+class CsvReadError(ValueError):
+    """El CSV no se puede seguir leyendo; after_line es la ultima linea leida."""
+
+    def __init__(self, message: str, after_line: int):
+        super().__init__(message)
+        self.after_line = after_line
+
+
+def iter_csv_rows(stream, delimiter: str = ","):
+    """
+    Recorre un CSV (stream binario) fila por fila como (numero_de_linea, dict).
+    Nunca carga el archivo completo; quita espacios y el BOM de Excel.
+    Bytes que no son UTF-8 o un CSV mal formado cortan la lectura con CsvReadError.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(text, delimiter=delimiter)
+    try:
+        for row in reader:
+            yield reader.line_num, {
+                (key or "").strip(): value.strip() if isinstance(value, str) else value
+                for key, value in row.items()
+            }
+    except UnicodeDecodeError:
+        raise CsvReadError("El archivo no es UTF-8 válido", reader.line_num)
+    except csv.Error as exc:
+        raise CsvReadError(f"CSV inválido: {exc}", reader.line_num)
+
+
+def import_rows(targets, rows, table: str, validate, parent_error: str,
+                chunk_size: int = 1000, max_rejected_samples: int = 100, new_ids=None):
+    """
+    Importa filas (numero_de_linea, dict) en transacciones de chunk_size filas.
+    Cada fila pasa por validate (las mismas reglas que los endpoints) y las FK
+    se revisan por chunk con una consulta. Una fila rechazada no detiene el
+    resto. Memoria constante: solo se guarda el chunk actual y hasta
+    max_rejected_samples rechazos de ejemplo.
+    Si la lectura se corta (CsvReadError) se importa lo leido hasta ahi y el
+    reporte lleva "error" con la ultima linea leida.
+    targets: lista de (conexion, escritor); con shards, uno por shard y cada
+    fila cae en el que tiene a su padre. new_ids(table, n) da los ids globales.
+    """
+    parent_table, parent_key = bulk.TABLES[table]["parent"]
+    stats = {"read": 0, "imported": 0, "rejected": 0, "chunks": 0, "rejected_samples": []}
+    started = time.perf_counter()
+
+    def reject(line, error):
+        stats["rejected"] += 1
+        if len(stats["rejected_samples"]) < max_rejected_samples:
+            stats["rejected_samples"].append({"line": line, "error": error})
+
+    def flush(chunk):
+        # Ids en el orden del archivo, aunque con shards se inserten por shard.
+        ids = dict(zip((line for line, _ in chunk), new_ids(table, len(chunk)))) if new_ids else None
+        pending = chunk
+        for conn, writer in targets:
+            with writer.transaction(conn):
+                parents = bulk.existing_ids(conn, parent_table, {values[parent_key] for _, values in pending})
+                accepted = [(line, values) for line, values in pending if values[parent_key] in parents]
+                bulk.insert_many(
+                    conn, table, [values for _, values in accepted], [ids[line] for line, _ in accepted] if ids else None
+                )
+            pending = [(line, values) for line, values in pending if values[parent_key] not in parents]
+            stats["imported"] += len(accepted)
+        for line, _ in pending:
+            reject(line, parent_error)
+        stats["chunks"] += 1
+
+    chunk = []
+    try:
+        for line, row in rows:
+            stats["read"] += 1
+            values, error = validate(row)
+            if error:
+                reject(line, error)
+                continue
+
+            chunk.append((line, values))
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+    except CsvReadError as exc:
+        stats["error"] = {"after_line": exc.after_line, "error": str(exc)}
+
+    if chunk:
+        flush(chunk)
+
+    elapsed = time.perf_counter() - started
+    stats["seconds"] = round(elapsed, 3)
+    stats["rows_per_second"] = round(stats["read"] / elapsed, 1) if elapsed > 0 else None
+    return stats
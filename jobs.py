@@ -0,0 +1,208 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("garage.jobs")
+
+
+class JobRunner:
+    """
+    Planificador en proceso para trabajos periodicos, sin broker externo.
+    El estado vive en la tabla jobs (next_run_at, lease y ultimo resultado),
+    asi sobrevive a reinicios y varios procesos pueden compartir la base:
+    un trabajo solo lo toma quien gana el lease dentro de BEGIN IMMEDIATE.
+    Un hilo revisa cada poll_interval segundos y los trabajos corren en un
+    pool de hilos; nada de esto corre en el hilo de una peticion.
+    """
+
+    def __init__(self, pool, writer, workers: int = 2, poll_interval: float = 5.0, lease: float = 300.0):
+        self.pool = pool
+        self.writer = writer
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.workers = workers
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._handlers = {}
+        self._running = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = None
+
+    def register(self, name: str, func, interval: float):
+        """func(conn) corre con una conexion del pool y devuelve un dict serializable."""
+        self._handlers[name] = (func, interval)
+
+    def start(self):
+        """Arranca el hilo planificador (una vez por proceso). No bloquea."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._get_executor_locked()
+            self._thread = threading.Thread(target=self._loop, name="job-scheduler", daemon=True)
+            self._thread.start()
+
+    def run_due_once(self):
+        """
+        Sin hilo planificador (flask run-jobs --once): da de alta los trabajos
+        y manda al pool los vencidos. Devuelve sus nombres; stop() espera a que terminen.
+        """
+        conn = self.pool.acquire()
+        try:
+            self._sync_jobs(conn)
+        finally:
+            self.pool.release(conn)
+        return self.tick()
+
+    def stop(self, wait: bool = True):
+        """Detiene el planificador y el pool; start() o run_due_once() arman uno nuevo."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and wait:
+            self._thread.join()
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def _get_executor_locked(self):
+        """Pool de los trabajos (con self._lock tomado); se crea al arrancar."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+        return self._executor
+
+    def trigger(self, conn, name: str):
+        """Adelanta la proxima corrida a ahora. Devuelve False si el trabajo no existe."""
+        with self.writer.transaction(conn):
+            changed = conn.execute(
+                "UPDATE jobs SET next_run_at = ? WHERE name = ?", (time.time(), name)
+            ).rowcount
+        self._wake.set()
+        return changed == 1
+
+    def status(self, conn):
+        rows = conn.execute("""
+            SELECT name, interval_seconds, next_run_at, locked_by, locked_until,
+                   last_started_at, last_finished_at, last_status, last_error,
+                   last_result, runs, failures
+            FROM jobs
+            ORDER BY name
+        """).fetchall()
+        jobs = []
+        for r in rows:
+            job = dict(r)
+            job["last_result"] = json.loads(job["last_result"]) if job["last_result"] else None
+            jobs.append(job)
+        return jobs
+
+    def _loop(self):
+        conn = self.pool.acquire()
+        try:
+            self._sync_jobs(conn)
+        finally:
+            self.pool.release(conn)
+
+        while not self._stop.is_set():
+            try:
+                self.tick()
+            except Exception:
+                logger.exception("Fallo el planificador de trabajos")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def _sync_jobs(self, conn):
+        """Alta de los trabajos registrados; respeta el next_run_at ya guardado."""
+        now = time.time()
+        with self.writer.transaction(conn):
+            for name, (_, interval) in self._handlers.items():
+                conn.execute("""
+                    INSERT INTO jobs (name, interval_seconds, next_run_at)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT (name) DO UPDATE SET interval_seconds = excluded.interval_seconds
+                """, (name, interval, now))
+
+    def tick(self):
+        """Toma los trabajos vencidos y los manda al pool. Devuelve sus nombres."""
+        conn = self.pool.acquire()
+        try:
+            claimed = self._claim(conn)
+        finally:
+            self.pool.release(conn)
+
+        for name in claimed:
+            with self._lock:
+                self._running.add(name)
+                executor = self._get_executor_locked()
+            executor.submit(self._run, name)
+        return claimed
+
+    def _claim(self, conn):
+        now = time.time()
+        with self._lock:
+            candidates = [name for name in self._handlers if name not in self._running]
+        if not candidates:
+            return []
+
+        with self.writer.transaction(conn):
+            rows = conn.execute("""
+                SELECT name FROM jobs
+                WHERE next_run_at <= ?
+                  AND (locked_until IS NULL OR locked_until < ?)
+                  AND name IN (SELECT value FROM json_each(?))
+            """, (now, now, json.dumps(candidates))).fetchall()
+            claimed = [r["name"] for r in rows]
+            for name in claimed:
+                conn.execute("""
+                    UPDATE jobs
+                    SET locked_by = ?, locked_until = ?, last_started_at = ?
+                    WHERE name = ?
+                """, (self.worker_id, now + self.lease, now, name))
+        return claimed
+
+    def _run(self, name: str):
+        func, interval = self._handlers[name]
+        conn = self.pool.acquire()
+        try:
+            try:
+                result, error = func(conn), None
+            except Exception as exc:
+                logger.exception("Fallo el trabajo %s", name)
+                result, error = None, str(exc)
+
+            finished = time.time()
+            with self.writer.transaction(conn):
+                conn.execute("""
+                    UPDATE jobs SET
+                        next_run_at = ?,
+                        locked_by = NULL,
+                        locked_until = NULL,
+                        last_finished_at = ?,
+                        last_status = ?,
+                        last_error = ?,
+                        last_result = ?,
+                        runs = runs + 1,
+                        failures = failures + ?
+                    WHERE name = ? AND locked_by = ?
+                """, (
+                    finished + interval,
+                    finished,
+                    "error" if error else "ok",
+                    error,
+                    json.dumps(result) if result is not None else None,
+                    1 if error else 0,
+                    name,
+                    self.worker_id,
+                ))
+        except Exception:
+            logger.exception("No se pudo registrar el resultado de %s", name)
+        finally:
+            self.pool.release(conn)
+            with self._lock:
+                self._running.discard(name)
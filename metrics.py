@@ -0,0 +1,342 @@
+import collections
+import contextvars
+import cProfile
+import heapq
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+
+# Buckets en segundos (latencia de peticiones y de sentencias SQL) y en bytes.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Estadisticas de la peticion en curso; las conexiones reportan aqui su SQL.
+# Fuera de una peticion (CLI, trabajos) no hay RequestStats y solo se
+# acumula en el registro global.
+_current = contextvars.ContextVar("request_stats", default=None)
+
+
+class RequestStats:
+    __slots__ = ("endpoint", "started", "sql_count", "sql_seconds", "rows", "profiler")
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.rows = 0
+        self.profiler = None
+
+
+def begin_request(endpoint: str):
+    stats = RequestStats(endpoint)
+    _current.set(stats)
+    return stats
+
+
+def end_request():
+    stats = _current.get()
+    _current.set(None)
+    return stats
+
+
+def current():
+    return _current.get()
+
+
+class Histogram:
+    """Histograma acumulativo al estilo Prometheus (sin lock propio)."""
+
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.total += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def lines(self, name: str, labels: str):
+        sep = "," if labels else ""
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels}{sep}le="+Inf"}} {self.count}'
+        yield f"{name}_sum{{{labels}}} {self.total}"
+        yield f"{name}_count{{{labels}}} {self.count}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Registry:
+    """
+    Metricas del proceso: latencia y tamanio de respuesta por endpoint,
+    conteo/tiempo/filas de SQL por endpoint, un histograma global por
+    sentencia y gauges sueltos (p. ej. el tiempo de arranque). render()
+    produce el formato de texto de Prometheus.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._latency = {}
+        self._sizes = {}
+        self._sql = {}
+        self._gauges = {}
+        self._statement_latency = Histogram(LATENCY_BUCKETS)
+
+    def set_gauge(self, name: str, help_text: str, value: float, labels: str = ""):
+        with self._lock:
+            self._gauges.setdefault(name, (help_text, {}))[1][labels] = value
+
+    def observe_statement(self, seconds: float):
+        with self._lock:
+            self._statement_latency.observe(seconds)
+
+    def observe_request(self, stats: RequestStats, method: str, status: int, seconds: float, size):
+        key = (stats.endpoint, method)
+        with self._lock:
+            status_key = key + (status,)
+            self._requests[status_key] = self._requests.get(status_key, 0) + 1
+            self._latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            if size is not None:
+                self._sizes.setdefault(key, Histogram(SIZE_BUCKETS)).observe(size)
+            sql = self._sql.setdefault(stats.endpoint, [0, 0.0, 0])
+            sql[0] += stats.sql_count
+            sql[1] += stats.sql_seconds
+            sql[2] += stats.rows
+
+    def render(self):
+        lines = []
+        with self._lock:
+            lines.append("# HELP http_requests_total Peticiones atendidas.")
+            lines.append("# TYPE http_requests_total counter")
+            for (endpoint, method, status), total in sorted(self._requests.items()):
+                lines.append(
+                    f'http_requests_total{{endpoint="{_escape(endpoint)}",method="{method}",status="{status}"}} {total}'
+                )
+
+            lines.append("# HELP http_request_duration_seconds Latencia por endpoint.")
+            lines.append("# TYPE http_request_duration_seconds histogram")
+            for (endpoint, method), histogram in sorted(self._latency.items()):
+                labels = f'endpoint="{_escape(endpoint)}",method="{method}"'
+                lines.extend(histogram.lines("http_request_duration_seconds", labels))
+
+            lines.append("# HELP http_response_size_bytes Tamanio de respuesta (sin streams).")
+            lines.append("# TYPE http_response_size_bytes histogram")
+            for (endpoint, method), histogram in sorted(self._sizes.items()):
+                labels = f'endpoint="{_escape(endpoint)}",method="{method}"'
+                lines.extend(histogram.lines("http_response_size_bytes", labels))
+
+            for name, index, kind, help_text in (
+                ("sql_statements_total", 0, "counter", "Sentencias SQL por endpoint."),
+                ("sql_seconds_total", 1, "counter", "Tiempo en SQL (execute + fetch) por endpoint."),
+                ("sql_rows_total", 2, "counter", "Filas devueltas por endpoint."),
+            ):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for endpoint, values in sorted(self._sql.items()):
+                    lines.append(f'{name}{{endpoint="{_escape(endpoint)}"}} {values[index]}')
+
+            lines.append("# HELP sql_statement_duration_seconds Latencia de cada sentencia.")
+            lines.append("# TYPE sql_statement_duration_seconds histogram")
+            lines.extend(self._statement_latency.lines("sql_statement_duration_seconds", ""))
+
+            for name, (help_text, values) in sorted(self._gauges.items()):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} gauge")
+                for labels, value in sorted(values.items()):
+                    lines.append(f"{name}{{{labels}}} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def record_sql(seconds: float, rows: int = 0, statement: bool = True):
+    if statement:
+        REGISTRY.observe_statement(seconds)
+    stats = _current.get()
+    if stats is not None:
+        if statement:
+            stats.sql_count += 1
+        stats.sql_seconds += seconds
+        stats.rows += rows
+
+
+# -------------------------
+# CONEXION INSTRUMENTADA
+# El tiempo de una consulta se reparte entre execute (primer paso) y los
+# fetch; se miden ambos. Recorrer el cursor con for no cuenta filas.
+# Al terminar cada sentencia (sin filas, con el resultado agotado o, si
+# se leyo solo una parte como en execute(...).fetchone(), al ejecutar otra
+# o al cerrar el cursor) se llama a los statement_hooks con
+# (conn, sql, params, segundos, filas). Un cursor que el GC recoge con una
+# sentencia a medias solo la deja en la cola de su conexion: los hooks
+# pueden consultar la base y corren en el siguiente execute.
+# -------------------------
+
+statement_hooks = []
+
+
+class TimedCursor(sqlite3.Cursor):
+    _statement = None
+
+    def _executed(self, sql, parameters, elapsed):
+        record_sql(elapsed)
+        if statement_hooks:
+            self._statement = [sql, parameters, elapsed, 0]
+            if self.description is None:
+                self._finish()
+
+    def _fetched(self, elapsed, rows, exhausted):
+        record_sql(elapsed, rows, statement=False)
+        statement = self._statement
+        if statement is not None:
+            statement[2] += elapsed
+            statement[3] += rows
+            if exhausted:
+                self._finish()
+
+    def _finish(self):
+        statement, self._statement = self._statement, None
+        self._run_hooks(statement)
+
+    def _run_hooks(self, statement):
+        sql, parameters, elapsed, rows = statement
+        for hook in statement_hooks:
+            hook(self.connection, sql, parameters, elapsed, rows)
+
+    def _finish_pending(self):
+        if self._statement is not None:
+            self._finish()
+        orphans = getattr(self.connection, "orphan_statements", None)
+        while orphans:
+            self._run_hooks(orphans.popleft())
+
+    def close(self):
+        self._finish_pending()
+        super().close()
+
+    def __del__(self):
+        # Sin hooks ni SQL: el GC puede correr en cualquier hilo y en medio
+        # de otra consulta de la misma conexion. El tiempo ya esta en metrics.
+        statement, self._statement = self._statement, None
+        if statement is not None:
+            orphans = getattr(self.connection, "orphan_statements", None)
+            if orphans is not None:
+                orphans.append(statement)
+
+    def execute(self, sql, parameters=()):
+        self._finish_pending()
+        started = time.perf_counter()
+        cursor = super().execute(sql, parameters)
+        self._executed(sql, parameters, time.perf_counter() - started)
+        return cursor
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish_pending()
+        started = time.perf_counter()
+        cursor = super().executemany(sql, seq_of_parameters)
+        # params None: lote de executemany (sin un solo juego de parametros).
+        self._executed(sql, None, time.perf_counter() - started)
+        return cursor
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(time.perf_counter() - started, 1 if row is not None else 0, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._fetched(time.perf_counter() - started, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(time.perf_counter() - started, len(rows), True)
+        return rows
+
+
+class TimedConnection(sqlite3.Connection):
+    """Connection cuyos cursores (incluido conn.execute) reportan a metrics."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Sentencias de cursores recogidos por el GC, para los hooks (TimedCursor.__del__).
+        self.orphan_statements = collections.deque(maxlen=256)
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    # Connection.execute de C crea un sqlite3.Cursor sin pasar por cursor().
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+# -------------------------
+# PERFILADO POR MUESTREO
+# -------------------------
+
+class SamplingProfiler:
+    """
+    Perfila con cProfile una fraccion (sample_rate) de las peticiones y
+    guarda en directory los .prof de las keep mas lentas vistas por este
+    proceso (se abren con pstats o snakeviz).
+    """
+
+    def __init__(self, directory: str, sample_rate: float = 0.0, keep: int = 20):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.keep = keep
+        self._slowest = []
+        self._lock = threading.Lock()
+
+    def maybe_start(self):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Solo un perfilador activo a la vez (otro hilo ya esta perfilando).
+            return None
+        return profiler
+
+    def finish(self, profiler, endpoint: str, seconds: float):
+        profiler.disable()
+        with self._lock:
+            if len(self._slowest) >= self.keep and seconds <= self._slowest[0][0]:
+                return None
+            os.makedirs(self.directory, exist_ok=True)
+            name = re.sub(r"[^\w.-]+", "_", endpoint).strip("_") or "root"
+            path = os.path.join(self.directory, f"{seconds * 1000:010.1f}ms-{name}-{time.time_ns()}.prof")
+            profiler.dump_stats(path)
+            heapq.heappush(self._slowest, (seconds, path))
+            if len(self._slowest) > self.keep:
+                _, fastest = heapq.heappop(self._slowest)
+                try:
+                    os.remove(fastest)
+                except OSError:
+                    pass
+        return path
@@ -0,0 +1,537 @@
+from datetime import datetime, timezone
+
+# Migraciones numeradas. Cada una es una lista de sentencias que se
+# aplican en una sola transaccion y se registran en schema_version.
+# Nunca editar una migracion ya publicada: agregar una nueva al final.
+MIGRATIONS = [
+    (1, "tablas base", [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL UNIQUE,
+            password TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS cars (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            brand TEXT NOT NULL,
+            model TEXT NOT NULL,
+            year INTEGER NOT NULL,
+            plate TEXT,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS service_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            car_id INTEGER NOT NULL,
+            service_type TEXT NOT NULL,
+            service_date TEXT NOT NULL,
+            mileage INTEGER NOT NULL,
+            cost REAL NOT NULL,
+            FOREIGN KEY (car_id) REFERENCES cars(id) ON DELETE CASCADE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS car_documents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            car_id INTEGER NOT NULL,
+            doc_type TEXT NOT NULL,
+            folio TEXT NOT NULL,
+            expires_at TEXT NOT NULL,
+            notes TEXT,
+            FOREIGN KEY (car_id) REFERENCES cars(id) ON DELETE CASCADE
+        )
+        """,
+    ]),
+    (2, "indices secundarios", [
+        # Borrado en cascada de users y listados por duenio.
+        "CREATE INDEX IF NOT EXISTS idx_cars_user_id ON cars (user_id)",
+        # view_car_services: WHERE car_id = ? ORDER BY service_date DESC, cubriente.
+        """
+        CREATE INDEX IF NOT EXISTS idx_service_records_car_date
+        ON service_records (car_id, service_date, service_type, mileage, cost)
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_service_records_service_date ON service_records (service_date)",
+        # view_car_documents: WHERE car_id = ? ORDER BY expires_at DESC.
+        "CREATE INDEX IF NOT EXISTS idx_car_documents_car_expires ON car_documents (car_id, expires_at)",
+        # documents_page: ORDER BY expires_at DESC, id DESC sin B-tree temporal.
+        "CREATE INDEX IF NOT EXISTS idx_car_documents_expires_at ON car_documents (expires_at, id)",
+    ]),
+    (3, "indices de filtros de listados", [
+        # GET /cars?brand= (comparacion COLLATE NOCASE) y orden por marca/anio.
+        "CREATE INDEX IF NOT EXISTS idx_cars_brand ON cars (brand COLLATE NOCASE)",
+        "CREATE INDEX IF NOT EXISTS idx_cars_year ON cars (year)",
+        # GET /service-records?service_type=&date_from=&date_to=.
+        "CREATE INDEX IF NOT EXISTS idx_service_records_type_date ON service_records (service_type, service_date)",
+    ]),
+    (4, "busqueda de texto completo (FTS5)", [
+        # Tablas FTS de contenido externo: el texto vive en cars/car_documents
+        # y los triggers mantienen el indice al dia.
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS cars_fts USING fts5(
+            brand, model, plate,
+            content='cars', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """,
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS car_documents_fts USING fts5(
+            doc_type, folio, notes,
+            content='car_documents', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS cars_fts_ai AFTER INSERT ON cars BEGIN
+            INSERT INTO cars_fts (rowid, brand, model, plate)
+            VALUES (new.id, new.brand, new.model, new.plate);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS cars_fts_ad AFTER DELETE ON cars BEGIN
+            INSERT INTO cars_fts (cars_fts, rowid, brand, model, plate)
+            VALUES ('delete', old.id, old.brand, old.model, old.plate);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS cars_fts_au AFTER UPDATE ON cars BEGIN
+            INSERT INTO cars_fts (cars_fts, rowid, brand, model, plate)
+            VALUES ('delete', old.id, old.brand, old.model, old.plate);
+            INSERT INTO cars_fts (rowid, brand, model, plate)
+            VALUES (new.id, new.brand, new.model, new.plate);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS car_documents_fts_ai AFTER INSERT ON car_documents BEGIN
+            INSERT INTO car_documents_fts (rowid, doc_type, folio, notes)
+            VALUES (new.id, new.doc_type, new.folio, new.notes);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS car_documents_fts_ad AFTER DELETE ON car_documents BEGIN
+            INSERT INTO car_documents_fts (car_documents_fts, rowid, doc_type, folio, notes)
+            VALUES ('delete', old.id, old.doc_type, old.folio, old.notes);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS car_documents_fts_au AFTER UPDATE ON car_documents BEGIN
+            INSERT INTO car_documents_fts (car_documents_fts, rowid, doc_type, folio, notes)
+            VALUES ('delete', old.id, old.doc_type, old.folio, old.notes);
+            INSERT INTO car_documents_fts (rowid, doc_type, folio, notes)
+            VALUES (new.id, new.doc_type, new.folio, new.notes);
+        END
+        """,
+        # Indexa las filas que ya existian.
+        "INSERT INTO cars_fts (cars_fts) VALUES ('rebuild')",
+        "INSERT INTO car_documents_fts (car_documents_fts) VALUES ('rebuild')",
+    ]),
+    (5, "vencimientos normalizados y versiones de tablas", [
+        # expires_at es texto libre; expires_on lo normaliza a YYYY-MM-DD
+        # (acepta ISO y DD/MM/YYYY, NULL si no se reconoce) para poder indexarlo.
+        """
+        ALTER TABLE car_documents ADD COLUMN expires_on TEXT GENERATED ALWAYS AS (
+            COALESCE(
+                date(expires_at),
+                date(substr(expires_at, 7, 4) || '-' || substr(expires_at, 4, 2) || '-' || substr(expires_at, 1, 2))
+            )
+        ) VIRTUAL
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_car_documents_expires_on ON car_documents (expires_on, id)",
+        # Contador de cambios por tabla; los caches se invalidan al cambiar la version.
+        # Los borrados en cascada (ON DELETE CASCADE) tambien disparan los triggers.
+        """
+        CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        "INSERT OR IGNORE INTO table_versions (name) VALUES ('car_documents')",
+        """
+        CREATE TRIGGER IF NOT EXISTS car_documents_version_ai AFTER INSERT ON car_documents BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'car_documents';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS car_documents_version_au AFTER UPDATE ON car_documents BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'car_documents';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS car_documents_version_ad AFTER DELETE ON car_documents BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'car_documents';
+        END
+        """,
+    ]),
+    (6, "rollup de estadisticas por coche", [
+        """
+        CREATE TABLE IF NOT EXISTS car_stats (
+            car_id INTEGER PRIMARY KEY,
+            service_count INTEGER NOT NULL,
+            total_cost REAL NOT NULL,
+            last_service_date TEXT,
+            latest_mileage INTEGER,
+            FOREIGN KEY (car_id) REFERENCES cars(id) ON DELETE CASCADE
+        )
+        """,
+        # Alta: O(1), suma al rollup existente.
+        """
+        CREATE TRIGGER IF NOT EXISTS car_stats_ai AFTER INSERT ON service_records BEGIN
+            INSERT INTO car_stats (car_id, service_count, total_cost, last_service_date, latest_mileage)
+            VALUES (new.car_id, 1, new.cost, new.service_date, new.mileage)
+            ON CONFLICT (car_id) DO UPDATE SET
+                service_count = service_count + 1,
+                total_cost = total_cost + excluded.total_cost,
+                last_service_date = max(last_service_date, excluded.last_service_date),
+                latest_mileage = max(latest_mileage, excluded.latest_mileage);
+        END
+        """,
+        # Baja: resta; los maximos solo se recalculan si se borro el maximo.
+        """
+        CREATE TRIGGER IF NOT EXISTS car_stats_ad AFTER DELETE ON service_records BEGIN
+            UPDATE car_stats SET
+                service_count = service_count - 1,
+                total_cost = total_cost - old.cost
+            WHERE car_id = old.car_id;
+            UPDATE car_stats SET
+                last_service_date = (SELECT MAX(service_date) FROM service_records WHERE car_id = old.car_id),
+                latest_mileage = (SELECT MAX(mileage) FROM service_records WHERE car_id = old.car_id)
+            WHERE car_id = old.car_id
+              AND (last_service_date = old.service_date OR latest_mileage = old.mileage);
+            DELETE FROM car_stats WHERE car_id = old.car_id AND service_count <= 0;
+        END
+        """,
+        # Cambio: baja del valor viejo + alta del nuevo (puede cambiar de coche).
+        """
+        CREATE TRIGGER IF NOT EXISTS car_stats_au
+        AFTER UPDATE OF car_id, service_date, mileage, cost ON service_records BEGIN
+            UPDATE car_stats SET
+                service_count = service_count - 1,
+                total_cost = total_cost - old.cost
+            WHERE car_id = old.car_id;
+            UPDATE car_stats SET
+                last_service_date = (SELECT MAX(service_date) FROM service_records WHERE car_id = old.car_id),
+                latest_mileage = (SELECT MAX(mileage) FROM service_records WHERE car_id = old.car_id)
+            WHERE car_id = old.car_id
+              AND (last_service_date = old.service_date OR latest_mileage = old.mileage);
+            DELETE FROM car_stats WHERE car_id = old.car_id AND service_count <= 0;
+            INSERT INTO car_stats (car_id, service_count, total_cost, last_service_date, latest_mileage)
+            VALUES (new.car_id, 1, new.cost, new.service_date, new.mileage)
+            ON CONFLICT (car_id) DO UPDATE SET
+                service_count = service_count + 1,
+                total_cost = total_cost + excluded.total_cost,
+                last_service_date = max(last_service_date, excluded.last_service_date),
+                latest_mileage = max(latest_mileage, excluded.latest_mileage);
+        END
+        """,
+        # Backfill de los datos existentes.
+        """
+        INSERT INTO car_stats (car_id, service_count, total_cost, last_service_date, latest_mileage)
+        SELECT car_id, COUNT(*), SUM(cost), MAX(service_date), MAX(mileage)
+        FROM service_records
+        GROUP BY car_id
+        """,
+    ]),
+    (7, "version de service_records", [
+        "INSERT OR IGNORE INTO table_versions (name) VALUES ('service_records')",
+        """
+        CREATE TRIGGER IF NOT EXISTS service_records_version_ai AFTER INSERT ON service_records BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'service_records';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS service_records_version_au AFTER UPDATE ON service_records BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'service_records';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS service_records_version_ad AFTER DELETE ON service_records BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'service_records';
+        END
+        """,
+    ]),
+    (8, "pronostico de proximos servicios", [
+        """
+        CREATE TABLE IF NOT EXISTS service_forecast (
+            id INTEGER PRIMARY KEY,
+            car_id INTEGER NOT NULL,
+            service_type TEXT NOT NULL,
+            last_service_date TEXT NOT NULL,
+            last_mileage INTEGER NOT NULL,
+            samples INTEGER NOT NULL,
+            avg_interval_days REAL,
+            avg_interval_km REAL,
+            km_per_day REAL,
+            due_date TEXT NOT NULL,
+            due_mileage INTEGER,
+            UNIQUE (car_id, service_type),
+            FOREIGN KEY (car_id) REFERENCES cars(id) ON DELETE CASCADE
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_service_forecast_due_date ON service_forecast (due_date, id)",
+        # Coches con historial cambiado; el proximo refresh solo recalcula esos.
+        "CREATE TABLE IF NOT EXISTS service_forecast_dirty (car_id INTEGER PRIMARY KEY)",
+        """
+        CREATE TRIGGER IF NOT EXISTS service_forecast_dirty_ai AFTER INSERT ON service_records BEGIN
+            INSERT OR IGNORE INTO service_forecast_dirty (car_id) VALUES (new.car_id);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS service_forecast_dirty_au AFTER UPDATE ON service_records BEGIN
+            INSERT OR IGNORE INTO service_forecast_dirty (car_id) VALUES (old.car_id);
+            INSERT OR IGNORE INTO service_forecast_dirty (car_id) VALUES (new.car_id);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS service_forecast_dirty_ad AFTER DELETE ON service_records BEGIN
+            INSERT OR IGNORE INTO service_forecast_dirty (car_id) VALUES (old.car_id);
+        END
+        """,
+        # Primer calculo completo en el siguiente refresh.
+        "INSERT OR IGNORE INTO service_forecast_dirty (car_id) SELECT id FROM cars",
+    ]),
+    (9, "trabajos en segundo plano y avisos de vencimiento", [
+        # Un registro por trabajo periodico. locked_until es un lease: si el
+        # proceso muere con el trabajo tomado, otro lo retoma al vencer.
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            name TEXT PRIMARY KEY,
+            interval_seconds REAL NOT NULL,
+            next_run_at REAL NOT NULL,
+            locked_by TEXT,
+            locked_until REAL,
+            last_started_at REAL,
+            last_finished_at REAL,
+            last_status TEXT,
+            last_error TEXT,
+            last_result TEXT,
+            runs INTEGER NOT NULL DEFAULT 0,
+            failures INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_jobs_next_run_at ON jobs (next_run_at)",
+        # Un aviso por idempotency_key (documento + fecha de vencimiento):
+        # reiniciar o repetir el escaneo nunca vuelve a enviar uno ya enviado.
+        """
+        CREATE TABLE IF NOT EXISTS notifications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            idempotency_key TEXT NOT NULL UNIQUE,
+            kind TEXT NOT NULL,
+            document_id INTEGER,
+            user_id INTEGER,
+            recipient TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at REAL NOT NULL,
+            sent_at REAL,
+            FOREIGN KEY (document_id) REFERENCES car_documents(id) ON DELETE SET NULL,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_notifications_status ON notifications (status, id)",
+    ]),
+    (10, "versiones de users y cars", [
+        "INSERT OR IGNORE INTO table_versions (name) VALUES ('users')",
+        "INSERT OR IGNORE INTO table_versions (name) VALUES ('cars')",
+        """
+        CREATE TRIGGER IF NOT EXISTS users_version_ai AFTER INSERT ON users BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'users';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS users_version_au AFTER UPDATE ON users BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'users';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS users_version_ad AFTER DELETE ON users BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'users';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS cars_version_ai AFTER INSERT ON cars BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'cars';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS cars_version_au AFTER UPDATE ON cars BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'cars';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS cars_version_ad AFTER DELETE ON cars BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'cars';
+        END
+        """,
+    ]),
+    (11, "fecha de modificacion por tabla", [
+        # Para Last-Modified: los triggers de version no cambian, este
+        # sella la hora (epoch en segundos) cada vez que sube una version.
+        "ALTER TABLE table_versions ADD COLUMN updated_at REAL",
+        "UPDATE table_versions SET updated_at = (julianday('now') - 2440587.5) * 86400.0",
+        """
+        CREATE TRIGGER IF NOT EXISTS table_versions_touch AFTER UPDATE OF version ON table_versions BEGIN
+            UPDATE table_versions
+            SET updated_at = (julianday('now') - 2440587.5) * 86400.0
+            WHERE name = new.name;
+        END
+        """,
+    ]),
+    (12, "directorio de shards", [
+        # Solo se llenan en la base principal con DATABASE_SHARDS (shards.py):
+        # el shard de cada duenio y el siguiente id global de cada tabla.
+        """
+        CREATE TABLE IF NOT EXISTS user_shards (
+            user_id INTEGER PRIMARY KEY,
+            shard INTEGER NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_user_shards_shard ON user_shards (shard)",
+        """
+        CREATE TABLE IF NOT EXISTS id_blocks (
+            name TEXT PRIMARY KEY,
+            next_id INTEGER NOT NULL
+        )
+        """,
+        # La version solo sube al mover o borrar: invalida el cache de
+        # ubicaciones del router, que las altas no afectan.
+        "INSERT OR IGNORE INTO table_versions (name) VALUES ('user_shards')",
+        """
+        CREATE TRIGGER IF NOT EXISTS user_shards_version_au AFTER UPDATE ON user_shards BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'user_shards';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS user_shards_version_ad AFTER DELETE ON user_shards BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE name = 'user_shards';
+        END
+        """,
+    ]),
+]
+
+# Consultas calientes de app.py con parametros de ejemplo, para el
+# reporte de EXPLAIN QUERY PLAN.
+HOT_QUERIES = {
+    "view_car_services": ("""
+        SELECT id, car_id, service_type, service_date, mileage, cost
+        FROM service_records
+        WHERE car_id = ?
+        ORDER BY service_date DESC
+    """, (1,)),
+    "view_car_documents": ("""
+        SELECT id, car_id, doc_type, folio, expires_at, notes
+        FROM car_documents
+        WHERE car_id = ?
+        ORDER BY expires_at DESC
+    """, (1,)),
+    "documents_page": ("""
+        SELECT cd.id, cd.car_id, cd.doc_type, cd.folio, cd.expires_at, cd.notes,
+               c.brand, c.model, c.plate, u.name AS user_name
+        FROM car_documents cd
+        JOIN cars c ON c.id = cd.car_id
+        JOIN users u ON u.id = c.user_id
+        ORDER BY cd.expires_at DESC, cd.id DESC
+    """, ()),
+    "expiring_documents": ("""
+        SELECT cd.id, cd.expires_on, c.brand, u.name
+        FROM car_documents cd
+        JOIN cars c ON c.id = cd.car_id
+        JOIN users u ON u.id = c.user_id
+        WHERE cd.expires_on >= ? AND cd.expires_on <= ?
+        ORDER BY cd.expires_on, cd.id
+    """, ("2026-01-01", "2026-01-31")),
+    "expiry_buckets": ("""
+        SELECT expires_on, COUNT(*)
+        FROM car_documents
+        WHERE expires_on >= ? AND expires_on <= ?
+        GROUP BY expires_on
+    """, ("2026-01-01", "2026-01-31")),
+    "cars_by_user": ("SELECT id FROM cars WHERE user_id = ?", (1,)),
+    "cars_by_brand": ("""
+        SELECT id FROM cars
+        WHERE brand = ? COLLATE NOCASE
+        ORDER BY id DESC
+    """, ("vw",)),
+    "service_records_by_type": ("""
+        SELECT id FROM service_records
+        WHERE service_type = ? AND service_date >= ? AND service_date <= ?
+        ORDER BY id DESC
+    """, ("oil", "2024-01-01", "2024-12-31")),
+    "fetch_car_with_owner": ("""
+        SELECT cars.id, cars.user_id, users.name AS user_name,
+               cars.brand, cars.model, cars.year, cars.plate
+        FROM cars
+        JOIN users ON users.id = cars.user_id
+        WHERE cars.id = ?
+    """, (1,)),
+}
+
+
+def current_version(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+    """)
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def migrate(conn, target=None):
+    """
+    Aplica en orden las migraciones pendientes. Devuelve las versiones aplicadas.
+    """
+    if conn.in_transaction:
+        conn.commit()
+
+    version = current_version(conn)
+    conn.commit()
+    applied = []
+
+    for number, name, statements in MIGRATIONS:
+        if number <= version or (target is not None and number > target):
+            continue
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(
+                "INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                (number, name, datetime.now(timezone.utc).isoformat(timespec="seconds")),
+            )
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+        applied.append(number)
+
+    return applied
+
+
+def explain_hot_queries(conn):
+    """
+    EXPLAIN QUERY PLAN de cada consulta caliente: {nombre: [detalle, ...]}.
+    Un "SCAN" sobre una tabla grande o "USE TEMP B-TREE" indica regresion.
+    """
+    report = {}
+    for name, (sql, params) in HOT_QUERIES.items():
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        report[name] = [row[3] for row in rows]
+    return report
+
+
+def format_report(report):
+    lines = []
+    for name, details in report.items():
+        lines.append(f"{name}:")
+        lines.extend(f"    {detail}" for detail in details)
+    return "\n".join(lines)
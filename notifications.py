@@ -0,0 +1,181 @@
+import json
+import logging
+import smtplib
+import threading
+import time
+from datetime import date, timedelta
+from email.message import EmailMessage
+
+logger = logging.getLogger("garage.notifications")
+
+# Documentos que vencen en la ventana, con su duenio. La clave de
+# idempotencia incluye expires_on: al renovar un documento (nueva fecha)
+# corresponde un aviso nuevo, pero repetir el escaneo no genera otro.
+ENQUEUE_EXPIRING_SQL = """
+    INSERT INTO notifications (
+        idempotency_key, kind, document_id, user_id, recipient, payload, created_at
+    )
+    SELECT
+        'doc-expiry:' || cd.id || ':' || cd.expires_on,
+        'doc-expiry',
+        cd.id,
+        u.id,
+        u.email,
+        json_object(
+            'user_name', u.name,
+            'doc_type', cd.doc_type,
+            'folio', cd.folio,
+            'expires_on', cd.expires_on,
+            'car_id', c.id,
+            'brand', c.brand,
+            'model', c.model,
+            'plate', c.plate
+        ),
+        ?
+    FROM car_documents cd
+    JOIN cars c ON c.id = cd.car_id
+    JOIN users u ON u.id = c.user_id
+    WHERE cd.expires_on >= ? AND cd.expires_on <= ?
+    ORDER BY cd.expires_on, cd.id
+    ON CONFLICT (idempotency_key) DO NOTHING
+"""
+
+
+def render_expiry(payload: dict):
+    """(asunto, cuerpo) del aviso de vencimiento."""
+    car = f"{payload['brand']} {payload['model']}"
+    if payload.get("plate"):
+        car += f" ({payload['plate']})"
+    subject = f"Vence {payload['doc_type']} de tu {car}"
+    body = (
+        f"Hola {payload['user_name']},\n\n"
+        f"El documento {payload['doc_type']} (folio {payload['folio']}) de tu {car} "
+        f"vence el {payload['expires_on']}.\n"
+    )
+    return subject, body
+
+
+# -------------------------
+# SINKS (destino de los avisos)
+# Cada sink implementa send(recipient, subject, body) y lanza excepcion si falla.
+# -------------------------
+
+class LogSink:
+    def send(self, recipient: str, subject: str, body: str):
+        logger.info("Aviso para %s: %s", recipient, subject)
+
+
+class FileSink:
+    """Una linea JSON por aviso; util en desarrollo y para auditoria."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, recipient: str, subject: str, body: str):
+        line = json.dumps({"to": recipient, "subject": subject, "body": body, "sent_at": time.time()})
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+class SmtpSink:
+    def __init__(self, host: str, port: int = 25, sender: str = "garage@localhost", timeout: float = 10):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.timeout = timeout
+
+    def send(self, recipient: str, subject: str, body: str):
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = recipient
+        message["Subject"] = subject
+        message.set_content(body)
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            smtp.send_message(message)
+
+
+def make_sink(config):
+    kind = config["NOTIFY_SINK"]
+    if kind == "log":
+        return LogSink()
+    if kind == "file":
+        return FileSink(config["NOTIFY_FILE"])
+    if kind == "smtp":
+        return SmtpSink(config["SMTP_HOST"], config["SMTP_PORT"], config["NOTIFY_FROM"])
+    raise ValueError(f"NOTIFY_SINK desconocido: {kind}")
+
+
+# -------------------------
+# COLA Y ENVIO
+# -------------------------
+
+def enqueue_expiring(conn, writer, days: int, today=None):
+    """Encola un aviso por documento que vence en los proximos days dias. Devuelve cuantos encolo."""
+    today = today or date.today()
+    end = today + timedelta(days=days)
+    with writer.transaction(conn):
+        before = conn.total_changes
+        conn.execute(ENQUEUE_EXPIRING_SQL, (time.time(), today.isoformat(), end.isoformat()))
+        return conn.total_changes - before
+
+
+def deliver_pending(conn, writer, sink, batch_size: int = 100, max_attempts: int = 5):
+    """
+    Envia los avisos pendientes. Cada uno se marca como enviado en su propia
+    transaccion justo despues de enviarlo, asi un reinicio solo reintenta lo
+    que no se confirmo. Tras max_attempts fallos queda en 'failed'.
+    """
+    sent = failed = 0
+    rows = conn.execute("""
+        SELECT id, kind, recipient, payload
+        FROM notifications
+        WHERE status = 'pending'
+        ORDER BY id
+        LIMIT ?
+    """, (batch_size,)).fetchall()
+
+    for row in rows:
+        subject, body = render_expiry(json.loads(row["payload"]))
+        try:
+            sink.send(row["recipient"], subject, body)
+        except Exception as exc:
+            failed += 1
+            with writer.transaction(conn):
+                conn.execute("""
+                    UPDATE notifications SET
+                        attempts = attempts + 1,
+                        last_error = ?,
+                        status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END
+                    WHERE id = ?
+                """, (str(exc), max_attempts, row["id"]))
+            continue
+
+        sent += 1
+        with writer.transaction(conn):
+            conn.execute("""
+                UPDATE notifications
+                SET status = 'sent', attempts = attempts + 1, sent_at = ?, last_error = NULL
+                WHERE id = ?
+            """, (time.time(), row["id"]))
+
+    return sent, failed
+
+
+def expiry_scan(conn, writer, sink, days: int = 30, batch_size: int = 100):
+    """Trabajo periodico: encola los vencimientos proximos y envia lo pendiente."""
+    queued = enqueue_expiring(conn, writer, days)
+    sent = failed = 0
+    while True:
+        batch_sent, batch_failed = deliver_pending(conn, writer, sink, batch_size)
+        sent += batch_sent
+        failed += batch_failed
+        # Un lote con fallos se deja para la proxima corrida (reintento con espera).
+        if batch_failed or batch_sent < batch_size:
+            break
+    return {"queued": queued, "sent": sent, "failed": failed, "days": days}
+
+
+def counts(conn):
+    rows = conn.execute("SELECT status, COUNT(*) AS total FROM notifications GROUP BY status").fetchall()
+    return {r["status"]: r["total"] for r in rows}
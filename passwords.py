@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HasherBusy(Exception):
+    """La cola de hashing esta llena o no respondio a tiempo; el cliente debe reintentar."""
+
+
+def is_hashed(stored_password: str):
+    return stored_password.startswith("scrypt:") or stored_password.startswith("pbkdf2:")
+
+
+def _hash(password: str, method: str):
+    return generate_password_hash(password, method=method)
+
+
+def _verify(stored_password: str, raw_password: str):
+    return check_password_hash(stored_password, raw_password)
+
+
+class PasswordHasher:
+    """
+    Ejecuta scrypt/pbkdf2 en un pool de procesos acotado para no bloquear
+    el hilo del request (ni el GIL) durante el hash.
+    - method: metodo de werkzeug, ej. "scrypt:32768:8:1" (define el costo).
+    - workers: procesos del pool; 0 hace el hash en linea.
+    - max_pending: trabajos en cola o en curso antes de rechazar con HasherBusy.
+    El pool se crea en el primer uso, despues del fork de gunicorn.
+    """
+
+    def __init__(self, method: str = "scrypt", workers: int = 2, max_pending: int = 32, timeout: float = 10.0):
+        self.method = method
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._pid = os.getpid()
+            return self._executor
+
+    def _run(self, fn, *args):
+        if self.workers <= 0:
+            return fn(*args)
+
+        executor = self._get_executor()
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            future = executor.submit(fn, *args)
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise HasherBusy() from None
+        except BrokenProcessPool:
+            # Un worker murio (OOM, kill): el pool ya no acepta trabajos y
+            # el siguiente hash arma uno nuevo.
+            self._discard(executor)
+            raise HasherBusy() from None
+        finally:
+            self._slots.release()
+
+    def _discard(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def hash(self, password: str):
+        return self._run(_hash, password, self.method)
+
+    def verify(self, stored_password: str, raw_password: str):
+        # Passwords antiguas en texto plano: se comparan sin pasar por el pool.
+        if not is_hashed(stored_password):
+            return stored_password == raw_password
+        return self._run(_verify, stored_password, raw_password)
+
+    def shutdown(self, wait: bool = False):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=True)
+                self._executor = None
+
+
+class TokenBucketLimiter:
+    """
+    Token bucket por llave (email, IP...): capacity intentos de rafaga que
+    se recargan a refill_rate tokens por segundo (mayor que 0: sin recarga
+    un bloqueo seria permanente y no habria Retry-After que mandar).
+    """
+
+    def __init__(self, capacity: float = 5, refill_rate: float = 5 / 60, max_keys: int = 10000):
+        if refill_rate <= 0:
+            raise ValueError("refill_rate debe ser mayor que 0 (LOGIN_RATE_PER_MINUTE)")
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float):
+        # Un bucket que ya se relleno por completo equivale a no tenerlo.
+        full_after = self.capacity / self.refill_rate
+        self._buckets = {
+            key: (tokens, stamp)
+            for key, (tokens, stamp) in self._buckets.items()
+            if now - stamp < full_after
+        }
+
+    def consume(self, key: str):
+        """
+        Descuenta un token. Devuelve 0 si se permite o los segundos a esperar.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, stamp = self._buckets.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - stamp) * self.refill_rate)
+
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                return (1 - tokens) / self.refill_rate
+
+            self._buckets[key] = (tokens - 1, now)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+            return 0
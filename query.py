@@ -0,0 +1,129 @@
+import base64
+import json
+
+from shards import merge_sorted, sql_order_key
+
+
+class ListQuery:
+    """
+    Constructor minimo de consultas de listado.
+    - Los filtros se agregan como fragmentos con placeholders "?": los valores
+      del usuario nunca se interpolan en el SQL.
+    - El orden solo acepta campos de la lista blanca sort_fields
+      (nombre publico -> expresion SQL).
+    - Paginacion keyset sobre (campo de orden, id), asi que cualquier orden
+      permitido sigue siendo un seek por indice en lugar de OFFSET.
+    """
+
+    def __init__(self, select_sql: str, id_column: str, sort_fields=None):
+        self.select_sql = select_sql
+        self.id_column = id_column
+        self.sort_fields = dict(sort_fields or {})
+        self.sort_fields.setdefault("id", id_column)
+        self.where = []
+        self.params = []
+        self.sort_key = "id"
+        self.descending = True
+
+    def filter(self, clause: str, *params):
+        self.where.append(clause)
+        self.params.extend(params)
+        return self
+
+    def order_by(self, spec):
+        """
+        spec: "campo" (ascendente) o "-campo" (descendente). ValueError si
+        el campo no esta en la lista blanca.
+        """
+        if not spec:
+            return self
+        descending = spec.startswith("-")
+        key = spec.lstrip("-")
+        if key not in self.sort_fields:
+            raise ValueError(key)
+        self.sort_key = key
+        self.descending = descending
+        return self
+
+    def encode_cursor(self, row):
+        if self.sort_key == "id":
+            return row["id"]
+        raw = json.dumps([row[self.sort_key], row["id"]]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        """ValueError si el cursor no corresponde al orden pedido."""
+        if self.sort_key == "id":
+            return [int(cursor)]
+        padded = cursor + "=" * (-len(cursor) % 4)
+        try:
+            value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+            row_id = int(row_id)
+        except Exception:
+            raise ValueError(cursor)
+        # Lo que se bindea a SQLite: un escalar como los que produce encode_cursor.
+        if isinstance(value, bool) or not isinstance(value, (str, int, float, type(None))):
+            raise ValueError(cursor)
+        return [value, row_id]
+
+    def build(self, after=None):
+        """
+        Devuelve (sql, params) sin LIMIT. after es el cursor de la pagina anterior.
+        """
+        where = list(self.where)
+        params = list(self.params)
+        op = "<" if self.descending else ">"
+        direction = "DESC" if self.descending else "ASC"
+        sort_column = self.sort_fields[self.sort_key]
+
+        if after is not None:
+            values = self.decode_cursor(after)
+            if self.sort_key == "id":
+                where.append(f"{self.id_column} {op} ?")
+            else:
+                where.append(f"({sort_column}, {self.id_column}) {op} (?, ?)")
+            params.extend(values)
+
+        sql = self.select_sql
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if self.sort_key == "id":
+            sql += f" ORDER BY {self.id_column} {direction}"
+        else:
+            sql += f" ORDER BY {sort_column} {direction}, {self.id_column} {direction}"
+        return sql, params
+
+    def fetch_page(self, conn, limit: int, after=None):
+        """
+        Devuelve (filas, next_cursor); next_cursor es None en la ultima pagina.
+        """
+        sql, params = self.build(after)
+        rows = conn.execute(sql + " LIMIT ?", params + [limit + 1]).fetchall()
+        if len(rows) > limit:
+            return rows[:limit], self.encode_cursor(rows[limit - 1])
+        return rows, None
+
+    def row_key(self, row):
+        """Clave de orden de una fila en Python, igual al ORDER BY de build()."""
+        if self.sort_key == "id":
+            return row["id"]
+        nocase = "COLLATE NOCASE" in self.sort_fields[self.sort_key].upper()
+        return sql_order_key(row[self.sort_key], nocase), row["id"]
+
+    def merge_pages(self, pages, limit: int):
+        """
+        Une las paginas (filas, next_cursor) del mismo cursor leidas en
+        varios shards: merge k-way por (campo de orden, id) y corte en limit.
+        """
+        rows = list(merge_sorted([page for page, _ in pages], key=self.row_key, reverse=self.descending))
+        more = len(rows) > limit or any(cursor is not None for _, cursor in pages)
+        # Tablas derivadas (service_forecast) repiten ids entre shards: no se
+        # corta dentro de un grupo de claves iguales, o el cursor saltaria
+        # las filas del mismo grupo en los otros shards.
+        if len(rows) > limit:
+            cut, boundary = limit, self.row_key(rows[limit])
+            while cut and self.row_key(rows[cut - 1]) == boundary:
+                cut -= 1
+            limit = cut or limit
+        rows = rows[:limit]
+        return rows, self.encode_cursor(rows[-1]) if more and rows else None
@@ -0,0 +1,77 @@
+import heapq
+import re
+
+# Solo letras/numeros: el resto de la sintaxis FTS5 (comillas, NEAR, ^, :)
+# nunca llega desde el usuario.
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+CARS_SQL = """
+    SELECT
+        'car' AS type,
+        c.id,
+        c.id AS car_id,
+        c.brand || ' ' || c.model || ' (' || c.year || ')' AS title,
+        COALESCE(c.plate, '') AS snippet,
+        bm25(cars_fts, 2.0, 2.0, 5.0) AS rank
+    FROM cars_fts
+    JOIN cars c ON c.id = cars_fts.rowid
+    WHERE cars_fts MATCH ?
+"""
+
+DOCUMENTS_SQL = """
+    SELECT
+        'document' AS type,
+        d.id,
+        d.car_id,
+        d.doc_type || ' ' || d.folio AS title,
+        snippet(car_documents_fts, -1, '[', ']', '...', 10) AS snippet,
+        bm25(car_documents_fts, 1.0, 5.0, 1.0) AS rank
+    FROM car_documents_fts
+    JOIN car_documents d ON d.id = car_documents_fts.rowid
+    WHERE car_documents_fts MATCH ?
+"""
+
+SOURCES = {"car": CARS_SQL, "document": DOCUMENTS_SQL}
+
+
+def match_expression(text: str):
+    """
+    Convierte el texto libre en una expresion FTS5: cada palabra es un
+    prefijo entre comillas y todas deben aparecer ("abc 12" -> "abc"* "12"*).
+    Devuelve None si no hay palabras buscables.
+    """
+    tokens = TOKEN_RE.findall(text or "")
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def search(conn, text: str, limit: int, offset: int = 0, kinds=None):
+    """
+    Busqueda rankeada (bm25, menor es mejor) sobre coches y documentos.
+    Devuelve (filas, next_offset); next_offset es None en la ultima pagina.
+    """
+    expression = match_expression(text)
+    if expression is None:
+        return [], None
+
+    selected = [SOURCES[kind] for kind in (kinds or SOURCES)]
+    sql = " UNION ALL ".join(selected) + " ORDER BY rank, type, id LIMIT ? OFFSET ?"
+    params = [expression] * len(selected) + [limit + 1, offset]
+
+    rows = conn.execute(sql, params).fetchall()
+    if len(rows) > limit:
+        return rows[:limit], offset + limit
+    return rows, None
+
+
+def merge(pages, limit: int, offset: int = 0):
+    """
+    Une los resultados de varios shards, cada uno pedido con
+    search(conn, text, limit + offset, 0): merge por (rank, type, id) y
+    corte. bm25 usa estadisticas de cada shard, asi que el orden entre
+    shards es aproximado.
+    """
+    merged = list(heapq.merge(*[rows for rows, _ in pages], key=lambda r: (r["rank"], r["type"], r["id"])))
+    more = len(merged) > offset + limit or any(next_offset is not None for _, next_offset in pages)
+    return merged[offset:offset + limit], offset + limit if more else None
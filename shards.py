@@ -0,0 +1,445 @@
+import contextvars
+import heapq
+import os
+import string
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+
+from versions import table_version
+
+# Sharding opcional por duenio (DATABASE_SHARDS). La base principal
+# (DATABASE) queda como directorio: usuarios (login, email unico), trabajos,
+# user_shards (que shard tiene a cada duenio) e id_blocks (ids globales).
+# Cada shard tiene el esquema completo con una copia de la fila del duenio
+# (sin password) y toda su flota: coches, servicios, documentos y avisos.
+
+# Tablas de la flota con ids globales, en orden de copia (padres primero).
+FLEET_TABLES = ("cars", "service_records", "car_documents")
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def sql_order_key(value, nocase: bool = False):
+    """
+    Clave de Python con el mismo orden que ORDER BY de SQLite: NULL, numeros,
+    texto y blobs. El texto BINARY compara por UTF-8 (igual que por punto de
+    codigo) y NOCASE solo pasa a minusculas ASCII.
+    """
+    if value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value.translate(_ASCII_LOWER) if nocase else value)
+    return (3, bytes(value))
+
+
+def iter_cursor(cursor, chunk_size: int):
+    """Filas de un cursor leidas con fetchmany."""
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def merge_sorted(iterables, key, reverse: bool = False):
+    """Merge k-way de secuencias ya ordenadas por key (cada shard ordena en SQL)."""
+    return heapq.merge(*iterables, key=key, reverse=reverse)
+
+
+def chunked(rows, size: int):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def plan_rebalance(loads, user_loads):
+    """
+    Movimientos (user_id, origen, destino) para nivelar la carga (coches por
+    shard). Greedy: mueve del shard mas cargado al menos cargado el duenio
+    mas grande que no invierta la diferencia; para cuando ninguno sirve.
+    loads: carga por shard; user_loads: {shard: {user_id: carga}}.
+    """
+    loads = list(loads)
+    user_loads = {shard: dict(users) for shard, users in user_loads.items()}
+    moves = []
+    while True:
+        heavy = max(range(len(loads)), key=lambda i: loads[i])
+        light = min(range(len(loads)), key=lambda i: loads[i])
+        gap = loads[heavy] - loads[light]
+        candidates = [
+            (load, user_id) for user_id, load in user_loads.get(heavy, {}).items()
+            if 0 < load <= gap // 2
+        ]
+        if not candidates:
+            return moves
+        load, user_id = max(candidates)
+        moves.append((user_id, heavy, light))
+        loads[heavy] -= load
+        loads[light] += load
+        user_loads[heavy].pop(user_id)
+        user_loads.setdefault(light, {})[user_id] = load
+
+
+def _exists(conn, table: str, row_id: int):
+    return conn.execute(f"SELECT 1 FROM {table} WHERE id = ?", (row_id,)).fetchone() is not None
+
+
+def _copy(source, target, table: str, where: str, params):
+    # table_info omite las columnas generadas (expires_on), que no se insertan.
+    columns = [row[1] for row in source.execute(f"PRAGMA table_info({table})")]
+    rows = source.execute(f"SELECT {', '.join(columns)} FROM {table} WHERE {where}", params).fetchall()
+    if rows:
+        placeholders = ", ".join("?" * len(columns))
+        target.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+    return len(rows)
+
+
+def copy_fleet(source, target, user_id: int):
+    """
+    Copia la flota del duenio de source a target (que ya tiene su fila de
+    users). Los rollups, el pronostico y el indice FTS los rehacen los
+    triggers de target. Devuelve filas copiadas por tabla.
+    """
+    cars = "user_id = ?"
+    by_car = "car_id IN (SELECT id FROM cars WHERE user_id = ?)"
+    return {
+        "cars": _copy(source, target, "cars", cars, (user_id,)),
+        "service_records": _copy(source, target, "service_records", by_car, (user_id,)),
+        "car_documents": _copy(source, target, "car_documents", by_car, (user_id,)),
+        "notifications": _copy(source, target, "notifications", "user_id = ?", (user_id,)),
+    }
+
+
+def mirror_user(conn, user_id: int, name: str, email: str):
+    """Fila del duenio en su shard: solo para FK y joins (la password vive en el directorio)."""
+    conn.execute(
+        "INSERT INTO users (id, name, email, password) VALUES (?, ?, ?, '')",
+        (user_id, name, email),
+    )
+
+
+class Shard:
+    def __init__(self, index: int, path: str, pool, writer):
+        self.index = index
+        self.path = path
+        self.pool = pool
+        self.writer = writer
+
+    @contextmanager
+    def connection(self):
+        conn = self.pool.acquire()
+        try:
+            yield conn
+        finally:
+            self.pool.release(conn)
+
+
+class ShardSet:
+    """
+    Router de shards por duenio.
+    - Las consultas de toda la flota corren en paralelo en todos los shards
+      (fan_out, pool de hilos de workers) y se unen con merge_sorted.
+    - Las rutas por id (coche, servicio, documento) ubican el shard con una
+      consulta por PK en paralelo; el resultado se guarda en un LRU que se
+      vacia cuando cambia user_shards (un duenio se movio de shard).
+    - Los ids de la flota son globales: se reservan del directorio en
+      bloques de id_block por proceso.
+    """
+
+    def __init__(self, directory_pool, directory_writer, shards, workers: int = 8,
+                 id_block: int = 64, locate_cache: int = 10000):
+        self.directory_pool = directory_pool
+        self.directory_writer = directory_writer
+        self.shards = list(shards)
+        self.workers = workers
+        self.id_block = id_block
+        self.locate_cache = locate_cache
+        self._executor = None
+        self._pid = None
+        self._blocks = {}
+        self._blocks_pid = None
+        self._located = OrderedDict()
+        self._located_version = None
+        self._lock = threading.Lock()
+        self._id_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.shards)
+
+    # -------------------------
+    # FAN-OUT
+    # -------------------------
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="shard")
+                self._pid = os.getpid()
+            return self._executor
+
+    def _call(self, shard, fn, args, write):
+        with shard.connection() as conn:
+            if not write:
+                return fn(conn, *args)
+            with shard.writer.transaction(conn):
+                return fn(conn, *args)
+
+    def _submit_all(self, fn, args, write, indexes=None):
+        executor = self._get_executor()
+        selected = self.shards if indexes is None else [self.shards[i] for i in indexes]
+        # Cada tarea corre con una copia del contexto: las metricas de SQL se
+        # atribuyen al request que hizo la consulta.
+        futures = [
+            executor.submit(contextvars.copy_context().run, self._call, shard, fn, args, write)
+            for shard in selected
+        ]
+        return [future.result() for future in futures]
+
+    def fan_out(self, fn, *args):
+        """fn(conn, *args) en cada shard, en paralelo. Resultados en orden de shard."""
+        return self._submit_all(fn, args, write=False)
+
+    def fan_out_write(self, fn, *args, indexes=None):
+        """Como fan_out, pero en una transaccion de escritura por shard (no atomica entre shards)."""
+        return self._submit_all(fn, args, write=True, indexes=indexes)
+
+    @contextmanager
+    def connections(self):
+        """Una conexion por shard (exportaciones y comandos que leen en serie)."""
+        with ExitStack() as stack:
+            yield [stack.enter_context(shard.connection()) for shard in self.shards]
+
+    # -------------------------
+    # DIRECTORIO
+    # -------------------------
+
+    def shard_of_user(self, conn, user_id: int):
+        """Indice del shard del duenio (conn es del directorio); None si no existe."""
+        row = conn.execute("SELECT shard FROM user_shards WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else None
+
+    def locate(self, conn, table: str, row_id: int):
+        """Shard que tiene la fila (users por directorio, la flota por PK); None si no existe."""
+        if table == "users":
+            return self.shard_of_user(conn, row_id)
+
+        version = table_version(conn, "user_shards")
+        key = (table, row_id)
+        with self._lock:
+            if version != self._located_version:
+                self._located.clear()
+                self._located_version = version
+            if key in self._located:
+                self._located.move_to_end(key)
+                return self._located[key]
+
+        found = [i for i, hit in enumerate(self.fan_out(_exists, table, row_id)) if hit]
+        if not found:
+            # Los fallos no se guardan: la fila puede crearse despues.
+            return None
+
+        with self._lock:
+            if version == self._located_version:
+                self._located[key] = found[0]
+                if len(self._located) > self.locate_cache:
+                    self._located.popitem(last=False)
+        return found[0]
+
+    def _least_loaded(self, conn):
+        counts = dict(conn.execute("SELECT shard, COUNT(*) FROM user_shards GROUP BY shard").fetchall())
+        return min(range(len(self.shards)), key=lambda i: counts.get(i, 0))
+
+    def add_user(self, conn, user_id: int, name: str, email: str):
+        """
+        Asigna shard al duenio recien creado (el de menos duenios) y crea su
+        fila en el. Corre dentro de la transaccion del directorio: si falla
+        el shard, el alta completa se revierte.
+        """
+        index = self._least_loaded(conn)
+        conn.execute("INSERT INTO user_shards (user_id, shard) VALUES (?, ?)", (user_id, index))
+        shard = self.shards[index]
+        with shard.connection() as shard_conn, shard.writer.transaction(shard_conn):
+            mirror_user(shard_conn, user_id, name, email)
+        return index
+
+    def update_user(self, conn, user_id: int, name: str, email: str):
+        index = self.shard_of_user(conn, user_id)
+        if index is None:
+            return
+        shard = self.shards[index]
+        with shard.connection() as shard_conn, shard.writer.transaction(shard_conn):
+            shard_conn.execute("UPDATE users SET name = ?, email = ? WHERE id = ?", (name, email, user_id))
+
+    def remove_user(self, conn, user_id: int):
+        """Borra al duenio de su shard (la cascada borra su flota). user_shards cae con el usuario."""
+        index = self.shard_of_user(conn, user_id)
+        if index is None:
+            return
+        shard = self.shards[index]
+        with shard.connection() as shard_conn, shard.writer.transaction(shard_conn):
+            shard_conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
+
+    # -------------------------
+    # IDS GLOBALES
+    # -------------------------
+
+    def _reserve(self, table: str, size: int):
+        reserve = "UPDATE id_blocks SET next_id = next_id + ? WHERE name = ? RETURNING next_id - ?"
+        conn = self.directory_pool.acquire()
+        try:
+            with self.directory_writer.transaction(conn):
+                row = conn.execute(reserve, (size, table, size)).fetchone()
+                if row is None:
+                    # Primer alta sin `flask shards init`: se siembra desde los datos.
+                    self.seed_ids(conn)
+                    row = conn.execute(reserve, (size, table, size)).fetchone()
+        finally:
+            self.directory_pool.release(conn)
+        return row[0]
+
+    def allocate_ids(self, table: str, n: int):
+        """
+        n ids nuevos para table. No llamar dentro de una transaccion del
+        directorio. Los bloques reservados y no usados quedan como huecos.
+        """
+        if n <= 0:
+            return []
+        with self._id_lock:
+            if self._blocks_pid != os.getpid():
+                # Un bloque heredado por fork se repartiria entre dos procesos.
+                self._blocks = {}
+                self._blocks_pid = os.getpid()
+            start, end = self._blocks.get(table, (0, 0))
+            if end - start < n:
+                size = max(n, self.id_block)
+                start = self._reserve(table, size)
+                end = start + size
+            self._blocks[table] = (start + n, end)
+            return list(range(start, start + n))
+
+    def seed_ids(self, conn):
+        """
+        Deja id_blocks por encima del mayor id de cada tabla en el directorio
+        y en todos los shards (tambien de los ids ya usados por AUTOINCREMENT).
+        """
+        for table in FLEET_TABLES:
+            query = f"SELECT MAX(id) FROM {table}"
+            highest = [conn.execute(query).fetchone()[0] or 0]
+            highest += [value or 0 for value in self.fan_out(lambda c: c.execute(query).fetchone()[0])]
+            sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+            next_id = max(highest + [sequence[0] if sequence else 0]) + 1
+            conn.execute("""
+                INSERT INTO id_blocks (name, next_id) VALUES (?, ?)
+                ON CONFLICT (name) DO UPDATE SET next_id = max(next_id, excluded.next_id)
+            """, (table, next_id))
+
+    # -------------------------
+    # REPARTO Y REBALANCEO (flask shards ...)
+    # -------------------------
+
+    def assign_existing(self):
+        """
+        Reparte los duenios que aun no tienen shard (base sin shards o altas
+        hechas sin DATABASE_SHARDS): crea su fila en el shard y mueve ahi la
+        flota que tenga en el directorio. Devuelve cuantos asigno.
+        """
+        assigned = 0
+        conn = self.directory_pool.acquire()
+        try:
+            users = conn.execute("""
+                SELECT id, name, email FROM users
+                WHERE id NOT IN (SELECT user_id FROM user_shards)
+                ORDER BY id
+            """).fetchall()
+            for user in users:
+                with self.directory_writer.transaction(conn):
+                    index = self._least_loaded(conn)
+                    conn.execute("INSERT INTO user_shards (user_id, shard) VALUES (?, ?)", (user["id"], index))
+                    shard = self.shards[index]
+                    with shard.connection() as shard_conn, shard.writer.transaction(shard_conn):
+                        shard_conn.execute("DELETE FROM users WHERE id = ?", (user["id"],))
+                        mirror_user(shard_conn, user["id"], user["name"], user["email"])
+                        copy_fleet(conn, shard_conn, user["id"])
+                    conn.execute("DELETE FROM cars WHERE user_id = ?", (user["id"],))
+                    conn.execute("DELETE FROM notifications WHERE user_id = ?", (user["id"],))
+                assigned += 1
+            with self.directory_writer.transaction(conn):
+                self.seed_ids(conn)
+        finally:
+            self.directory_pool.release(conn)
+        return assigned
+
+    def move_user(self, user_id: int, target: int):
+        """
+        Mueve al duenio y su flota al shard target sin detener el servicio.
+        Mientras copia tiene tomado el lock de escritura del directorio y del
+        shard origen: las escrituras a ese shard esperan (busy_timeout y
+        reintentos) y las lecturas siguen. Orden: copia y commit en destino,
+        borrado en origen, cambio en user_shards. Si se corta a la mitad,
+        volver a correrlo termina el movimiento.
+        Devuelve filas copiadas por tabla ({} si ya estaba en target).
+        """
+        if not 0 <= target < len(self.shards):
+            raise ValueError(f"Shard inexistente: {target}")
+
+        conn = self.directory_pool.acquire()
+        try:
+            with self.directory_writer.transaction(conn):
+                source = self.shard_of_user(conn, user_id)
+                if source is None:
+                    raise ValueError(f"Usuario sin shard: {user_id}")
+                if source == target:
+                    return {}
+
+                src, dst = self.shards[source], self.shards[target]
+                with src.connection() as src_conn, dst.connection() as dst_conn:
+                    with src.writer.transaction(src_conn):
+                        user = src_conn.execute(
+                            "SELECT id, name, email FROM users WHERE id = ?", (user_id,)
+                        ).fetchone()
+                        copied = {}
+                        # Sin fila en origen: una corrida anterior ya copio y borro.
+                        if user is not None:
+                            with dst.writer.transaction(dst_conn):
+                                dst_conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
+                                mirror_user(dst_conn, user_id, user["name"], user["email"])
+                                copied = copy_fleet(src_conn, dst_conn, user_id)
+                            src_conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
+                    conn.execute("UPDATE user_shards SET shard = ? WHERE user_id = ?", (target, user_id))
+                return copied
+        finally:
+            self.directory_pool.release(conn)
+
+    def loads(self):
+        """(coches por shard, {shard: {user_id: coches}}) para status y rebalance."""
+        per_shard = self.fan_out(
+            lambda conn: dict(conn.execute("SELECT user_id, COUNT(*) FROM cars GROUP BY user_id").fetchall())
+        )
+        return [sum(users.values()) for users in per_shard], dict(enumerate(per_shard))
+
+    def rebalance(self, dry_run: bool = False):
+        """Nivela los coches por shard moviendo duenios completos. Devuelve los movimientos."""
+        loads, user_loads = self.loads()
+        moves = plan_rebalance(loads, user_loads)
+        if not dry_run:
+            for user_id, _, target in moves:
+                self.move_user(user_id, target)
+        return moves
+
+    def stats(self):
+        return [dict(shard.pool.stats(), shard=shard.index, path=shard.path) for shard in self.shards]
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
@@ -0,0 +1,102 @@
+import json
+import logging
+import logging.handlers
+import sqlite3
+import threading
+import time
+
+import metrics
+
+# Sentencias a las que se les puede pedir EXPLAIN QUERY PLAN.
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+# Detalles del plan que casi siempre indican un indice faltante.
+SUSPICIOUS = ("USE TEMP B-TREE",)
+
+
+def params_shape(params):
+    """Forma de los parametros sin sus valores: tipos por posicion o por nombre."""
+    if params is None:
+        return "executemany"
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    return [type(value).__name__ for value in params]
+
+
+def normalize(sql: str):
+    return " ".join(sql.split())
+
+
+def suspicious(plan):
+    """Pasos del plan que suelen ser regresiones: SCAN sin indice o B-tree temporal."""
+    return [
+        detail for detail in plan
+        if (detail.startswith("SCAN") and "INDEX" not in detail) or any(s in detail for s in SUSPICIOUS)
+    ]
+
+
+class SlowQueryLog:
+    """
+    Hook de metrics.statement_hooks: cada sentencia que tarda threshold_ms
+    o mas (execute + fetch) se escribe como una linea JSON en un archivo
+    rotativo, con la forma de sus parametros y el endpoint que la ejecuto.
+    La primera vez que aparece una sentencia se agrega su EXPLAIN QUERY PLAN.
+    """
+
+    def __init__(self, path: str, threshold_ms: float, max_bytes: int = 5 * 1024 * 1024, backups: int = 5):
+        self.threshold = threshold_ms / 1000
+        self.logger = logging.getLogger("garage.slow_queries")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        for previous in list(self.logger.handlers):
+            self.logger.removeHandler(previous)
+            previous.close()
+        self.logger.addHandler(handler)
+        self._explained = set()
+        self._lock = threading.Lock()
+
+    def install(self):
+        # Una app nueva (create_app) reemplaza el log de la anterior.
+        metrics.statement_hooks[:] = [h for h in metrics.statement_hooks if not isinstance(h, SlowQueryLog)]
+        metrics.statement_hooks.append(self)
+
+    def __call__(self, conn, sql, params, seconds, rows):
+        if seconds < self.threshold:
+            return
+
+        statement = normalize(sql)
+        stats = metrics.current()
+        entry = {
+            "ts": round(time.time(), 3),
+            "ms": round(seconds * 1000, 2),
+            "endpoint": stats.endpoint if stats is not None else None,
+            "sql": statement,
+            "params": params_shape(params),
+            "rows": rows,
+        }
+
+        with self._lock:
+            first = statement not in self._explained
+            self._explained.add(statement)
+        if first:
+            plan = self.explain(conn, sql, params)
+            if plan is not None:
+                entry["plan"] = plan
+                entry["suspicious"] = suspicious(plan)
+
+        self.logger.info(json.dumps(entry, ensure_ascii=False))
+
+    @staticmethod
+    def explain(conn, sql, params):
+        if params is None or not sql.lstrip().upper().startswith(EXPLAINABLE):
+            return None
+        try:
+            # Connection.execute de sqlite3 (no el instrumentado): sin recursion.
+            rows = sqlite3.Connection.execute(conn, f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        except sqlite3.Error as exc:
+            return [f"EXPLAIN fallo: {exc}"]
+        return [row[3] for row in rows]
@@ -0,0 +1,102 @@
+// Helpers compartidos por los templates.
+
+// Pide una pagina a un endpoint paginado por cursor: { items, next_cursor }.
+async function fetchPage(url, after, limit) {
+  const params = new URLSearchParams();
+  if (limit) params.set("limit", limit);
+  if (after !== null && after !== undefined) params.set("after", after);
+
+  const sep = url.includes("?") ? "&" : "?";
+  const res = await fetch(params.toString() ? `${url}${sep}${params}` : url);
+  return res.json();
+}
+
+// Recorre todas las paginas (para <select> con todas las opciones).
+async function fetchAllPages(url) {
+  const items = [];
+  let after = null;
+
+  do {
+    const page = await fetchPage(url, after, 500);
+    items.push(...page.items);
+    after = page.next_cursor;
+  } while (after !== null);
+
+  return items;
+}
+
+// Lista con scroll infinito: carga la siguiente pagina cuando el
+// centinela del final entra en pantalla.
+function infiniteList({ url, container, renderItem, emptyHtml, wrap, limit, onPage }) {
+  let after = null;
+  let loading = false;
+  let done = false;
+  let list = null;
+  let generation = 0;
+
+  const sentinel = document.createElement("div");
+  sentinel.className = "scroll-sentinel";
+
+  const observer = new IntersectionObserver((entries) => {
+    if (entries.some(e => e.isIntersecting)) loadMore();
+  });
+
+  async function loadMore() {
+    if (loading || done) return;
+    loading = true;
+
+    const current = generation;
+    const page = await fetchPage(url, after, limit || 50);
+    if (current !== generation) return;  // llego tarde, hubo un reload
+    if (onPage && after === null) onPage(page);
+
+    if (list === null) {
+      if (!page.items.length) {
+        container.innerHTML = emptyHtml;
+        done = true;
+        loading = false;
+        return;
+      }
+      container.innerHTML = wrap ? wrap[0] + wrap[1] : "";
+      list = wrap ? container.firstElementChild : container;
+      container.appendChild(sentinel);
+      observer.observe(sentinel);
+    }
+
+    list.insertAdjacentHTML("beforeend", page.items.map(renderItem).join(""));
+    after = page.next_cursor;
+
+    if (after === null) {
+      done = true;
+      observer.disconnect();
+      sentinel.remove();
+    }
+    loading = false;
+
+    // Si la pagina no lleno la pantalla el observer no vuelve a disparar.
+    if (!done && sentinel.getBoundingClientRect().top < window.innerHeight) loadMore();
+  }
+
+  function reload(newUrl) {
+    if (newUrl) url = newUrl;
+    generation += 1;
+    loading = false;
+    after = null;
+    done = false;
+    list = null;
+    observer.disconnect();
+    loadMore();
+  }
+
+  loadMore();
+  return { reload };
+}
+
+// Arma "/ruta?campo=valor" con los campos no vacios de un formulario de filtros.
+function filterUrl(base, form) {
+  const params = new URLSearchParams();
+  for (const [key, value] of new FormData(form)) {
+    if (String(value).trim()) params.set(key, String(value).trim());
+  }
+  return params.toString() ? `${base}?${params}` : base;
+}
@@ -0,0 +1,51 @@
+# Lecturas y mantenimiento del rollup car_stats (migracion 6).
+# Los triggers de service_records lo mantienen al dia; aqui solo se lee
+# o se reconstruye.
+
+
+def car_stats(conn, car_id: int):
+    row = conn.execute("""
+        SELECT service_count, total_cost, last_service_date, latest_mileage
+        FROM car_stats
+        WHERE car_id = ?
+    """, (car_id,)).fetchone()
+
+    if row is None:
+        return {
+            "car_id": car_id,
+            "service_count": 0,
+            "total_cost": 0.0,
+            "last_service_date": None,
+            "latest_mileage": None,
+        }
+    return {"car_id": car_id, **dict(row), "total_cost": round(row["total_cost"], 2)}
+
+
+def user_stats(conn, user_id: int):
+    """Totales del duenio sumando los rollups de sus coches (indice por user_id)."""
+    row = conn.execute("""
+        SELECT
+            COUNT(c.id) AS car_count,
+            COALESCE(SUM(s.service_count), 0) AS service_count,
+            COALESCE(SUM(s.total_cost), 0) AS total_cost,
+            MAX(s.last_service_date) AS last_service_date
+        FROM cars c
+        LEFT JOIN car_stats s ON s.car_id = c.id
+        WHERE c.user_id = ?
+    """, (user_id,)).fetchone()
+    return {"user_id": user_id, **dict(row), "total_cost": round(row["total_cost"], 2)}
+
+
+def rebuild_car_stats(conn):
+    """
+    Recalcula car_stats desde service_records (backfill o para corregir la
+    deriva de redondeo de total_cost). Llamar dentro de una transaccion.
+    """
+    conn.execute("DELETE FROM car_stats")
+    conn.execute("""
+        INSERT INTO car_stats (car_id, service_count, total_cost, last_service_date, latest_mileage)
+        SELECT car_id, COUNT(*), SUM(cost), MAX(service_date), MAX(mileage)
+        FROM service_records
+        GROUP BY car_id
+    """)
+    return conn.execute("SELECT COUNT(*) FROM car_stats").fetchone()[0]
@@ -0,0 +1,240 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+# Multi-taller (TENANTS_DIR): cada taller es un archivo SQLite completo
+# (<TENANTS_DIR>/<taller>.db, mismo esquema que la base principal). El
+# taller del request sale de la cabecera (X-Tenant) o del subdominio. La
+# base principal queda para los trabajos en segundo plano.
+
+# Nombre de taller: una etiqueta DNS en minusculas (tambien es nombre de archivo).
+SLUG_RE = re.compile(r"^[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?$")
+
+
+def tenant_from_request(host: str, header_value, domain: str):
+    """
+    Taller pedido: la cabecera si viene, si no el subdominio de domain
+    (taller1.garage.example con domain=garage.example). None si no hay.
+    """
+    if header_value:
+        return header_value.strip().lower()
+    if not domain:
+        return None
+    host = (host or "").split(":", 1)[0].lower().rstrip(".")
+    suffix = "." + domain.lower()
+    if not host.endswith(suffix):
+        return None
+    label = host[:-len(suffix)]
+    return label if label and "." not in label else None
+
+
+class TenantStore:
+    """
+    Pool y escritor de un taller, con sus caches por version.
+    active cuenta las conexiones prestadas: un pool en uso no se cierra.
+    Tiene la interfaz de un pool (acquire/release) para streams y exportaciones.
+    """
+
+    def __init__(self, slug: str, path: str, pool, writer, caches, lock):
+        self.slug = slug
+        self.path = path
+        self.pool = pool
+        self.writer = writer
+        self.caches = caches
+        self.active = 0
+        self.closed = False
+        self.last_used = time.monotonic()
+        self._lock = lock
+
+    def acquire(self):
+        with self._lock:
+            self.active += 1
+            self.last_used = time.monotonic()
+        try:
+            return self.pool.acquire()
+        except BaseException:
+            with self._lock:
+                self.active -= 1
+            raise
+
+    def release(self, conn):
+        self.pool.release(conn)
+        with self._lock:
+            self.active -= 1
+            self.last_used = time.monotonic()
+            closed = self.closed
+        # Desalojado mientras tenia conexiones prestadas: se cierra al devolverlas.
+        if closed:
+            self.pool.close_all()
+
+    def close(self):
+        self.pool.close_all()
+
+    def stats(self):
+        return dict(self.pool.stats(), tenant=self.slug, active=self.active)
+
+
+class TenantStores:
+    """
+    Bases de los talleres, abiertas al primer request de cada uno.
+    - LRU de a lo mas max_open talleres abiertos (un pool chico cada uno).
+    - Los que pasan idle_seconds sin uso se cierran; se revisa al abrir otro.
+    - open_store(slug, path) arma el TenantStore; abrir es barato porque el
+      pool conecta con la primera consulta.
+    Los archivos no se crean aqui: un taller existe si existe su archivo
+    (flask tenants create).
+    """
+
+    def __init__(self, directory: str, open_store, max_open: int = 64, idle_seconds: float = 300.0):
+        self.directory = directory
+        self.max_open = max_open
+        self.idle_seconds = idle_seconds
+        self._open_store = open_store
+        self._stores = OrderedDict()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._next_sweep = 0.0
+        self._counters = {"hits": 0, "opens": 0, "evictions": 0, "unknown": 0}
+
+    def path(self, slug: str):
+        """Archivo del taller, o None si el nombre no es valido."""
+        if not slug or not SLUG_RE.match(slug):
+            return None
+        return os.path.join(self.directory, f"{slug}.db")
+
+    def slugs(self):
+        """Talleres con archivo en directory, en orden alfabetico."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-3] for name in names if name.endswith(".db") and SLUG_RE.match(name[:-3]))
+
+    def get(self, slug: str):
+        """TenantStore del taller (lo abre si hace falta), o None si no existe."""
+        path = self.path(slug)
+        if path is None:
+            return None
+
+        with self._lock:
+            if self._pid != os.getpid():
+                # Hijo de un fork: las conexiones heredadas no se usan ni se cierran.
+                self._stores = OrderedDict()
+                self._pid = os.getpid()
+            store = self._stores.get(slug)
+            if store is not None:
+                self._stores.move_to_end(slug)
+                self._counters["hits"] += 1
+                return store
+
+        if not os.path.exists(path):
+            with self._lock:
+                self._counters["unknown"] += 1
+            return None
+
+        opened = self._open_store(slug, path, self._lock)
+        with self._lock:
+            store = self._stores.get(slug)
+            if store is None:
+                store = self._stores[slug] = opened
+                self._counters["opens"] += 1
+            self._stores.move_to_end(slug)
+            evicted = self._evict(keep=slug)
+        for victim in evicted:
+            victim.close()
+        return store
+
+    def _evict(self, keep: str):
+        """Saca (con el lock tomado) los que sobran del LRU y los ociosos."""
+        now = time.monotonic()
+        sweep = now >= self._next_sweep
+        if sweep:
+            self._next_sweep = now + max(self.idle_seconds / 4, 1.0)
+
+        evicted = []
+        for slug, store in list(self._stores.items()):
+            over = len(self._stores) > self.max_open
+            idle = sweep and now - store.last_used > self.idle_seconds
+            if not over and not sweep:
+                break
+            if slug == keep or store.active or not (over or idle):
+                continue
+            del self._stores[slug]
+            store.closed = True
+            evicted.append(store)
+        self._counters["evictions"] += len(evicted)
+        return evicted
+
+    @contextmanager
+    def connection(self, slug: str):
+        """(conexion, escritor) del taller para trabajos fuera de un request."""
+        store = self.get(slug)
+        if store is None:
+            raise LookupError(f"Taller no encontrado: {slug}")
+        conn = store.acquire()
+        try:
+            yield conn, store.writer
+        finally:
+            store.release(conn)
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._counters)
+            data["open"] = len(self._stores)
+            data["active"] = sum(store.active for store in self._stores.values())
+        data["max_open"] = self.max_open
+        data["idle_seconds"] = self.idle_seconds
+        return data
+
+    def shutdown(self):
+        with self._lock:
+            stores = list(self._stores.values())
+            self._stores = OrderedDict()
+        for store in stores:
+            store.closed = True
+            store.close()
+
+
+# -------------------------
+# REPORTE ENTRE TALLERES (flask tenants report)
+# Cada taller se resume en un proceso del pool: las consultas de agregado
+# de muchos archivos no compiten por el GIL ni con los requests.
+# -------------------------
+
+def summarize_tenant(slug: str, path: str, today: str):
+    """Totales de un taller, leyendo su archivo en solo lectura."""
+    summary = {"tenant": slug, "size_bytes": os.path.getsize(path)}
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    except sqlite3.Error as exc:
+        return dict(summary, error=str(exc))
+    try:
+        summary["users"] = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+        summary["cars"] = conn.execute("SELECT COUNT(*) FROM cars").fetchone()[0]
+        services, cost, last = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(cost), 0), MAX(service_date) FROM service_records"
+        ).fetchone()
+        summary.update(service_records=services, total_cost=round(cost, 2), last_service_date=last)
+        summary["expired_documents"] = conn.execute(
+            "SELECT COUNT(*) FROM car_documents WHERE expires_on < ?", (today,)
+        ).fetchone()[0]
+    except sqlite3.Error as exc:
+        summary["error"] = str(exc)
+    finally:
+        conn.close()
+    return summary
+
+
+def report(stores: TenantStores, today: str, workers: int = 4):
+    """Resumen de todos los talleres (uno por proceso del pool), en orden por nombre."""
+    slugs = stores.slugs()
+    if not slugs:
+        return []
+    paths = [stores.path(slug) for slug in slugs]
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(slugs)))) as executor:
+        return list(executor.map(summarize_tenant, slugs, paths, [today] * len(slugs), chunksize=8))
@@ -0,0 +1,57 @@
+import json
+import threading
+
+
+def table_version(conn, name: str):
+    """Version actual de una tabla (se incrementa por trigger en cada cambio)."""
+    row = conn.execute("SELECT version FROM table_versions WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else 0
+
+
+def table_state(conn, tables):
+    """
+    (versiones, ultima modificacion) de varias tablas en una consulta.
+    versiones va en el orden de tables; la modificacion es epoch en segundos.
+    """
+    rows = conn.execute(
+        "SELECT name, version, updated_at FROM table_versions WHERE name IN (SELECT value FROM json_each(?))",
+        (json.dumps(list(tables)),),
+    ).fetchall()
+    found = {row[0]: (row[1], row[2]) for row in rows}
+    versions = tuple(found.get(name, (0, None))[0] for name in tables)
+    modified = max((v[1] for v in found.values() if v[1] is not None), default=None)
+    return versions, modified
+
+
+class VersionedCache:
+    """
+    Cache pequenio cuyas entradas dependen de la version de una tabla.
+    Al cambiar la version (cualquier insert/update/delete, incluidos los
+    borrados en cascada y los de otros procesos) las entradas viejas dejan de
+    coincidir; no hace falta invalidar a mano.
+    """
+
+    def __init__(self, table: str, max_entries: int = 256):
+        self.table = table
+        self.max_entries = max_entries
+        self._version = None
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, conn, key, compute):
+        version = table_version(conn, self.table)
+        with self._lock:
+            if version != self._version:
+                self._entries = {}
+                self._version = version
+            if key in self._entries:
+                return self._entries[key]
+
+        value = compute(conn)
+
+        with self._lock:
+            if version == self._version:
+                if len(self._entries) >= self.max_entries:
+                    self._entries.pop(next(iter(self._entries)))
+                self._entries[key] = value
+        return value
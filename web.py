@@ -0,0 +1,840 @@
+import hashlib
+import inspect
+import itertools
+import sqlite3
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import Response, current_app, g, jsonify, make_response, request, session
+
+import bulk
+import cache
+import db
+import metrics
+import migrations
+from query import ListQuery
+from shards import chunked, iter_cursor, merge_sorted
+from versions import table_state
+
+# Helpers compartidos por los blueprints: conexion del contexto,
+# paginacion, respuestas condicionales/cacheadas y validacion.
+
+
+# -------------------------
+# DB HELPERS
+# -------------------------
+
+def get_db_connection(database=None):
+    """Conexion propia (sin pool) con los PRAGMAs de la app: CLI y migraciones."""
+    return db.connect(database or current_app.config["DATABASE"], db.storage_pragmas(current_app.config))
+
+
+def all_databases():
+    """La base principal y, si hay, cada shard o cada taller."""
+    stores = tenant_stores()
+    tenant_paths = [stores.path(slug) for slug in stores.slugs()] if stores is not None else []
+    return [current_app.config["DATABASE"], *current_app.config["DATABASE_SHARDS"], *tenant_paths]
+
+
+def init_db():
+    """
+    Aplica las migraciones pendientes; paso explicito (flask init-db), no al importar.
+    Con DATABASE_SHARDS o TENANTS_DIR migra tambien cada shard o taller.
+    Devuelve las aplicadas a la base principal.
+    """
+    applied = None
+    for database in all_databases():
+        conn = get_db_connection(database)
+        try:
+            result = migrations.migrate(conn)
+        finally:
+            conn.close()
+        if applied is None:
+            applied = result
+    return applied
+
+
+def open_pooled_connection(config):
+    """Fabrica del pool: PRAGMAs de la app y seguimiento de cambios para el cache."""
+    def factory(database):
+        conn = db.connect(database, db.storage_pragmas(config), connection_class=metrics.TimedConnection)
+        cache.install_change_tracking(conn)
+        return conn
+    return factory
+
+
+def shard_set():
+    """ShardSet de la app (ver shards.py), o None sin DATABASE_SHARDS."""
+    return current_app.extensions["shards"]
+
+
+def get_directory_db():
+    """
+    Conexion a la base principal (el directorio con shards, o la del
+    taller del request): se toma del pool la primera vez y se devuelve en
+    teardown_appcontext.
+    """
+    if "db" not in g:
+        g.db = db_source().acquire()
+    return g.db
+
+
+def db_source():
+    """Pool de la base principal, o el TenantStore del request (misma interfaz)."""
+    return g.get("tenant") or current_app.extensions["db_pool"]
+
+
+def get_main_db():
+    """Conexion a DATABASE aunque el request sea de un taller: trabajos en segundo plano."""
+    if g.get("tenant") is None:
+        return get_directory_db()
+    if "main_db" not in g:
+        g.main_db = current_app.extensions["db_pool"].acquire()
+    return g.main_db
+
+
+def shard_db(index: int):
+    """Conexion del contexto al shard index (una por shard y request)."""
+    conns = g.setdefault("shard_dbs", {})
+    if index not in conns:
+        conns[index] = shard_set().shards[index].pool.acquire()
+    return conns[index]
+
+
+def get_db():
+    """
+    Conexion del contexto actual: la del shard elegido con use_shard o
+    route_to_shard, y si no, la de la base principal.
+    """
+    index = g.get("shard")
+    if index is None:
+        return get_directory_db()
+    return shard_db(index)
+
+
+def release_db(exception=None):
+    conn = g.pop("db", None)
+    if conn is not None:
+        db_source().release(conn)
+    conn = g.pop("main_db", None)
+    if conn is not None:
+        current_app.extensions["db_pool"].release(conn)
+    for index, conn in g.pop("shard_dbs", {}).items():
+        shard_set().shards[index].pool.release(conn)
+
+
+def db_write():
+    """
+    Transaccion de escritura serializada sobre la conexion del contexto:
+    hace commit al salir del bloque y rollback si hay excepcion.
+    """
+    return current_writer().transaction(get_db())
+
+
+def current_writer():
+    index = g.get("shard")
+    if index is not None:
+        return shard_set().shards[index].writer
+    if g.get("tenant") is not None:
+        return g.tenant.writer
+    return current_app.extensions["db_writer"]
+
+
+# -------------------------
+# SHARDS (solo con DATABASE_SHARDS)
+# Sin shards todo esto es un no-op: get_db() es siempre la base principal.
+# -------------------------
+
+def use_shard(index):
+    """Las consultas del request van al shard index (None: base principal)."""
+    g.shard = index
+
+
+def use_directory():
+    """Las consultas del request van solo a la base principal aunque haya shards (usuarios)."""
+    g.shard = None
+    g.directory_only = True
+
+
+def route_to_shard(table: str, arg: str):
+    """
+    Decorador de rutas por id: elige el shard que tiene la fila
+    view_args[arg] de table. Si no esta en ningun shard la vista consulta
+    la base principal, que no tiene flota, y responde su 404 de siempre.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**view_args):
+            route_to_row(table, view_args[arg])
+            return view(**view_args)
+        return wrapper
+    return decorator
+
+
+def route_to_row(table: str, row_id: int):
+    """Como route_to_shard, para ids que llegan en el body (el coche de un alta)."""
+    shards = shard_set()
+    if shards is not None:
+        use_shard(shards.locate(get_directory_db(), table, row_id))
+
+
+def route_to_owner(user_id: int):
+    """
+    Elige el shard del duenio para un alta. False si hay shards y el
+    duenio no tiene uno (no existe).
+    """
+    shards = shard_set()
+    if shards is None:
+        return True
+    index = shards.shard_of_user(get_directory_db(), user_id)
+    use_shard(index)
+    return index is not None
+
+
+def fan_out_shards():
+    """ShardSet si la consulta cubre toda la flota (hay shards y no se eligio uno); si no, None."""
+    shards = shard_set()
+    if shards is None or g.get("shard") is not None or g.get("directory_only"):
+        return None
+    return shards
+
+
+def write_targets():
+    """(conexion, escritor) donde puede caer una escritura masiva: cada shard o la base principal."""
+    shards = fan_out_shards()
+    if shards is None:
+        return [(get_db(), current_writer())]
+    return [(shard_db(shard.index), shard.writer) for shard in shards.shards]
+
+
+def new_ids(table: str, n: int = 1):
+    """
+    Ids para n altas en table: globales con shards, None sin ellos (los
+    asigna AUTOINCREMENT). Se piden antes de abrir la transaccion.
+    """
+    shards = shard_set()
+    if shards is None:
+        return [None] * n
+    return shards.allocate_ids(table, n)
+
+
+# -------------------------
+# TALLERES (solo con TENANTS_DIR, ver tenants.py)
+# El taller lo elige resolve_tenant (app.py) antes de auth; desde ahi
+# get_db() y db_write() usan la base del taller.
+# -------------------------
+
+def tenant_stores():
+    """TenantStores de la app, o None sin TENANTS_DIR."""
+    return current_app.extensions["tenants"]
+
+
+def use_tenant(store):
+    g.tenant = store
+
+
+def tenant_slug():
+    """Nombre del taller del request, o None."""
+    store = g.get("tenant")
+    return store.slug if store is not None else None
+
+
+def database_cache(name: str):
+    """VersionedCache name de la base del contexto (la principal o la del taller)."""
+    store = g.get("tenant")
+    if store is None:
+        return current_app.extensions[name]
+    return store.caches[name]
+
+
+def fetch_car_with_owner(conn, car_id: int):
+    return conn.execute("""
+        SELECT
+            cars.id,
+            cars.user_id,
+            users.name AS user_name,
+            cars.brand,
+            cars.model,
+            cars.year,
+            cars.plate
+        FROM cars
+        JOIN users ON users.id = cars.user_id
+        WHERE cars.id = ?
+    """, (car_id,)).fetchone()
+
+
+def fetch_document(conn, doc_id: int):
+    return conn.execute("""
+        SELECT id, car_id, doc_type, folio, expires_at, notes
+        FROM car_documents
+        WHERE id = ?
+    """, (doc_id,)).fetchone()
+
+
+# -------------------------
+# PAGINACION Y STREAMING
+# -------------------------
+
+def parse_page_args():
+    """
+    Lee limit/after de la query string. Lanza ValueError si limit no es entero.
+    """
+    limit = int(request.args.get("limit", current_app.config["PAGE_SIZE"]))
+    limit = max(1, min(limit, current_app.config["MAX_PAGE_SIZE"]))
+    return limit, request.args.get("after") or None
+
+
+def int_arg(name: str):
+    """Parametro entero opcional de la query string (ValueError si no es entero)."""
+    value = request.args.get(name)
+    return int(value) if value not in (None, "") else None
+
+
+def parse_within(value: str):
+    """
+    Ventana de dias: "30d", "2w" o solo el numero ("30"). Entre 0 y 366 dias.
+    """
+    value = (value or "30d").strip().lower()
+    multiplier = 1
+    if value.endswith("w"):
+        multiplier, value = 7, value[:-1]
+    elif value.endswith("d"):
+        value = value[:-1]
+
+    days = int(value) * multiplier
+    if days < 0 or days > 366:
+        raise ValueError(days)
+    return days
+
+
+def wants_ndjson():
+    best = request.accept_mimetypes.best_match(["application/json", "application/x-ndjson"])
+    return best == "application/x-ndjson"
+
+
+def wants_stream():
+    return request.args.get("stream") in ("1", "true") or wants_ndjson()
+
+
+def vary_on_accept(response):
+    """Accept elige JSON o NDJSON: los caches HTTP no deben mezclar las dos."""
+    response.vary.add("Accept")
+    return response
+
+
+def stream_rows(select_sql: str, params, ndjson: bool, key=None, reverse: bool = False):
+    """
+    Respuesta en streaming: recorre el cursor con fetchmany y codifica cada
+    bloque al vuelo, sin armar la lista completa en memoria.
+    Usa su propia conexion del pool porque el generador vive mas que la vista.
+    Con shards abre un cursor por shard y los une con merge k-way por key.
+    """
+    shards = fan_out_shards()
+    if shards is not None:
+        pools = [shard.pool for shard in shards.shards]
+    elif g.get("shard") is not None:
+        pools = [shard_set().shards[g.shard].pool]
+    else:
+        pools = [db_source()]
+    chunk_size = current_app.config["STREAM_CHUNK_SIZE"]
+    dumps = current_app.json.dumps
+
+    def generate():
+        conns = []
+        try:
+            for pool in pools:
+                conns.append(pool.acquire())
+            cursors = [conn.execute(select_sql, params) for conn in conns]
+            if len(cursors) == 1:
+                blocks = iter(lambda: cursors[0].fetchmany(chunk_size), [])
+            else:
+                rows = [iter_cursor(cursor, chunk_size) for cursor in cursors]
+                merged = merge_sorted(rows, key, reverse) if key else itertools.chain(*rows)
+                blocks = chunked(merged, chunk_size)
+
+            separator = "\n" if ndjson else ","
+            first = True
+            if not ndjson:
+                yield "["
+            for rows in blocks:
+                chunk = separator.join(dumps(dict(r)) for r in rows)
+                if ndjson:
+                    yield chunk + "\n"
+                else:
+                    yield chunk if first else "," + chunk
+                first = False
+            if not ndjson:
+                yield "]"
+        finally:
+            for pool, conn in zip(pools, conns):
+                pool.release(conn)
+
+    mimetype = "application/x-ndjson" if ndjson else "application/json"
+    return Response(generate(), mimetype=mimetype)
+
+
+def fetch_page(query: ListQuery, limit: int, after=None):
+    """
+    query.fetch_page en la conexion del contexto. Con shards lee la misma
+    pagina en todos en paralelo y la une con merge k-way (ListQuery.merge_pages).
+    """
+    shards = fan_out_shards()
+    if shards is None:
+        return query.fetch_page(get_db(), limit, after)
+    return query.merge_pages(shards.fan_out(query.fetch_page, limit, after), limit)
+
+
+def _page_query_args(query: ListQuery):
+    """
+    (limit, after, None) o (None, None, respuesta 400) para limit y ?sort=.
+    """
+    try:
+        limit, after = parse_page_args()
+    except ValueError:
+        return None, None, (jsonify({"error": "limit debe ser numérico"}), 400)
+
+    try:
+        query.order_by(request.args.get("sort"))
+    except ValueError:
+        allowed = ", ".join(sorted(query.sort_fields))
+        return None, None, (jsonify({"error": f"sort no permitido. Opciones: {allowed}"}), 400)
+
+    return limit, after, None
+
+
+def page_response(query: ListQuery):
+    """
+    Listado paginado por cursor (con ?sort= de la lista blanca), o exportacion
+    completa en streaming con ?stream=1 (JSON) o Accept: application/x-ndjson.
+    """
+    limit, after, error = _page_query_args(query)
+    if error:
+        return error
+
+    try:
+        if wants_stream():
+            sql, params = query.build(after)
+            return vary_on_accept(stream_rows(sql, params, ndjson=wants_ndjson(), key=query.row_key, reverse=query.descending))
+        rows, next_cursor = fetch_page(query, limit, after)
+    except ValueError:
+        return jsonify({"error": "Cursor after inválido"}), 400
+
+    return vary_on_accept(jsonify({"items": [dict(r) for r in rows], "next_cursor": next_cursor})), 200
+
+
+async def page_response_async(query: ListQuery):
+    """page_response para vistas asincronas: la pagina se lee en el executor de SQLite."""
+    limit, after, error = _page_query_args(query)
+    if error:
+        return error
+
+    try:
+        if wants_stream():
+            sql, params = query.build(after)
+            return vary_on_accept(stream_rows(sql, params, ndjson=wants_ndjson(), key=query.row_key, reverse=query.descending))
+        rows, next_cursor = await async_db().run(query.fetch_page, limit, after)
+    except ValueError:
+        return jsonify({"error": "Cursor after inválido"}), 400
+
+    return vary_on_accept(jsonify({"items": [dict(r) for r in rows], "next_cursor": next_cursor})), 200
+
+
+# -------------------------
+# RESPUESTAS CONDICIONALES Y CACHE
+# -------------------------
+
+def _validators(versions, modified, view_args, per_session):
+    """(etag, last_modified, not_modified) de la peticion actual."""
+    fingerprint = repr((
+        tenant_slug(),
+        request.endpoint,
+        sorted(view_args.items()),
+        sorted(request.args.items(multi=True)),
+        wants_ndjson(),
+        session_scope() if per_session else None,
+        versions,
+    ))
+    etag = hashlib.sha1(fingerprint.encode()).hexdigest()
+    # Last-Modified tiene resolucion de segundos: si hubo cambios en el
+    # segundo actual aun puede haber otro, asi que solo se usa el ETag.
+    # Tampoco dice nada de la sesion: con per_session solo hay ETag.
+    last_modified = None
+    if modified and modified < time.time() - 1 and not per_session:
+        last_modified = datetime.fromtimestamp(int(modified), timezone.utc)
+
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    else:
+        since = request.if_modified_since
+        not_modified = bool(since and last_modified and last_modified <= since)
+    return etag, last_modified, not_modified
+
+
+def _set_validators(response, etag, last_modified):
+    if response.status_code not in (200, 304):
+        return response
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    # El ETag depende de wants_ndjson(); tambien vale para 304 y hits del cache.
+    vary_on_accept(response)
+    # El navegador guarda la respuesta pero revalida siempre (304 barato).
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def current_table_state(tables):
+    """
+    table_state de la conexion del contexto. Con shards y sin shard elegido
+    combina el directorio y todos los shards: un cambio en cualquiera cambia el ETag.
+    """
+    shards = fan_out_shards()
+    if shards is None:
+        return table_state(get_db(), tables)
+    states = [table_state(get_directory_db(), tables), *shards.fan_out(table_state, tables)]
+    versions = tuple(state[0] for state in states)
+    modified = max((state[1] for state in states if state[1] is not None), default=None)
+    return versions, modified
+
+
+def conditional_get(*tables, per_session: bool = False):
+    """
+    ETag fuerte y Last-Modified a partir de table_versions de las tablas de
+    las que depende la vista (y del usuario de la sesion con per_session,
+    para paginas HTML). Con If-None-Match (o If-Modified-Since) vigente
+    responde 304 sin ejecutar la consulta. Las versiones se leen antes que
+    los datos: un ETag nunca describe datos mas nuevos que los enviados.
+    Sirve tambien para vistas async (las versiones se leen en el executor).
+    """
+    def decorator(view):
+        if inspect.iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(**view_args):
+                versions, modified = await async_db().run(table_state, tables)
+                etag, last_modified, not_modified = _validators(versions, modified, view_args, per_session)
+                if not_modified:
+                    response = Response(status=304)
+                else:
+                    response = make_response(await view(**view_args))
+                return _set_validators(response, etag, last_modified)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(**view_args):
+            versions, modified = current_table_state(tables)
+            etag, last_modified, not_modified = _validators(versions, modified, view_args, per_session)
+            if not_modified:
+                response = Response(status=304)
+            else:
+                response = make_response(view(**view_args))
+            return _set_validators(response, etag, last_modified)
+        return wrapper
+    return decorator
+
+
+def session_scope():
+    """Datos de la sesion que muestra base.html: las vistas HTML dependen de ellos."""
+    return session.get("user_id"), session.get("user_name"), session.get("user_email")
+
+
+def _cache_key(view_args, per_session):
+    return (
+        request.endpoint,
+        tuple(sorted(view_args.items())),
+        tuple(sorted(request.args.items(multi=True))),
+        session_scope() if per_session else None,
+    )
+
+
+def _cache_hit(response_cache, key):
+    hit = response_cache.get(key)
+    if hit is None:
+        return None
+    body, status, mimetype = hit
+    response = Response(body, status=status, mimetype=mimetype)
+    response.headers["X-Cache"] = "HIT"
+    return response
+
+
+def _cache_store(response_cache, key, token, response, tags, view_args):
+    if response.status_code in (200, 404) and not response.is_streamed:
+        body = response.get_data()
+        response_cache.put(
+            key,
+            (body, response.status_code, response.mimetype),
+            len(body),
+            [tag for tag in tags(response, **view_args) if tag[1] is not None],
+            token,
+        )
+    response.headers["X-Cache"] = "MISS"
+    return response
+
+
+def cached_response(tags, per_session: bool = False):
+    """
+    Cachea la respuesta (200 o 404) por endpoint, argumentos de ruta y query
+    string; con per_session tambien por usuario de la sesion (paginas HTML,
+    que muestran la sesion). tags(response, **view_args) dice de que filas/tablas depende;
+    las escrituras que las tocan la invalidan. Los streams no se cachean.
+    Sirve tambien para vistas async. Con shards o talleres no cachea: las
+    versiones que sigue el cache son las de una sola base.
+    """
+    def decorator(view):
+        if inspect.iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(**view_args):
+                response_cache = current_app.extensions["response_cache"]
+                if not response_cache.enabled or wants_stream():
+                    return await view(**view_args)
+
+                await async_db().run(response_cache.sync)
+                key = _cache_key(view_args, per_session)
+                hit = _cache_hit(response_cache, key)
+                if hit is not None:
+                    return hit
+
+                token = response_cache.token()
+                response = make_response(await view(**view_args))
+                return _cache_store(response_cache, key, token, response, tags, view_args)
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(**view_args):
+            response_cache = current_app.extensions["response_cache"]
+            if not response_cache.enabled or wants_stream() or shard_set() is not None or tenant_stores() is not None:
+                return view(**view_args)
+
+            response_cache.sync(get_db())
+            key = _cache_key(view_args, per_session)
+            hit = _cache_hit(response_cache, key)
+            if hit is not None:
+                return hit
+
+            token = response_cache.token()
+            response = make_response(view(**view_args))
+            return _cache_store(response_cache, key, token, response, tags, view_args)
+        return wrapper
+    return decorator
+
+
+# -------------------------
+# VISTAS ASINCRONAS (modo ASGI, ver asgi.py)
+# Version async de algunas lecturas calientes. Se registran por endpoint:
+# en modo ASGI reemplazan a la vista sincrona del mismo endpoint, que es
+# la que sigue sirviendo en WSGI.
+# -------------------------
+
+ASYNC_VIEWS = {}
+
+
+def async_view(endpoint: str):
+    def decorator(view):
+        ASYNC_VIEWS[endpoint] = view
+        return view
+    return decorator
+
+
+def async_db():
+    return current_app.extensions["async_db"]
+
+
+# -------------------------
+# VALIDACION (compartida por altas individuales, bulk e importaciones)
+# Cada funcion devuelve (valores, None) o (None, mensaje de error).
+# -------------------------
+
+def validate_car(data):
+    user_id = data.get("user_id")
+    brand = data.get("brand")
+    model = data.get("model")
+    year = data.get("year")
+    plate = data.get("plate")
+
+    if user_id is None or not brand or not model or year is None:
+        return None, "Faltan campos obligatorios: user_id, brand, model, year"
+
+    try:
+        user_id = int(user_id)
+        year = int(year)
+    except (ValueError, TypeError):
+        return None, "user_id y year deben ser numéricos"
+
+    return {"user_id": user_id, "brand": brand, "model": model, "year": year, "plate": plate}, None
+
+
+def validate_service_record(data):
+    car_id = data.get("car_id")
+    service_type = data.get("service_type")
+    service_date = data.get("service_date")
+    mileage = data.get("mileage")
+    cost = data.get("cost")
+
+    if car_id is None or not service_type or not service_date or mileage is None or cost is None:
+        return None, "Faltan campos: car_id, service_type, service_date, mileage, cost"
+
+    try:
+        car_id = int(car_id)
+        mileage = int(mileage)
+        cost = float(cost)
+    except (ValueError, TypeError):
+        return None, "car_id/mileage deben ser int y cost debe ser número"
+
+    return {
+        "car_id": car_id,
+        "service_type": service_type,
+        "service_date": service_date,
+        "mileage": mileage,
+        "cost": cost,
+    }, None
+
+
+# expires_at es texto libre (expires_on queda NULL si no es una fecha), pero
+# date('now') no es determinista y SQLite lo rechaza en la columna generada
+# expires_on (migracion 5). Es el unico valor asi: date() recibe un solo argumento.
+EXPIRES_AT_ERROR = "expires_at debe ser la fecha de vencimiento, no 'now'"
+
+
+def is_valid_expires_at(value: str):
+    return value.lower() != "now"
+
+
+def validate_car_document(data):
+    car_id = data.get("car_id")
+    doc_type = (data.get("doc_type") or "").strip()
+    folio = (data.get("folio") or "").strip()
+    expires_at = (data.get("expires_at") or "").strip()
+    notes = (data.get("notes") or "").strip()
+
+    if car_id is None or not doc_type or not folio or not expires_at:
+        return None, "Faltan campos: car_id, doc_type, folio, expires_at"
+
+    try:
+        car_id = int(car_id)
+    except (ValueError, TypeError):
+        return None, "car_id debe ser numérico"
+
+    if not is_valid_expires_at(expires_at):
+        return None, EXPIRES_AT_ERROR
+
+    return {
+        "car_id": car_id,
+        "doc_type": doc_type,
+        "folio": folio,
+        "expires_at": expires_at,
+        "notes": notes if notes else None,
+    }, None
+
+
+def create_user_in_db(name: str, email: str, password: str):
+    password_hash = current_app.extensions["password_hasher"].hash(password)
+
+    try:
+        with db_write() as conn:
+            cursor = conn.execute(
+                "INSERT INTO users (name, email, password) VALUES (?, ?, ?)",
+                (name, email, password_hash),
+            )
+            user_id = cursor.lastrowid
+            if shard_set() is not None:
+                shard_set().add_user(conn, user_id, name, email)
+    except sqlite3.IntegrityError:
+        return None, "email_exists"
+
+    return user_id, None
+
+
+# -------------------------
+# API BULK (alta y baja masiva)
+# -------------------------
+
+BULK_VALIDATORS = {
+    "cars": (validate_car, "Usuario no encontrado"),
+    "service_records": (validate_service_record, "Coche no encontrado"),
+    "car_documents": (validate_car_document, "Coche no encontrado"),
+}
+
+
+def bulk_payload(key: str):
+    """
+    Lista del body: [...] o {key: [...]}. Devuelve (lista, respuesta de error).
+    """
+    data = request.get_json(silent=True)
+    items = data.get(key) if isinstance(data, dict) else data
+    max_items = current_app.config["BULK_MAX_ITEMS"]
+
+    if not isinstance(items, list) or not items:
+        return None, (jsonify({"error": f"El body debe ser una lista o {{\"{key}\": [...]}} no vacía"}), 400)
+    if len(items) > max_items:
+        return None, (jsonify({"error": f"Máximo {max_items} elementos por petición"}), 413)
+    return items, None
+
+
+def bulk_create(table: str):
+    """
+    1) valida todo el payload, 2) revisa las FK con una sola consulta,
+    3) inserta con executemany en una transaccion.
+    Los elementos invalidos se reportan por indice y no detienen al resto.
+    Con shards repite 2) y 3) en cada shard con los que aun no tienen padre
+    (una transaccion por shard).
+    """
+    items, error_response = bulk_payload("items")
+    if error_response:
+        return error_response
+
+    validate, parent_error = BULK_VALIDATORS[table]
+    parent_table, parent_key = bulk.TABLES[table]["parent"]
+    results = [None] * len(items)
+    valid = []
+
+    for index, item in enumerate(items):
+        values, error = validate(item if isinstance(item, dict) else {})
+        if error:
+            results[index] = {"index": index, "error": error}
+        else:
+            valid.append((index, values))
+
+    # Ids en el orden del payload, aunque con shards se inserten por shard.
+    ids = dict(zip((index for index, _ in valid), new_ids(table, len(valid))))
+    pending = valid
+    created = 0
+    for conn, writer in write_targets():
+        with writer.transaction(conn):
+            parents = bulk.existing_ids(conn, parent_table, {v[parent_key] for _, v in pending})
+            rows = [(index, values) for index, values in pending if values[parent_key] in parents]
+            row_ids = [ids[index] for index, _ in rows]
+            inserted = bulk.insert_many(conn, table, [values for _, values in rows], row_ids)
+
+        for (index, _), new_id in zip(rows, inserted):
+            results[index] = {"index": index, "id": new_id}
+        created += len(rows)
+        pending = [(index, values) for index, values in pending if values[parent_key] not in parents]
+
+    for index, _ in pending:
+        results[index] = {"index": index, "error": parent_error}
+
+    failed = len(items) - created
+    status = 201 if failed == 0 else 207
+    return jsonify({"created": created, "failed": failed, "results": results}), status
+
+
+def bulk_delete(table: str):
+    ids, error_response = bulk_payload("ids")
+    if error_response:
+        return error_response
+
+    try:
+        ids = [int(i) for i in ids]
+    except (ValueError, TypeError):
+        return jsonify({"error": "ids deben ser numéricos"}), 400
+
+    deleted = set()
+    for conn, writer in write_targets():
+        with writer.transaction(conn):
+            deleted |= bulk.delete_many(conn, table, set(ids) - deleted)
+
+    results = [
+        {"id": i, "deleted": True} if i in deleted else {"id": i, "error": "No encontrado"}
+        for i in ids
+    ]
+    status = 200 if len(deleted) == len(set(ids)) else 207
+    return jsonify({"deleted": len(deleted), "results": results}), status